@@ -3,10 +3,12 @@
 from django.urls import path
 from .views import (
     BoardListAPIView,
+    BoardChangesAPIView,
+    BoardReorderAPIView,
     ColumnCreateAPIView,
     ColumnDeleteAPIView,
     TaskCreateAPIView,
-    TaskDeleteAPIView,
+    TaskAPIView,
     session_view,
     get_csrf,
     login_view,
@@ -38,6 +40,8 @@ from .views import (
 
 urlpatterns = [
     path('boards/<int:pk>/', BoardListAPIView.as_view(), name='board-list'),
+    path('boards/<int:pk>/changes/', BoardChangesAPIView.as_view(), name='board-changes'),
+    path('boards/<int:pk>/reorder/', BoardReorderAPIView.as_view(), name='board-reorder'),
     path('boards/<int:board_id>/columns/', ColumnCreateAPIView.as_view(), name='column-create'),
     path('columns/<int:pk>/', ColumnDeleteAPIView.as_view(), name='column-delete'),
     path('columns/<int:column_id>/tasks/', TaskCreateAPIView.as_view(),name='task-create'),
@@ -56,7 +60,7 @@ urlpatterns = [
     path('boards/<int:pk>/rename/', BoardRenameAPIView.as_view(), name='board-rename'),
     path('columns/<int:pk>/rename/', ColumnRenameAPIView.as_view(), name='column-rename'),
     path('tasks/<int:pk>/rename/', TaskRenameAPIView.as_view(), name='task-rename'),
-    path('tasks/<int:pk>/', TaskDeleteAPIView.as_view(), name='task-delete'),
+    path('tasks/<int:pk>/', TaskAPIView.as_view(), name='task-detail'),  # GET - задача целиком, DELETE - удаление
     path('tasks/<int:pk>/move/', TaskMoveView.as_view(), name='task-move'),
     path('tasks/<int:pk>/description/', TaskUpdateAPIView.as_view(), name='task-update-description'),
     path('tasks/<int:pk>/files/', TaskFilesListAPIView.as_view(), name='task-files-list'),  # GET список файлов
@@ -0,0 +1,148 @@
+'''Кэш отрендеренного JSON снапшота доски.
+Один снапшот сериализуется на изменение, а не на каждого зрителя.
+Запись хранит ревизию и поколение кэша, для которых отрендерена. Сигналы при любых
+изменениях содержимого доски, в том числе мимо view (админка, shell), и при смене
+имени/аватара пользователей доски сдвигают поколение: ревизия при этом не меняется
+(журнал изменений не пишется), но поколение входит в ETag, так что клиенты не получат 304
+на устаревшее содержимое, а рендер, начатый до сдвига, не попадёт в кэш как актуальный.'''
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .models import Board, BoardPermit, Column, Task, TaskFile, Comment
+
+BOARD_SNAPSHOT_CACHE_TIMEOUT = getattr(settings, 'BOARD_SNAPSHOT_CACHE_TIMEOUT', 60 * 60)
+
+
+# Варианты снапшота (?view=...), у каждого своя запись
+SNAPSHOT_VIEWS = ('full', 'summary')
+
+
+def snapshot_cache_key(board_id, view='full'):
+    return f'board-snapshot:{board_id}:{view}'
+
+
+def _generation_key(board_id):
+    return f'board-snapshot-gen:{board_id}'
+
+
+def snapshot_generation(board_id):
+    """
+    Поколение кэша снапшота доски. Вытесненный ключ начинается заново со времени,
+    а не с нуля, чтобы не совпасть с поколением из старых ETag.
+    """
+    key = _generation_key(board_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_cached_snapshot(board_id, revision, view='full', generation=None):
+    """Отрендеренный JSON доски для этой ревизии и поколения (по умолчанию - текущего) или None"""
+    if generation is None:
+        generation = snapshot_generation(board_id)
+    cached = cache.get(snapshot_cache_key(board_id, view))
+    if cached and cached[:2] == (revision, generation):
+        return cached[2]
+    return None
+
+
+def set_cached_snapshot(board_id, revision, content, view='full', generation=None):
+    """generation - поколение, прочитанное до рендера: сдвиг во время рендера сделает запись неактуальной"""
+    if generation is None:
+        generation = snapshot_generation(board_id)
+    cache.set(snapshot_cache_key(board_id, view), (revision, generation, content), BOARD_SNAPSHOT_CACHE_TIMEOUT)
+
+
+def _bump_generation(board_id):
+    key = _generation_key(board_id)
+    cache.add(key, time.time_ns(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен между add и incr - новое поколение со времени
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_board_snapshot(board_id):
+    _bump_generation(board_id)
+    cache.delete_many([snapshot_cache_key(board_id, view) for view in SNAPSHOT_VIEWS])
+    if connection.in_atomic_block:
+        # Рендер между сигналом и коммитом прочитал бы старые строки - сдвигаем ещё раз после коммита
+        transaction.on_commit(lambda: _bump_generation(board_id))
+
+
+# ------------------Сигналы------------------
+def _board_id_of(instance):
+    """Доска, к которой относится объект (None, если цепочка уже удалена)"""
+    try:
+        if isinstance(instance, Board):
+            return instance.id
+        if isinstance(instance, (Column, BoardPermit)):
+            return instance.board_id
+        if isinstance(instance, Task):
+            return instance.column.board_id
+        if isinstance(instance, (TaskFile, Comment)):
+            return instance.task.column.board_id
+    except ObjectDoesNotExist:
+        return None
+    return None
+
+
+def invalidate_on_change(sender, instance, **kwargs):
+    board_id = _board_id_of(instance)
+    if board_id is not None:
+        invalidate_board_snapshot(board_id)
+
+
+def invalidate_on_responsible_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_on_change(Task, instance)
+        return
+    # user.responsible_tasks.add(...) - затронутые задачи в pk_set,
+    # при clear - все задачи пользователя, пока связи ещё не удалены
+    if action in ('post_add', 'post_remove'):
+        tasks = Task.objects.filter(id__in=pk_set)
+    elif action == 'pre_clear':
+        tasks = instance.responsible_tasks.all()
+    else:
+        return
+    for board_id in set(tasks.values_list('column__board_id', flat=True)):
+        invalidate_board_snapshot(board_id)
+
+
+def invalidate_user_boards(sender, instance, **kwargs):
+    """Имя и аватар пользователя есть в снапшотах его досок (владелец, участник, по разрешению)"""
+    if sender is User:
+        user_id = instance.id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) <= {'last_login'}:
+            return  # вход в систему снапшот не меняет
+    else:
+        user_id = instance.user_id
+    board_ids = Board.objects.filter(
+        Q(owner_id=user_id) | Q(members__id=user_id) | Q(boardpermit__user_id=user_id)
+    ).values_list('id', flat=True).distinct()
+    for board_id in board_ids:
+        invalidate_board_snapshot(board_id)
+
+
+for model in (Board, Column, Task, TaskFile, Comment, BoardPermit):
+    post_save.connect(invalidate_on_change, sender=model, dispatch_uid=f'board_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_on_change, sender=model, dispatch_uid=f'board_cache_delete_{model.__name__}')
+
+m2m_changed.connect(invalidate_on_responsible_change, sender=Task.responsible.through,
+                    dispatch_uid='board_cache_responsible')
+
+post_save.connect(invalidate_user_boards, sender=User, dispatch_uid='board_cache_user_save')
+post_save.connect(invalidate_user_boards, sender='users.Profile', dispatch_uid='board_cache_profile_save')
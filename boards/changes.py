@@ -0,0 +1,136 @@
+'''Журнал изменений доски: запись изменений из view и сборка компактного патча
+"всё, что произошло после ревизии N" для клиентов'''
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import BoardChange, Task
+from .revisions import bump_board_revision
+from .events import broadcast_board_changes
+
+# Сколько последних ревизий журнала храним на доску; более старые клиенты получают полный снапшот
+BOARD_CHANGES_RETAIN = getattr(settings, 'BOARD_CHANGES_RETAIN', 1000)
+
+
+class HistoryTrimmed(Exception):
+    """Журнал обрезан (или клиент впереди сервера) - нужен полный снапшот"""
+
+
+def record_board_changes(board_id, changes):
+    """
+    Записывает пачку изменений одной новой ревизией доски.
+    changes - список кортежей (entity, action, entity_id, data).
+    Возвращает новую ревизию.
+    """
+    with transaction.atomic():
+        revision = bump_board_revision(board_id)
+        BoardChange.objects.bulk_create([
+            BoardChange(
+                board_id=board_id,
+                revision=revision,
+                entity=entity,
+                action=action,
+                entity_id=entity_id,
+                data=data or {},
+            )
+            for entity, action, entity_id, data in changes
+        ])
+        # Подписчики ws/board/<id>/ получат изменения после коммита
+        broadcast_board_changes(board_id, revision, changes)
+        # Обрезаем хвост журнала не на каждой записи, а раз в сотню ревизий
+        if revision % 100 == 0:
+            BoardChange.objects.filter(
+                board_id=board_id,
+                revision__lte=revision - BOARD_CHANGES_RETAIN
+            ).delete()
+    return revision
+
+
+def record_board_change(board_id, entity, action, entity_id, data=None):
+    """Одно изменение - одна ревизия"""
+    return record_board_changes(board_id, [(entity, action, entity_id, data)])
+
+
+# ------------------Данные изменений------------------
+def task_insert_data(task):
+    """Поля новой карточки"""
+    return {
+        'column': task.column_id,
+        'position': task.position,
+        'rank': task.rank,
+        'title': task.title,
+        'description': task.description,
+        'priority': task.priority,
+        'deadline': task.deadline,
+        'creator': task.creator_id,
+        'created': task.created,
+    }
+
+
+def comment_insert_data(comment):
+    """Поля комментария в том же виде, что отдаёт CommentSerializer"""
+    return {
+        'task': comment.task_id,
+        'user_username': comment.user.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def column_order_changes(*column_ids):
+    """Актуальный порядок задач в колонках: после перемещения сдвигаются и соседи"""
+    changes = []
+    for column_id in dict.fromkeys(column_ids):
+        task_ids = list(
+            Task.objects.filter(column_id=column_id).order_by('rank', 'id').values_list('id', flat=True)
+        )
+        changes.append(('column', 'update', column_id, {'task_ids': task_ids}))
+    return changes
+
+
+# ------------------Выдача патча------------------
+def board_changes_since(board, since):
+    """
+    Компактный патч после ревизии since: по каждому объекту одна запись,
+    поля последовательных изменений слиты, последнее значение побеждает.
+    insert + update → insert, update + move → update, ... + delete → delete,
+    insert + delete → ничего.
+    Бросает HistoryTrimmed, если журнала для since уже (или ещё) нет.
+    """
+    if since > board.revision:
+        raise HistoryTrimmed
+    if since == board.revision:
+        return []
+
+    rows = list(
+        BoardChange.objects.filter(board=board, revision__gt=since)
+        .order_by('revision', 'id')
+        .values_list('revision', 'entity', 'action', 'entity_id', 'data')
+    )
+    # Журнал непрерывен: если первой нужной ревизии нет - она уже обрезана
+    if not rows or rows[0][0] != since + 1:
+        raise HistoryTrimmed
+
+    merged = {}
+    for revision, entity, action, entity_id, data in rows:
+        key = (entity, entity_id)
+        current = merged.pop(key, None)  # pop + вставка = порядок по последнему изменению
+        if current is None:
+            current = {'entity': entity, 'id': entity_id, 'action': action, 'data': {}}
+        elif action == 'delete':
+            current['data'] = {}
+            current['action'] = None if current['action'] == 'insert' else 'delete'
+        elif current['action'] != 'insert':
+            current['action'] = 'update'
+        current['data'].update(data)
+        current['revision'] = revision
+        merged[key] = current
+
+    result = []
+    for change in merged.values():
+        if change['action'] is None:
+            continue  # создан и удалён внутри окна - клиенту знать не нужно
+        if change['action'] == 'move':
+            change['action'] = 'update'
+        result.append(change)
+    return result
@@ -0,0 +1,74 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from .permissions import load_board_access
+from .events import board_group_name, board_access_group_name
+
+
+# Код закрытия сокета при отзыве доступа (4000-4999 - коды приложения)
+ACCESS_REVOKED_CLOSE_CODE = 4403
+
+
+class BoardConsumer(AsyncWebsocketConsumer):
+    """
+    События доски в реальном времени: каждое изменение приходит кадром
+    {"type": "changes", "revision": N, "changes": [...]} в формате /changes/?since=.
+    Если клиент видит пропуск ревизии - догружает /api/boards/<id>/changes/?since=.
+    """
+
+    async def connect(self):
+        self.board_id = int(self.scope['url_route']['kwargs']['board_id'])
+        self.group_name = board_group_name(self.board_id)
+
+        if self.scope['user'].is_anonymous:
+            await self.close()
+            return
+
+        revision = await self.get_revision_if_allowed()
+        if revision is None:
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # Сюда придёт отзыв доступа - сокет закроется без перепроверок
+        self.access_group_name = board_access_group_name(self.board_id, self.scope['user'].id)
+        await self.channel_layer.group_add(self.access_group_name, self.channel_name)
+        await self.accept()
+
+        # Текущая ревизия - точка отсчёта для клиента
+        await self.send(text_data=json.dumps({
+            'type': 'hello',
+            'board_id': self.board_id,
+            'revision': revision,
+        }))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if hasattr(self, 'access_group_name'):
+            await self.channel_layer.group_discard(self.access_group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # Канал только на отдачу, изменения идут через REST
+        pass
+
+    @database_sync_to_async
+    def get_revision_if_allowed(self):
+        access = load_board_access(self.scope['user'], 'board', self.board_id)
+        if access is None or not access.can_read:
+            return None
+        self.board_role = access.role
+        return access.board.revision
+
+    async def board_changes(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'changes',
+            'revision': event['revision'],
+            'changes': event['changes'],
+        }))
+
+    async def board_access(self, event):
+        # Роль пересчитана после изменения BoardPermit; None - доступ отозван
+        self.board_role = event['role']
+        if self.board_role is None:
+            await self.close(code=ACCESS_REVOKED_CLOSE_CODE)
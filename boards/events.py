@@ -0,0 +1,75 @@
+'''Рассылка событий доски подписчикам ws/board/<board_id>/ через channel layer
+и уведомления сокетов об изменении прав доступа'''
+
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import BoardPermit
+from .permissions import load_board_access
+
+
+def board_group_name(board_id):
+    return f'board_{board_id}'
+
+
+def broadcast_board_changes(board_id, revision, changes):
+    """
+    Отправляет изменения одной ревизии всем, кто смотрит доску.
+    Уходит только после коммита, чтобы клиент не увидел откатившееся изменение.
+    """
+    event = {
+        'type': 'board_changes',
+        'board_id': board_id,
+        'revision': revision,
+        # datetime и прочее - в строки, чтобы событие пережило любой channel layer
+        'changes': json.loads(json.dumps([
+            {'entity': entity, 'action': action, 'id': entity_id, 'data': data or {}}
+            for entity, action, entity_id, data in changes
+        ], cls=DjangoJSONEncoder)),
+    }
+
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(board_group_name(board_id), event)
+
+    transaction.on_commit(send)
+
+
+# ------------------Права доступа------------------
+def board_access_group_name(board_id, user_id):
+    """Группа всех сокетов пользователя, открытых на эту доску (доска, чат)"""
+    return f'board_access_{board_id}_{user_id}'
+
+
+def notify_board_access(board_id, user_id):
+    """
+    После коммита пересчитывает роль пользователя на доске и рассылает её его сокетам:
+    роль None - доступ отозван, сокеты закрываются сразу, без периодических перепроверок.
+    """
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        access = load_board_access(User(id=user_id), 'board', board_id)
+        async_to_sync(channel_layer.group_send)(board_access_group_name(board_id, user_id), {
+            'type': 'board_access',
+            'board_id': board_id,
+            'role': access.role if access else None,
+        })
+
+    transaction.on_commit(send)
+
+
+def permit_changed(sender, instance, **kwargs):
+    notify_board_access(instance.board_id, instance.user_id)
+
+
+post_save.connect(permit_changed, sender=BoardPermit, dispatch_uid='board_access_permit_save')
+post_delete.connect(permit_changed, sender=BoardPermit, dispatch_uid='board_access_permit_delete')
@@ -1,6 +1,17 @@
 
 import React, { useState, useEffect } from 'react';
 
+// Подпись времени считается на клиенте: сервер отдаёт только created в ISO
+const formatTime = (iso) => {
+    const created = new Date(iso);
+    const time = created.toLocaleTimeString('ru-RU', { hour: '2-digit', minute: '2-digit' });
+    const days = Math.floor((Date.now() - created.getTime()) / 86400000);
+    if (days === 0) return time;
+    if (days === 1) return `Вчера ${time}`;
+    if (days < 7) return `${created.toLocaleDateString('ru-RU', { weekday: 'long' })} ${time}`;
+    return `${created.toLocaleDateString('ru-RU')} ${time}`;
+};
+
 const Chat = ({ boardId, currentUser, serverUrl = '', csrfToken }) => {
     const [messages, setMessages] = useState([]);
     const [inputText, setInputText] = useState('');
@@ -20,6 +31,7 @@ const Chat = ({ boardId, currentUser, serverUrl = '', csrfToken }) => {
             const data = await response.json();
             setMessages(data.messages || []);
             console.log('Загружены сообщения:', data.messages);
+            markRead();
         } catch (error) {
             console.error('Ошибка загрузки:', error);
         } finally {
@@ -27,6 +39,18 @@ const Chat = ({ boardId, currentUser, serverUrl = '', csrfToken }) => {
         }
     };
 
+    // Отметка прочтения до последнего сообщения чата (бейджи непрочитанных)
+    const markRead = () => {
+        fetch(`${serverUrl}api/chat/boards/${boardId}/mark-read/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken,
+            },
+            body: JSON.stringify({}),
+        }).catch((error) => console.error('Ошибка отметки прочтения:', error));
+    };
+
     const sendMessage = async () => {
         const text = inputText.trim();
         if (!text) return;
@@ -67,10 +91,15 @@ const Chat = ({ boardId, currentUser, serverUrl = '', csrfToken }) => {
 
             <div style={styles.messages}>
                 {messages.map((msg) => (
-                    <div key={msg.id} style={styles.message}>
+                    <div
+                        key={msg.id}
+                        style={msg.author?.id === currentUser?.id
+                            ? { ...styles.message, ...styles.ownMessage }
+                            : styles.message}
+                    >
                         <div style={styles.messageHeader}>
                             <strong>{msg.author?.username}</strong>
-                            <span style={styles.time}>{msg.created_display}</span>
+                            <span style={styles.time}>{formatTime(msg.created)}</span>
                         </div>
                         <div style={styles.messageText}>{msg.text}</div>
                     </div>
@@ -133,6 +162,9 @@ const styles = {
         background: '#f9f9f9',
         borderRadius: '5px',
     },
+    ownMessage: {
+        background: '#e8f1ff',
+    },
     messageHeader: {
         display: 'flex',
         justifyContent: 'space-between',
@@ -11,43 +11,89 @@ const PrivateMessages = ({ currentUser, serverUrl, csrfToken, onClose }) => {
     const [isLoading, setIsLoading] = useState(false);
     const [ws, setWs] = useState(null);
     const messagesEndRef = useRef(null);
+    // Номер доставки последнего входящего: при переподключении сервер дошлёт пропущенное
+    const lastSeqRef = useRef(null);
+    // Открытый диалог для обработчиков сокета: смена диалога не пересоздаёт соединение
+    const activeDialogRef = useRef(null);
+
+    useEffect(() => {
+        activeDialogRef.current = activeDialog;
+    }, [activeDialog]);
 
     // Подключение к WebSocket
     useEffect(() => {
         if (!currentUser?.isAuthenticated) return;
 
-        const websocket = new WebSocket(`ws://127.0.0.1:8000/ws/private/`);
-        
-        websocket.onopen = () => {
-            console.log('WebSocket connected');
-        };
-        
-        websocket.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            
-            if (data.type === 'new_message') {
-                const newMessage = data.message;
-                
-                // Если сообщение из текущего чата - добавляем
-                if (activeDialog === newMessage.chat_id) {
-                    setMessages(prev => [...prev, newMessage]);
+        let websocket = null;
+        let reconnectTimer = null;
+        let attempts = 0;
+        let closed = false;  // компонент размонтирован - не переподключаемся
+
+        const connect = () => {
+            // Общий сокет пользователя (ws/stream/): личные сообщения - поток private
+            websocket = new WebSocket(`ws://127.0.0.1:8000/ws/stream/`);
+
+            websocket.onopen = () => {
+                console.log('WebSocket connected');
+                attempts = 0;
+                const subscribe = { type: 'subscribe', stream: 'private' };
+                if (lastSeqRef.current !== null) {
+                    subscribe.resume_from = lastSeqRef.current;
                 }
-                
-                // Обновляем список диалогов
-                loadDialogs();
-            }
-        };
-        
-        websocket.onclose = () => {
-            console.log('WebSocket disconnected');
+                websocket.send(JSON.stringify(subscribe));
+            };
+
+            websocket.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.stream !== 'private') return;
+
+                if (data.type === 'resume') {
+                    if (data.messages.length) {
+                        lastSeqRef.current = data.messages[data.messages.length - 1].seq;
+                        const chatMessages = data.messages.filter(m => m.chat_id === activeDialogRef.current);
+                        setMessages(prev => [...prev, ...chatMessages]);
+                    }
+                    if (data.messages.length || data.has_more) {
+                        loadDialogs();
+                    }
+                }
+
+                if (data.type === 'new_message') {
+                    const newMessage = data.message;
+                    lastSeqRef.current = Math.max(lastSeqRef.current ?? 0, newMessage.seq);
+
+                    // Если сообщение из текущего чата - добавляем
+                    if (activeDialogRef.current === newMessage.chat_id) {
+                        setMessages(prev => [...prev, newMessage]);
+                    }
+
+                    // Обновляем список диалогов
+                    loadDialogs();
+                }
+            };
+
+            websocket.onclose = () => {
+                console.log('WebSocket disconnected');
+                if (closed) return;
+                setWs(null);  // пока сокета нет, отправка идёт через REST
+                // Переподключение с растущей паузой (1с, 2с, 4с ... до 30с);
+                // onopen подпишется с resume_from и получит пропущенное
+                const delay = Math.min(1000 * 2 ** attempts, 30000);
+                attempts += 1;
+                reconnectTimer = setTimeout(connect, delay);
+            };
+
+            setWs(websocket);
         };
-        
-        setWs(websocket);
-        
+
+        connect();
+
         return () => {
+            closed = true;
+            clearTimeout(reconnectTimer);
             websocket.close();
         };
-    }, [currentUser, activeDialog]); // добавили activeDialog в зависимости
+    }, [currentUser]);
 
     // Загрузка списка диалогов
     useEffect(() => {
@@ -147,6 +193,7 @@ const PrivateMessages = ({ currentUser, serverUrl, csrfToken, onClose }) => {
     setMessages(prev => [...prev, tempMessage]);
 
     ws.send(JSON.stringify({
+        stream: 'private',
         type: 'private_message',
         recipient_id: recipient_id,
         text: inputText
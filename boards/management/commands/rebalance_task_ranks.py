@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.db.models.functions import Length
+
+from boards.models import Task
+from boards.ranking import RANK_REBALANCE_LENGTH, rebalance_column
+
+
+class Command(BaseCommand):
+    help = 'Перенумеровывает ранги задач в колонках, где они стали слишком длинными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--column', type=int, help='Только эта колонка')
+        parser.add_argument('--min-length', type=int, default=RANK_REBALANCE_LENGTH // 2,
+                            help='Перебалансировать колонки, где есть ранг длиннее (по умолчанию %(default)s)')
+        parser.add_argument('--all', action='store_true', help='Все колонки, независимо от длины рангов')
+
+    def handle(self, *args, **options):
+        if options['column']:
+            column_ids = [options['column']]
+        else:
+            columns = Task.objects.values('column_id').annotate(longest=Max(Length('rank')))
+            if not options['all']:
+                columns = columns.filter(longest__gt=options['min_length'])
+            column_ids = [row['column_id'] for row in columns]
+
+        for column_id in column_ids:
+            count = rebalance_column(column_id)
+            self.stdout.write(f'Колонка {column_id}: {count} задач')
+        self.stdout.write(self.style.SUCCESS(f'Перебалансировано колонок: {len(column_ids)}'))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0003_alter_board_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
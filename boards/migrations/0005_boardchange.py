@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:21
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_board_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveBigIntegerField()),
+                ('entity', models.CharField(choices=[('board', 'board'), ('column', 'column'), ('task', 'task'), ('comment', 'comment')], max_length=10)),
+                ('action', models.CharField(choices=[('insert', 'insert'), ('update', 'update'), ('move', 'move'), ('delete', 'delete')], max_length=10)),
+                ('entity_id', models.PositiveBigIntegerField()),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='boards.board')),
+            ],
+            options={
+                'ordering': ['revision', 'id'],
+                'indexes': [models.Index(fields=['board', 'revision'], name='boards_boar_board_i_17239f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+from boards.ranking import spaced_ranks
+
+
+def fill_ranks(apps, schema_editor):
+    """Ранги по текущему порядку position в каждой колонке"""
+    Task = apps.get_model('boards', 'Task')
+    column_ids = Task.objects.values_list('column_id', flat=True).distinct()
+    for column_id in column_ids:
+        tasks = list(Task.objects.filter(column_id=column_id).order_by('position', 'id'))
+        for task, rank in zip(tasks, spaced_ranks(len(tasks))):
+            task.rank = rank
+        Task.objects.bulk_update(tasks, ['rank'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_boardchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'ordering': ['rank', 'id']},
+        ),
+        migrations.AlterUniqueTogether(
+            name='task',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(fill_ranks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('column', 'rank'), name='unique_task_rank_in_column'),
+        ),
+    ]
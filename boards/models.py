@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .ranking import rank_for_index, RANK_ATTEMPTS
 
 
 class Board(models.Model):
@@ -12,12 +15,20 @@ class Board(models.Model):
     members = models.ManyToManyField(User, related_name='shared_boards', blank=True)
     is_archived = models.BooleanField(default=False)
     position = models.IntegerField(default=0, verbose_name="Позиция")
+    # Растёт при каждом изменении содержимого доски (для ETag и синхронизации)
+    revision = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None  # проверяем, новая ли это доска
+        if not is_new and kwargs.get('update_fields') is None:
+            # Ревизию меняет только bump_board_revision, обычное сохранение её не перезаписывает
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'revision'
+            ]
         super().save(*args, **kwargs)
 
         # Автоматически добавляем владельца как участника
@@ -96,7 +107,11 @@ class Task(models.Model):
     creator = models.ForeignKey(User, on_delete=models.PROTECT)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    # Индекс в колонке на момент последней записи этой задачи; порядок задаёт rank,
+    # снапшот доски отдаёт position, пересчитанный по rank
     position = models.IntegerField(default=0)
+    # Дробный ключ порядка (boards/ranking.py): перемещение переписывает только эту строку
+    rank = models.CharField(max_length=64, default='', blank=True)
     priority = models.CharField(max_length=10, choices=PRIORITY, default='low')
     deadline = models.DateTimeField(null=True, blank=True)
     responsible = models.ManyToManyField(User, related_name='responsible_tasks', blank=True)
@@ -106,9 +121,23 @@ class Task(models.Model):
 
     def save(self, *args, **kwargs):
         if self.position is None or self.position < 0:  # Проверяем на None и отрицательные
-            last_task = Task.objects.filter(column=self.column).order_by('-position').first()
-            self.position = last_task.position + 1 if last_task else 0  # Начинаем с 0!
-        super().save(*args, **kwargs)
+            self.position = Task.objects.filter(column=self.column).count()
+        if self.rank:
+            super().save(*args, **kwargs)
+            return
+        # Новая задача без ранга - в конец колонки. Параллельное создание в той же
+        # колонке может занять этот ранг раньше: уникальность (column, rank) это поймает,
+        # и ранг считается заново
+        for attempt in range(RANK_ATTEMPTS):
+            self.rank = rank_for_index(self.column_id)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                self.rank = ''
+                if attempt == RANK_ATTEMPTS - 1:
+                    raise
 
     # Метод для проверки просроченности
     def is_overdue(self):
@@ -116,7 +145,10 @@ class Task(models.Model):
             return False
         return timezone.now() > self.deadline
     class Meta:
-        unique_together = ['column', 'position']
+        ordering = ['rank', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['column', 'rank'], name='unique_task_rank_in_column')
+        ]
 
 
 def task_file_path(instance, filename):
@@ -155,4 +187,36 @@ class Comment(models.Model):
         ordering = ['created']
 
     def __str__(self):
-        return f"{self.user.username} — {self.task.title}"
\ No newline at end of file
+        return f"{self.user.username} — {self.task.title}"
+
+class BoardChange(models.Model):
+    """Журнал изменений доски для инкрементальной синхронизации клиентов"""
+    ENTITY_CHOICES = [
+        ('board', 'board'),
+        ('column', 'column'),
+        ('task', 'task'),
+        ('comment', 'comment'),
+    ]
+    ACTION_CHOICES = [
+        ('insert', 'insert'),
+        ('update', 'update'),
+        ('move', 'move'),
+        ('delete', 'delete'),
+    ]
+
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='changes')
+    revision = models.PositiveBigIntegerField()  # ревизия доски, которую создало изменение
+    entity = models.CharField(max_length=10, choices=ENTITY_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    entity_id = models.PositiveBigIntegerField()
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)  # только изменённые поля
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['revision', 'id']
+        indexes = [
+            models.Index(fields=['board', 'revision']),  # выборка "всё после ревизии N"
+        ]
+
+    def __str__(self):
+        return f"{self.board_id}@{self.revision}: {self.action} {self.entity} {self.entity_id}"
@@ -0,0 +1,132 @@
+'''Единая проверка доступа к доске.
+Объект (доска/колонка/задача/файл), его доска и роль пользователя на ней
+грузятся одним запросом с подзапросами и запоминаются на время HTTP запроса.'''
+
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.http import Http404
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission, SAFE_METHODS
+
+from .models import Board, BoardPermit, Column, Task, TaskFile
+
+ROLE_OWNER = 'owner'
+ROLE_MEMBER = 'member'
+ROLE_VIEWER = 'viewer'
+# Роли, которым можно менять содержимое доски; viewer только смотрит
+WRITE_ROLES = (ROLE_OWNER, ROLE_MEMBER)
+
+# Вид объекта -> (модель, путь от объекта до доски)
+BOARD_PATHS = {
+    'board': (Board, ''),
+    'column': (Column, 'board'),
+    'task': (Task, 'column__board'),
+    'file': (TaskFile, 'task__column__board'),
+}
+
+
+class BoardAccess:
+    """Результат проверки: объект, его доска и роль пользователя (None - доступа нет)"""
+
+    def __init__(self, obj, board, role):
+        self.obj = obj
+        self.board = board
+        self.role = role
+
+    @property
+    def can_read(self):
+        return self.role is not None
+
+    @property
+    def can_write(self):
+        return self.role in WRITE_ROLES
+
+    @property
+    def is_owner(self):
+        return self.role == ROLE_OWNER
+
+
+def load_board_access(user, kind, pk):
+    """
+    Один запрос: объект + доска (select_related) + роль по BoardPermit
+    и членство в board.members (подзапросы). None, если объекта нет.
+    """
+    model, path = BOARD_PATHS[kind]
+    board_ref = OuterRef(f'{path}__id' if path else 'id')
+    user_id = user.id if user.is_authenticated else None
+
+    queryset = model.objects.annotate(
+        permit_role=Subquery(
+            BoardPermit.objects.filter(board_id=board_ref, user_id=user_id).values('role')[:1]
+        ),
+        is_board_member=Exists(
+            Board.members.through.objects.filter(board_id=board_ref, user_id=user_id)
+        ),
+    )
+    if path:
+        queryset = queryset.select_related(path)
+
+    obj = queryset.filter(pk=pk).first()
+    if obj is None:
+        return None
+
+    board = obj
+    for attr in filter(None, path.split('__')):
+        board = getattr(board, attr)
+
+    if user_id is not None and board.owner_id == user_id:
+        role = ROLE_OWNER
+    elif obj.permit_role:
+        role = obj.permit_role
+    elif obj.is_board_member:
+        role = ROLE_MEMBER
+    else:
+        role = None
+    return BoardAccess(obj, board, role)
+
+
+def readable_boards_q(user, board_path='board'):
+    """
+    Условие "доска доступна пользователю" для фильтра по связанной модели
+    (board_path - путь до доски, например 'room__board'). Подзапросы EXISTS вместо JOIN
+    по участникам, чтобы строки не размножались.
+    """
+    board_ref = OuterRef(f'{board_path}_id')
+    return (
+        Q(**{f'{board_path}__owner': user})
+        | Exists(Board.members.through.objects.filter(board_id=board_ref, user_id=user.id))
+        | Exists(BoardPermit.objects.filter(board_id=board_ref, user_id=user.id))
+    )
+
+
+def get_board_access(request, kind, pk):
+    """load_board_access с запоминанием на время запроса; 404, если объекта нет"""
+    cache = getattr(request, '_board_access_cache', None)
+    if cache is None:
+        cache = request._board_access_cache = {}
+
+    key = (kind, int(pk))
+    if key not in cache:
+        cache[key] = load_board_access(request.user, kind, pk)
+    if cache[key] is None:
+        raise Http404
+    return cache[key]
+
+
+class HasBoardRole(BasePermission):
+    """
+    Доступ к доске объекта из url. На view задаётся board_lookup = (вид, имя kwarg),
+    например ('task', 'pk'). Читать может любая роль, менять - owner и member.
+    Результат кладётся во view.board_access.
+    """
+
+    def has_permission(self, request, view):
+        kind, kwarg = view.board_lookup
+        access = get_board_access(request, kind, view.kwargs[kwarg])
+
+        if not access.can_read:
+            raise PermissionDenied({"error": "Нет доступа к этой доске"})
+        if request.method not in SAFE_METHODS and not access.can_write:
+            raise PermissionDenied({"error": "Недостаточно прав: доска доступна только для просмотра"})
+
+        view.board_access = access
+        return True
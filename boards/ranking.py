@@ -0,0 +1,108 @@
+'''Дробный порядок задач в колонке (в духе LexoRank).
+Ранг - строка base36, задачи сортируются по ней лексикографически.
+Вставка между двумя соседями пишет только перемещаемую строку;
+когда ранги становятся слишком длинными, колонка перенумеровывается целиком.'''
+
+from django.conf import settings
+from django.db import transaction
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# После какой длины ранга колонку пора перенумеровать (поле Task.rank - 64 символа)
+RANK_REBALANCE_LENGTH = getattr(settings, 'TASK_RANK_REBALANCE_LENGTH', 32)
+
+# Сколько раз пересчитать ранг, если параллельная запись в ту же колонку заняла его первой
+RANK_ATTEMPTS = 3
+
+
+def rank_between(before=None, after=None):
+    """
+    Ранг строго между before и after (None - край колонки).
+    Ранги никогда не заканчиваются на '0', поэтому перед любым рангом есть место.
+    """
+    before = before or ''
+    after = after or None
+    if after is not None and before >= after:
+        raise ValueError(f'Ранги не по порядку: {before!r} >= {after!r}')
+
+    result = []
+    i = 0
+    while True:
+        lo = DIGITS.index(before[i]) if i < len(before) else 0
+        hi = DIGITS.index(after[i]) if after is not None and i < len(after) else BASE
+        if hi - lo > 1:
+            result.append(DIGITS[(lo + hi) // 2])
+            return ''.join(result)
+        result.append(DIGITS[lo])
+        if hi - lo == 1:
+            # Префикс уже меньше after - дальше ограничивает только before
+            after = None
+        i += 1
+
+
+def spaced_ranks(count):
+    """count рангов, равномерно разнесённых по диапазону - для начальной нумерации и перебалансировки"""
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    step = BASE ** width // (count + 1)
+
+    ranks = []
+    for n in range(1, count + 1):
+        value = n * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        # Ширина одинаковая, так что хвостовые нули можно срезать без смены порядка
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
+
+
+def rank_for_index(column_id, index=None, exclude_id=None):
+    """
+    Ранг для задачи, которая должна встать index-й в колонке (None - в конец).
+    Читает не больше двух соседних рангов.
+    """
+    from .models import Task
+
+    ranks = Task.objects.filter(column_id=column_id).order_by('rank', 'id')
+    if exclude_id is not None:
+        ranks = ranks.exclude(id=exclude_id)
+    ranks = ranks.values_list('rank', flat=True)
+
+    if index is None:
+        last = ranks.reverse().first()
+        return rank_between(last, None)
+
+    index = max(int(index), 0)
+    if index == 0:
+        return rank_between(None, ranks.first())
+    neighbours = list(ranks[index - 1:index + 1])
+    if not neighbours:
+        # Индекс за концом колонки - ставим в конец
+        return rank_between(ranks.reverse().first(), None)
+    return rank_between(neighbours[0], neighbours[1] if len(neighbours) > 1 else None)
+
+
+def rebalance_column(column_id):
+    """
+    Перенумеровывает ранги колонки с равными промежутками, порядок задач не меняется.
+    Два прохода: сначала временные ранги, чтобы не упереться в уникальность (column, rank).
+    """
+    from .models import Task
+
+    with transaction.atomic():
+        tasks = list(Task.objects.select_for_update().filter(column_id=column_id).order_by('rank', 'id').only('id', 'rank'))
+        for task in tasks:
+            task.rank = f'~{task.id}'
+        Task.objects.bulk_update(tasks, ['rank'])
+        for task, rank in zip(tasks, spaced_ranks(len(tasks))):
+            task.rank = rank
+        Task.objects.bulk_update(tasks, ['rank'])
+    return len(tasks)
+
+
+def needs_rebalance(rank):
+    return len(rank) > RANK_REBALANCE_LENGTH
@@ -0,0 +1,113 @@
+'''Пакетная перестановка колонок и задач доски одной транзакцией и одной ревизией'''
+
+from django.db import transaction
+
+from .models import Board, Column, Task
+from .ranking import spaced_ranks
+from .changes import record_board_changes
+
+
+class ReorderError(Exception):
+    """Порядок неполный или ссылается на чужие колонки/задачи"""
+
+
+def _id_list(value, name):
+    if not isinstance(value, list):
+        raise ReorderError(f'{name}: ожидается список id')
+    try:
+        ids = [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise ReorderError(f'{name}: ожидается список id')
+    if len(set(ids)) != len(ids):
+        raise ReorderError(f'{name}: id повторяются')
+    return ids
+
+
+def parse_board_order(board, columns=None, tasks=None):
+    """
+    Проверяет новый порядок.
+    columns - все id колонок доски в новом порядке.
+    tasks - {column_id: [task_id, ...]}: для каждой упомянутой колонки полный список задач;
+    задачи могут переходить только между упомянутыми колонками.
+    Возвращает (column_ids, {column_id: task_ids}).
+    """
+    if columns is None and tasks is None:
+        raise ReorderError('Нужен порядок columns и/или tasks')
+
+    board_column_ids = set(Column.objects.filter(board=board).values_list('id', flat=True))
+
+    column_ids = None
+    if columns is not None:
+        column_ids = _id_list(columns, 'columns')
+        if set(column_ids) != board_column_ids:
+            raise ReorderError('columns: нужны все колонки доски, и только они')
+
+    task_order = {}
+    if tasks is not None:
+        if not isinstance(tasks, dict):
+            raise ReorderError('tasks: ожидается {column_id: [task_id, ...]}')
+        for column_id, task_ids in tasks.items():
+            try:
+                column_id = int(column_id)
+            except (TypeError, ValueError):
+                raise ReorderError('tasks: ожидается {column_id: [task_id, ...]}')
+            if column_id not in board_column_ids:
+                raise ReorderError(f'tasks: колонка {column_id} не из этой доски')
+            task_order[column_id] = _id_list(task_ids, f'tasks[{column_id}]')
+
+        listed = [task_id for task_ids in task_order.values() for task_id in task_ids]
+        current = set(Task.objects.filter(column_id__in=task_order).values_list('id', flat=True))
+        if len(set(listed)) != len(listed) or set(listed) != current:
+            raise ReorderError('tasks: нужны все задачи перечисленных колонок, каждая ровно один раз')
+
+    return column_ids, task_order
+
+
+def apply_board_order(board, column_ids, task_order):
+    """
+    Применяет проверенный порядок пакетными UPDATE и записывает одну ревизию.
+    Уникальность (board, position) и (column, rank) обходится в два прохода:
+    сначала временные значения, потом итоговые.
+    Возвращает новую ревизию доски; пустой порядок (нет ни колонок, ни задач)
+    ревизию не меняет - ревизия без строк журнала дала бы клиентам ложный 410.
+    """
+    changes = {}
+
+    with transaction.atomic():
+        if column_ids:
+            columns = list(Column.objects.select_for_update().filter(board=board))
+            by_id = {column.id: column for column in columns}
+            offset = max(column.position for column in columns) + 1
+            for index, column_id in enumerate(column_ids):
+                by_id[column_id].position = offset + index
+            Column.objects.bulk_update(columns, ['position'])
+            for index, column_id in enumerate(column_ids, start=1):
+                by_id[column_id].position = index
+                changes[('column', column_id)] = {'position': index}
+            Column.objects.bulk_update(columns, ['position'])
+
+        if task_order:
+            tasks = list(Task.objects.select_for_update().filter(column_id__in=task_order).only('id', 'column_id', 'rank'))
+            by_id = {task.id: task for task in tasks}
+            old_columns = {task.id: task.column_id for task in tasks}
+            for task in tasks:
+                task.rank = f'~{task.id}'
+            Task.objects.bulk_update(tasks, ['rank'])
+
+            for column_id, task_ids in task_order.items():
+                for index, (task_id, rank) in enumerate(zip(task_ids, spaced_ranks(len(task_ids)))):
+                    task = by_id[task_id]
+                    task.column_id = column_id
+                    task.rank = rank
+                    task.position = index
+                    if old_columns[task_id] != column_id:
+                        changes[('task', task_id)] = {'column': column_id, 'position': index, 'rank': rank}
+                changes.setdefault(('column', column_id), {})['task_ids'] = task_ids
+            Task.objects.bulk_update(tasks, ['column', 'rank', 'position'])
+
+        if not changes:
+            return Board.objects.values_list('revision', flat=True).get(id=board.id)
+        return record_board_changes(board.id, [
+            (entity, 'move' if entity == 'task' else 'update', entity_id, data)
+            for (entity, entity_id), data in changes.items()
+        ])
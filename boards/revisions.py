@@ -0,0 +1,27 @@
+'''Ревизия доски: счётчик, который увеличивается при каждом изменении
+колонок, задач, комментариев, файлов или ответственных'''
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Board
+
+
+def bump_board_revision(board_id):
+    """Увеличивает ревизию доски и возвращает новое значение"""
+    with transaction.atomic():
+        Board.objects.filter(id=board_id).update(revision=F('revision') + 1)
+        return Board.objects.filter(id=board_id).values_list('revision', flat=True).first()
+
+
+def board_etag(board_id, revision, view='full', generation=None):
+    """
+    Сильный ETag снапшота доски (у каждого варианта ?view= свой).
+    generation - поколение кэша снапшота (boards/board_cache.py): меняется при правках мимо ревизии.
+    """
+    etag = f'board-{board_id}-r{revision}'
+    if generation is not None:
+        etag += f'-g{generation}'
+    if view != 'full':
+        etag += f'-{view}'
+    return f'"{etag}"'
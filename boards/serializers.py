@@ -34,6 +34,7 @@ class TaskSerializer(serializers.ModelSerializer):
     creator = UserSerializer(read_only=True)  # информация о создателе задачи
     comments = CommentSerializer(many=True, read_only=True)
     responsible = UserSerializer(many=True, read_only=True)
+    rank = serializers.CharField(read_only=True)  # меняется только перемещением
     responsible_ids = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=User.objects.all(),
@@ -44,7 +45,7 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'position', 'creator', 'created', 'updated', 'files', 'comments',
+        fields = ['id', 'title', 'description', 'position', 'rank', 'creator', 'created', 'updated', 'files', 'comments',
                   'priority', 'deadline','responsible', 'responsible_ids', ]
 
 
@@ -83,6 +84,29 @@ class ColumnSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'position', 'tasks']
 
 
+# Облегчённая карточка задачи для ?view=summary: без описания, комментариев и профилей
+class TaskSummarySerializer(serializers.ModelSerializer):
+    responsible_ids = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(read_only=True)  # аннотации из snapshot
+    files_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'priority', 'deadline', 'position', 'rank', 'responsible_ids', 'comments_count',
+                  'files_count']
+
+    def get_responsible_ids(self, obj):
+        return [user.id for user in obj.responsible.all()]
+
+
+class ColumnSummarySerializer(serializers.ModelSerializer):
+    tasks = TaskSummarySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Column
+        fields = ['id', 'title', 'position', 'tasks']
+
+
 # Сериализатор доски
 class BoardSerializer(serializers.ModelSerializer):
     columns = ColumnSerializer(many=True, read_only=True)  # вложенные колонки
@@ -90,7 +114,16 @@ class BoardSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Board
-        fields = ['id', 'title', 'owner', 'created', 'updated', 'columns','is_archived']
+        fields = ['id', 'title', 'owner', 'created', 'updated', 'columns','is_archived', 'revision']
+
+
+class BoardSummarySerializer(serializers.ModelSerializer):
+    columns = ColumnSummarySerializer(many=True, read_only=True)
+    owner = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Board
+        fields = ['id', 'title', 'owner', 'created', 'updated', 'columns', 'is_archived', 'revision']
 
 
 # Сериализатор допусков
@@ -0,0 +1,64 @@
+'''Загрузка полного дерева доски (колонки → задачи → комментарии/файлы/ответственные)
+за фиксированное число запросов, независимо от размера доски'''
+
+from django.contrib.auth.models import User
+from django.db.models import Prefetch, Count
+from django.shortcuts import get_object_or_404
+
+from .models import Board, Column, Task, Comment
+
+
+def board_snapshot_queryset():
+    """
+    QuerySet доски со всеми вложенными данными для BoardSerializer.
+    Запросы: доска+владелец, колонки, задачи+создатели, комментарии,
+    ответственные, файлы — всего 6, сколько бы ни было задач.
+    """
+    tasks = Task.objects.select_related('creator__profile').order_by('rank', 'id').prefetch_related(
+        Prefetch('comments', queryset=Comment.objects.select_related('user')),
+        Prefetch('responsible', queryset=User.objects.select_related('profile')),
+        'files',
+    )
+    columns = Column.objects.prefetch_related(Prefetch('tasks', queryset=tasks))
+
+    return Board.objects.select_related('owner__profile').prefetch_related(
+        Prefetch('columns', queryset=columns)
+    )
+
+
+def board_summary_queryset():
+    """
+    QuerySet доски для BoardSummarySerializer: только поля карточек,
+    id ответственных и счётчики комментариев/файлов. 4 запроса.
+    """
+    tasks = Task.objects.defer('description').order_by('rank', 'id').annotate(
+        comments_count=Count('comments', distinct=True),
+        files_count=Count('files', distinct=True),
+    ).prefetch_related(
+        Prefetch('responsible', queryset=User.objects.only('id')),
+    )
+    columns = Column.objects.prefetch_related(Prefetch('tasks', queryset=tasks))
+
+    return Board.objects.select_related('owner__profile').prefetch_related(
+        Prefetch('columns', queryset=columns)
+    )
+
+
+def task_detail_queryset():
+    """Одна задача со всем, что показывает модальное окно"""
+    return Task.objects.select_related('creator__profile', 'column__board').prefetch_related(
+        Prefetch('comments', queryset=Comment.objects.select_related('user')),
+        Prefetch('responsible', queryset=User.objects.select_related('profile')),
+        'files',
+    )
+
+
+def load_board_snapshot(board_id, summary=False):
+    """Доска целиком (или только карточки) для отдачи в реакт, 404 если доски нет"""
+    queryset = board_summary_queryset() if summary else board_snapshot_queryset()
+    board = get_object_or_404(queryset, id=board_id)
+    # Порядок задаёт rank; position в ответе - индекс в колонке, как ждёт фронт
+    for column in board.columns.all():
+        for index, task in enumerate(column.tasks.all()):
+            task.position = index
+    return board
@@ -2,9 +2,18 @@ import pytest
 from django.contrib.auth import get_user_model
 from boards.models import Board, Column, Task, Comment
 from rest_framework.test import APIClient
+from django.core.cache import cache
 
 User = get_user_model()
 
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш снапшотов не должен переживать тест: id досок переиспользуются."""
+    cache.clear()
+    yield
+    cache.clear()
+
 @pytest.fixture
 def user():
     """Создает тестового пользователя."""
@@ -0,0 +1,82 @@
+import pytest
+from django.urls import reverse
+from boards.models import Task, Comment
+from boards.board_cache import get_cached_snapshot, set_cached_snapshot, snapshot_generation, invalidate_board_snapshot
+
+
+@pytest.mark.django_db
+class TestBoardSnapshotCache:
+
+    def get_board(self, client, board):
+        return client.get(reverse('board-list', kwargs={'pk': board.id}))
+
+    def test_second_request_served_from_cache(self, authenticated_client, board, task,
+                                              django_assert_num_queries):
+        first = self.get_board(authenticated_client, board)
+        assert get_cached_snapshot(board.id, 0) == first.content
+
+        # Только чтение ревизии, без сериализации
+        with django_assert_num_queries(1):
+            second = self.get_board(authenticated_client, board)
+        assert second.content == first.content
+
+    def test_mutation_view_refreshes_snapshot(self, authenticated_client, board, task):
+        self.get_board(authenticated_client, board)
+        authenticated_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'Новое'})
+
+        data = self.get_board(authenticated_client, board).json()
+        assert data['columns'][0]['tasks'][0]['title'] == 'Новое'
+
+    def test_orm_change_invalidates(self, authenticated_client, board, task, user):
+        self.get_board(authenticated_client, board)
+
+        # Изменение мимо view: ревизия та же, но сигнал сбрасывает кэш
+        Comment.objects.create(task=task, user=user, text='из админки')
+        assert get_cached_snapshot(board.id, 0) is None
+
+        data = self.get_board(authenticated_client, board).json()
+        assert data['columns'][0]['tasks'][0]['comments'][0]['text'] == 'из админки'
+
+    def test_responsible_change_invalidates(self, authenticated_client, board, task, user2):
+        self.get_board(authenticated_client, board)
+        task.responsible.add(user2)
+        assert get_cached_snapshot(board.id, 0) is None
+
+        self.get_board(authenticated_client, board)
+        user2.responsible_tasks.remove(task)
+        assert get_cached_snapshot(board.id, 0) is None
+
+    def test_task_delete_invalidates(self, authenticated_client, board, task):
+        self.get_board(authenticated_client, board)
+        Task.objects.filter(id=task.id).delete()
+        assert get_cached_snapshot(board.id, 0) is None
+
+    def test_orm_change_changes_etag(self, authenticated_client, board, task, user):
+        etag = self.get_board(authenticated_client, board)['ETag']
+
+        # Ревизия та же (мимо record_board_change), но 304 на старый ETag уже нельзя
+        Comment.objects.create(task=task, user=user, text='из админки')
+        response = authenticated_client.get(reverse('board-list', kwargs={'pk': board.id}), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['columns'][0]['tasks'][0]['comments'][0]['text'] == 'из админки'
+
+    def test_username_change_invalidates(self, authenticated_client, board, task, user):
+        etag = self.get_board(authenticated_client, board)['ETag']
+        user.username = 'renamed'
+        user.save()
+
+        response = authenticated_client.get(reverse('board-list', kwargs={'pk': board.id}), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+
+    def test_login_keeps_snapshot(self, authenticated_client, board, user):
+        self.get_board(authenticated_client, board)
+        user.save(update_fields=['last_login'])
+        assert get_cached_snapshot(board.id, 0) is not None
+
+    def test_render_started_before_invalidation_not_cached(self, board):
+        generation = snapshot_generation(board.id)
+        invalidate_board_snapshot(board.id)
+        # Рендер, прочитавший базу до правки, дописывает результат уже после неё
+        set_cached_snapshot(board.id, 0, b'{}', generation=generation)
+        assert get_cached_snapshot(board.id, 0) is None
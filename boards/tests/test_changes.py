@@ -0,0 +1,93 @@
+import pytest
+from django.urls import reverse
+from boards.models import Column, Task, BoardChange
+from boards.changes import board_changes_since, record_board_change, HistoryTrimmed
+from boards.revisions import bump_board_revision
+
+
+@pytest.mark.django_db
+class TestBoardChangesSince:
+
+    def test_nothing_changed(self, board):
+        assert board_changes_since(board, 0) == []
+
+    def test_updates_are_merged(self, board, task):
+        record_board_change(board.id, 'task', 'update', task.id, {'title': 'A'})
+        record_board_change(board.id, 'task', 'update', task.id, {'priority': 'high'})
+        record_board_change(board.id, 'task', 'update', task.id, {'title': 'B'})
+        board.refresh_from_db()
+
+        changes = board_changes_since(board, 0)
+        assert changes == [{
+            'entity': 'task', 'id': task.id, 'action': 'update', 'revision': 3,
+            'data': {'title': 'B', 'priority': 'high'},
+        }]
+        assert board_changes_since(board, 2)[0]['data'] == {'title': 'B'}
+
+    def test_insert_then_delete_is_dropped(self, board):
+        record_board_change(board.id, 'column', 'insert', 10, {'title': 'Новая'})
+        record_board_change(board.id, 'column', 'delete', 10)
+        board.refresh_from_db()
+
+        assert board_changes_since(board, 0) == []
+        assert board_changes_since(board, 1)[0]['action'] == 'delete'
+
+    def test_trimmed_history(self, board):
+        bump_board_revision(board.id)  # ревизия без записи в журнале
+        record_board_change(board.id, 'board', 'update', board.id, {'title': 'X'})
+        board.refresh_from_db()
+
+        with pytest.raises(HistoryTrimmed):
+            board_changes_since(board, 0)
+        assert len(board_changes_since(board, 1)) == 1
+
+    def test_client_ahead_of_server(self, board):
+        with pytest.raises(HistoryTrimmed):
+            board_changes_since(board, 5)
+
+
+@pytest.mark.django_db
+class TestBoardChangesAPI:
+
+    def url(self, board, since):
+        return reverse('board-changes', kwargs={'pk': board.id}) + f'?since={since}'
+
+    def test_views_record_changes(self, authenticated_client, board, column, task):
+        other = Column.objects.create(board=board, title='Готово', position=2)
+        authenticated_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'Новое'})
+        authenticated_client.patch(reverse('task-move', kwargs={'pk': task.id}),
+                                   {'column': other.id, 'position': 0}, format='json')
+        authenticated_client.post(reverse('add-comment', kwargs={'task_id': task.id}), {'text': 'Привет'})
+
+        response = authenticated_client.get(self.url(board, 0))
+        assert response.status_code == 200
+        assert response.data['revision'] == 3
+
+        changes = {(c['entity'], c['id']): c for c in response.data['changes']}
+        task.refresh_from_db()
+        assert changes[('task', task.id)]['data'] == {
+            'title': 'Новое', 'column': other.id, 'position': 0, 'rank': task.rank,
+        }
+        assert changes[('column', other.id)]['data'] == {'task_ids': [task.id]}
+        assert changes[('column', column.id)]['data'] == {'task_ids': []}
+        comment = [c for c in response.data['changes'] if c['entity'] == 'comment'][0]
+        assert comment['action'] == 'insert'
+        assert comment['data']['text'] == 'Привет'
+
+    def test_snapshot_required_when_trimmed(self, authenticated_client, board):
+        bump_board_revision(board.id)
+        bump_board_revision(board.id)
+
+        response = authenticated_client.get(self.url(board, 0))
+        assert response.status_code == 410
+        assert response.data['snapshot_required'] is True
+        assert response.data['revision'] == 2
+
+    def test_since_required(self, authenticated_client, board):
+        response = authenticated_client.get(reverse('board-changes', kwargs={'pk': board.id}))
+        assert response.status_code == 400
+
+    def test_no_access(self, api_client, board, user2):
+        api_client.force_authenticate(user=user2)
+        response = api_client.get(self.url(board, 0))
+        assert response.status_code == 403
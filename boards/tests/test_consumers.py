@@ -0,0 +1,74 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from boards.changes import record_board_change
+from boards.models import BoardPermit
+from boards.routing import websocket_urlpatterns
+from boards.consumers import ACCESS_REVOKED_CLOSE_CODE
+
+application = URLRouter(websocket_urlpatterns)
+
+
+def connect(board_id, user):
+    communicator = WebsocketCommunicator(application, f'/ws/board/{board_id}/')
+    communicator.scope['user'] = user
+    return communicator
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBoardConsumer:
+
+    def test_hello_with_current_revision(self, board, user):
+        record_board_change(board.id, 'board', 'update', board.id, {'title': 'Новое'})
+
+        async def run():
+            communicator = connect(board.id, user)
+            connected, _ = await communicator.connect()
+            assert connected
+            hello = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return hello
+
+        assert async_to_sync(run)() == {'type': 'hello', 'board_id': board.id, 'revision': 1}
+
+    def test_change_is_broadcast_after_commit(self, board, column, user2):
+        BoardPermit.objects.create(board=board, user=user2, role='viewer')
+
+        async def run():
+            communicator = connect(board.id, user2)
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await database_sync_to_async(record_board_change)(
+                board.id, 'column', 'update', column.id, {'title': 'Готово'}
+            )
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return frame
+
+        assert async_to_sync(run)() == {
+            'type': 'changes',
+            'revision': 1,
+            'changes': [{'entity': 'column', 'action': 'update', 'id': column.id, 'data': {'title': 'Готово'}}],
+        }
+
+    def test_stranger_is_rejected(self, board, user2):
+        async def run():
+            communicator = connect(board.id, user2)
+            connected, _ = await communicator.connect()
+            return connected
+
+        assert async_to_sync(run)() is False
+
+    def test_revoked_permit_closes_socket(self, board, user2):
+        permit = BoardPermit.objects.create(board=board, user=user2, role='member')
+
+        async def run():
+            communicator = connect(board.id, user2)
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await database_sync_to_async(permit.delete)()
+            return await communicator.receive_output()
+
+        assert async_to_sync(run)() == {'type': 'websocket.close', 'code': ACCESS_REVOKED_CLOSE_CODE}
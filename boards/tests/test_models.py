@@ -1,4 +1,5 @@
 import pytest
+from django.db import IntegrityError
 from django.contrib.auth import get_user_model
 from boards.models import Board, Column, Task, TaskFile, Comment
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -99,23 +100,30 @@ class TestTaskModel:
         assert task.created is not None  # auto_now_add
         assert task.priority == 'low'  # значение по умолчанию
     
-    def test_task_position_unique_in_column(self, column, user):
-        """Проверка уникальности позиции в пределах колонки."""
+    def test_task_rank_unique_in_column(self, column, user):
+        """Проверка уникальности ранга в пределах колонки."""
         Task.objects.create(
             title='Задача 1',
             column=column,
-            position=1,
+            rank='i',
             creator=user
         )
-        
-        with pytest.raises(Exception):  # если есть unique_together
+
+        with pytest.raises(IntegrityError):
             Task.objects.create(
                 title='Задача 2',
                 column=column,
-                position=1,
+                rank='i',
                 creator=user
             )
-    
+
+    def test_new_tasks_appended_by_rank(self, column, user):
+        """Новые задачи без ранга встают в конец колонки."""
+        first = Task.objects.create(title='Задача 1', column=column, creator=user)
+        second = Task.objects.create(title='Задача 2', column=column, creator=user)
+        assert first.rank < second.rank
+        assert list(column.tasks.all()) == [first, second]
+
     def test_task_can_move_to_another_column(self, board, column, user):
         """Проверка перемещения задачи между колонками."""
         column2 = Column.objects.create(title='Done', board=board, position=2)
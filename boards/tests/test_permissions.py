@@ -0,0 +1,71 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django.urls import reverse
+from boards.models import BoardPermit
+from boards.permissions import load_board_access, get_board_access
+
+
+@pytest.mark.django_db
+class TestBoardAccessResolver:
+
+    def test_single_query_for_task(self, task, user, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            access = load_board_access(user, 'task', task.id)
+            assert access.board.id == task.column.board_id
+        assert access.obj == task
+        assert access.role == 'owner'
+
+    @pytest.mark.parametrize('role', ['member', 'viewer'])
+    def test_role_from_permit(self, task, board, user2, role):
+        BoardPermit.objects.create(board=board, user=user2, role=role)
+        access = load_board_access(user2, 'task', task.id)
+        assert access.role == role
+        assert access.can_read
+        assert access.can_write == (role == 'member')
+
+    def test_board_members_are_members(self, board, user2):
+        board.members.add(user2)
+        assert load_board_access(user2, 'board', board.id).role == 'member'
+
+    def test_stranger_and_anonymous(self, board, user2):
+        assert load_board_access(user2, 'board', board.id).role is None
+        assert load_board_access(AnonymousUser(), 'board', board.id).role is None
+
+    def test_missing_object(self, user):
+        assert load_board_access(user, 'task', 999999) is None
+
+    def test_memoized_per_request(self, task, user, django_assert_num_queries):
+        request = RequestFactory().get('/')
+        request.user = user
+        get_board_access(request, 'task', task.id)
+        with django_assert_num_queries(0):
+            assert get_board_access(request, 'task', task.id).role == 'owner'
+
+
+@pytest.mark.django_db
+class TestHasBoardRole:
+
+    def test_viewer_can_read_but_not_write(self, api_client, board, task, user2):
+        BoardPermit.objects.create(board=board, user=user2, role='viewer')
+        api_client.force_authenticate(user=user2)
+
+        assert api_client.get(reverse('task-detail', kwargs={'pk': task.id})).status_code == 200
+        response = api_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'Нельзя'})
+        assert response.status_code == 403
+        assert 'error' in response.json()
+        task.refresh_from_db()
+        assert task.title == 'Тестовая задача'
+
+    def test_member_can_write(self, api_client, board, task, user2):
+        BoardPermit.objects.create(board=board, user=user2, role='member')
+        api_client.force_authenticate(user=user2)
+        response = api_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'Можно'})
+        assert response.status_code == 200
+
+    def test_stranger_forbidden(self, api_client, task, user2):
+        api_client.force_authenticate(user=user2)
+        assert api_client.get(reverse('task-detail', kwargs={'pk': task.id})).status_code == 403
+
+    def test_missing_task_404(self, authenticated_client):
+        assert authenticated_client.patch(reverse('task-rename', kwargs={'pk': 999999}), {'title': 'x'}).status_code == 404
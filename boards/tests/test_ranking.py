@@ -0,0 +1,130 @@
+import random
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from boards.models import Column, Task
+from boards.ranking import rank_between, rank_for_index, spaced_ranks, rebalance_column
+
+
+class TestRankBetween:
+
+    @pytest.mark.parametrize('before, after', [
+        (None, None), (None, '1'), (None, '01'), ('z', None), ('a', 'b'), ('a', 'a1'), ('az', 'b'), ('i', 'i01'),
+    ])
+    def test_strictly_between(self, before, after):
+        rank = rank_between(before, after)
+        assert (before or '') < rank
+        assert after is None or rank < after
+        assert not rank.endswith('0')
+
+    def test_wrong_order(self):
+        with pytest.raises(ValueError):
+            rank_between('b', 'a')
+
+    def test_random_inserts_keep_order(self):
+        rng = random.Random(0)
+        ranks = []
+        for _ in range(500):
+            index = rng.randint(0, len(ranks))
+            before = ranks[index - 1] if index > 0 else None
+            after = ranks[index] if index < len(ranks) else None
+            ranks.insert(index, rank_between(before, after))
+        assert ranks == sorted(ranks)
+        assert len(set(ranks)) == len(ranks)
+
+    @pytest.mark.parametrize('count', [0, 1, 35, 36, 1000])
+    def test_spaced_ranks_sorted_and_unique(self, count):
+        ranks = spaced_ranks(count)
+        assert len(ranks) == count
+        assert ranks == sorted(ranks)
+        assert len(set(ranks)) == count
+        assert all(rank and not rank.endswith('0') for rank in ranks)
+
+
+@pytest.mark.django_db
+class TestTaskMoveByRank:
+
+    def make_tasks(self, column, user, count):
+        return [Task.objects.create(column=column, title=f'Задача {i}', creator=user) for i in range(count)]
+
+    def order(self, column):
+        return list(Task.objects.filter(column=column).values_list('id', flat=True))
+
+    def test_move_writes_only_moved_row(self, authenticated_client, column, user):
+        tasks = self.make_tasks(column, user, 10)
+        before = dict(Task.objects.values_list('id', 'rank'))
+
+        response = authenticated_client.patch(reverse('task-move', kwargs={'pk': tasks[8].id}),
+                                              {'column': column.id, 'position': 2}, format='json')
+        assert response.status_code == 200
+        assert response.data['position'] == 2
+
+        after = dict(Task.objects.values_list('id', 'rank'))
+        assert [tid for tid in before if before[tid] != after[tid]] == [tasks[8].id]
+        expected = [t.id for t in tasks[:2]] + [tasks[8].id] + [t.id for t in tasks[2:8]] + [tasks[9].id]
+        assert self.order(column) == expected
+
+    def test_move_to_other_column_end(self, authenticated_client, board, column, user):
+        tasks = self.make_tasks(column, user, 3)
+        other = Column.objects.create(board=board, title='Готово', position=2)
+        existing = self.make_tasks(other, user, 2)
+
+        response = authenticated_client.patch(reverse('task-move', kwargs={'pk': tasks[0].id}),
+                                              {'column': other.id, 'position': 99}, format='json')
+        assert response.status_code == 200
+        assert response.data['position'] == 2
+        assert self.order(other) == [existing[0].id, existing[1].id, tasks[0].id]
+        assert self.order(column) == [tasks[1].id, tasks[2].id]
+
+    def test_repeated_head_moves_trigger_rebalance(self, authenticated_client, column, user, monkeypatch):
+        monkeypatch.setattr('boards.ranking.RANK_REBALANCE_LENGTH', 3)
+        tasks = self.make_tasks(column, user, 4)
+        # Всё время кладём в начало колонки - ранг первой позиции растёт, пока колонку не перенумеруют
+        for i in range(30):
+            authenticated_client.patch(reverse('task-move', kwargs={'pk': tasks[i % 4].id}),
+                                       {'column': column.id, 'position': 0}, format='json')
+            assert max(len(rank) for rank in Task.objects.values_list('rank', flat=True)) <= 3
+        assert self.order(column)[0] == tasks[29 % 4].id
+
+    def test_create_retries_taken_rank(self, authenticated_client, column, user, monkeypatch):
+        # Параллельное создание успело занять ранг конца колонки между чтением и записью
+        first = Task.objects.create(column=column, title='Первая', creator=user)
+        ranks = iter([first.rank])
+        monkeypatch.setattr('boards.models.rank_for_index',
+                            lambda column_id: next(ranks, None) or rank_for_index(column_id))
+
+        response = authenticated_client.post(reverse('task-create', kwargs={'column_id': column.id}),
+                                             {'title': 'Вторая'}, format='json')
+        assert response.status_code == 201
+        second = Task.objects.get(id=response.data['id'])
+        assert first.rank < second.rank
+        assert self.order(column) == [first.id, second.id]
+
+    @pytest.mark.parametrize('route, data', [
+        ('task-rename', {'title': 'Новое'}),
+        ('task-update-description', {'description': 'Текст'}),
+        ('task-priority-update', {'priority': 'high'}),
+        ('task-deadline', {'deadline': None}),
+    ])
+    def test_field_edits_do_not_overwrite_rank(self, authenticated_client, column, user, route, data):
+        # Правка одного поля не пишет rank/column/position и не откатывает параллельное перемещение
+        task = self.make_tasks(column, user, 1)[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.patch(reverse(route, kwargs={'pk': task.id}), data, format='json')
+        assert response.status_code == 200
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "boards_task"')]
+        assert updates
+        assert not any('"rank"' in sql or '"column_id"' in sql or '"position"' in sql for sql in updates)
+
+    def test_rebalance_keeps_order(self, column, user):
+        tasks = self.make_tasks(column, user, 5)
+        order = self.order(column)
+        rebalance_column(column.id)
+        assert self.order(column) == order
+
+    def test_rebalance_command(self, column, user):
+        Task.objects.create(column=column, title='Длинный', rank='i' * 40, creator=user)
+        call_command('rebalance_task_ranks')
+        assert Task.objects.get(column=column).rank == spaced_ranks(1)[0]
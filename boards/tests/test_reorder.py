@@ -0,0 +1,91 @@
+import pytest
+from django.urls import reverse
+from boards.models import Board, Column, Task, BoardChange
+
+
+@pytest.mark.django_db
+class TestBoardReorderAPI:
+
+    def url(self, board):
+        return reverse('board-reorder', kwargs={'pk': board.id})
+
+    @pytest.fixture
+    def layout(self, board, user):
+        columns = [Column.objects.create(board=board, title=f'Колонка {i}', position=i + 1) for i in range(3)]
+        tasks = {
+            column.id: [Task.objects.create(column=column, title=f'Задача {i}', creator=user) for i in range(3)]
+            for column in columns
+        }
+        return columns, tasks
+
+    def order(self, column):
+        return list(Task.objects.filter(column=column).values_list('id', flat=True))
+
+    def test_reorder_columns_and_tasks(self, authenticated_client, board, layout):
+        columns, tasks = layout
+        a, b, c = columns
+        new_a = [tasks[b.id][0].id] + [t.id for t in reversed(tasks[a.id])]
+        new_b = [t.id for t in tasks[b.id][1:]]
+
+        response = authenticated_client.post(self.url(board), {
+            'columns': [c.id, a.id, b.id],
+            'tasks': {str(a.id): new_a, str(b.id): new_b},
+        }, format='json')
+
+        assert response.status_code == 200
+        board.refresh_from_db()
+        assert response.data == {'revision': board.revision}
+        assert list(Column.objects.filter(board=board).values_list('id', flat=True)) == [c.id, a.id, b.id]
+        assert self.order(a) == new_a
+        assert self.order(b) == new_b
+        assert self.order(c) == [t.id for t in tasks[c.id]]
+        # Одна ревизия на всю перестановку
+        assert set(BoardChange.objects.filter(board=board).values_list('revision', flat=True)) == {board.revision}
+
+    def test_incomplete_task_list_rejected(self, authenticated_client, board, layout):
+        columns, tasks = layout
+        a = columns[0]
+        response = authenticated_client.post(self.url(board), {
+            'tasks': {str(a.id): [tasks[a.id][0].id]},
+        }, format='json')
+        assert response.status_code == 400
+        assert self.order(a) == [t.id for t in tasks[a.id]]
+
+    def test_incomplete_column_list_rejected(self, authenticated_client, board, layout):
+        columns, _ = layout
+        response = authenticated_client.post(self.url(board), {
+            'columns': [columns[0].id, columns[1].id],
+        }, format='json')
+        assert response.status_code == 400
+
+    def test_foreign_column_rejected(self, authenticated_client, board, user, layout):
+        other_board = Board.objects.create(title='Другая', owner=user)
+        other_column = Column.objects.create(board=other_board, title='Чужая', position=1)
+        response = authenticated_client.post(self.url(board), {
+            'tasks': {str(other_column.id): []},
+        }, format='json')
+        assert response.status_code == 400
+
+    def test_stranger_forbidden(self, api_client, board, user2, layout):
+        api_client.force_authenticate(user=user2)
+        columns, _ = layout
+        response = api_client.post(self.url(board), {'columns': [c.id for c in columns]}, format='json')
+        assert response.status_code == 403
+
+    def test_empty_order_keeps_revision(self, authenticated_client, board):
+        # Доска без колонок: порядок пустой, ревизия без строк журнала не появляется
+        revision = board.revision
+        for data in ({'tasks': {}}, {'columns': []}):
+            response = authenticated_client.post(self.url(board), data, format='json')
+            assert response.status_code == 200
+            assert response.data == {'revision': revision}
+        board.refresh_from_db()
+        assert board.revision == revision
+
+        response = authenticated_client.get(reverse('board-changes', kwargs={'pk': board.id}), {'since': revision})
+        assert response.status_code == 200
+
+    def test_non_object_body_rejected(self, authenticated_client, board, layout):
+        columns, _ = layout
+        response = authenticated_client.post(self.url(board), [c.id for c in columns], format='json')
+        assert response.status_code == 400
@@ -0,0 +1,69 @@
+import pytest
+from django.urls import reverse
+from boards.models import Board, Column
+from boards.revisions import bump_board_revision
+
+
+@pytest.mark.django_db
+class TestBoardRevision:
+
+    def test_bump_returns_new_revision(self, board):
+        assert board.revision == 0
+        assert bump_board_revision(board.id) == 1
+        assert bump_board_revision(board.id) == 2
+
+    def test_save_does_not_overwrite_revision(self, board):
+        stale = Board.objects.get(id=board.id)
+        bump_board_revision(board.id)
+
+        stale.title = 'Новое название'
+        stale.save()
+
+        board.refresh_from_db()
+        assert board.title == 'Новое название'
+        assert board.revision == 1
+
+    def test_mutating_views_bump_revision(self, authenticated_client, board, column, task):
+        empty_column = Column.objects.create(board=board, title='Пустая', position=2)
+
+        authenticated_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'A'})
+        authenticated_client.post(reverse('add-comment', kwargs={'task_id': task.id}), {'text': 'к'})
+        authenticated_client.post(reverse('task-create', kwargs={'column_id': empty_column.id}), {'title': 'B'})
+        authenticated_client.patch(reverse('column-rename', kwargs={'pk': column.id}), {'title': 'C'})
+
+        board.refresh_from_db()
+        assert board.revision == 4
+
+
+@pytest.mark.django_db
+class TestBoardETag:
+
+    def test_etag_and_not_modified(self, authenticated_client, board, task):
+        url = reverse('board-list', kwargs={'pk': board.id})
+        response = authenticated_client.get(url)
+        etag = response['ETag']
+        assert response.status_code == 200
+        assert response.json()['revision'] == 0
+
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert not response.content
+
+    def test_etag_changes_after_mutation(self, authenticated_client, board, task):
+        url = reverse('board-list', kwargs={'pk': board.id})
+        etag = authenticated_client.get(url)['ETag']
+
+        authenticated_client.patch(reverse('task-rename', kwargs={'pk': task.id}), {'title': 'Новое'})
+
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_not_modified_skips_snapshot(self, authenticated_client, board, django_assert_num_queries):
+        url = reverse('board-list', kwargs={'pk': board.id})
+        etag = authenticated_client.get(url)['ETag']
+
+        with django_assert_num_queries(1):
+            response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
@@ -0,0 +1,66 @@
+import pytest
+from django.urls import reverse
+from boards.models import Column, Task, Comment, TaskFile
+from boards.serializers import BoardSerializer
+from boards.snapshot import load_board_snapshot
+
+# Доска + колонки + задачи + комментарии + ответственные + файлы
+SNAPSHOT_QUERIES = 6
+# API дополнительно читает ревизию доски для ETag
+API_QUERIES = SNAPSHOT_QUERIES + 1
+
+
+def fill_board(board, user, user2, columns=2, tasks_per_column=3):
+    """Наполняет доску задачами с комментариями, файлами и ответственными."""
+    for c in range(columns):
+        column = Column.objects.create(board=board, title=f'Колонка {c}', position=c + 1)
+        for t in range(tasks_per_column):
+            task = Task.objects.create(column=column, title=f'Задача {t}', position=t, creator=user)
+            task.responsible.add(user, user2)
+            Comment.objects.create(task=task, user=user2, text='коммент')
+            Comment.objects.create(task=task, user=user, text='ещё коммент')
+            TaskFile.objects.create(task=task, file='task_files/test.txt', uploaded_by=user)
+
+
+@pytest.mark.django_db
+class TestBoardSnapshot:
+
+    def test_snapshot_matches_plain_serializer(self, board, user, user2):
+        fill_board(board, user, user2)
+        board.refresh_from_db()
+
+        snapshot = BoardSerializer(load_board_snapshot(board.id)).data
+        plain = BoardSerializer(board).data
+
+        assert len(snapshot['columns']) == 2
+        for snap_col, plain_col in zip(snapshot['columns'], plain['columns']):
+            snap_tasks = sorted(snap_col['tasks'], key=lambda t: t['id'])
+            plain_tasks = sorted(plain_col['tasks'], key=lambda t: t['id'])
+            assert snap_tasks == plain_tasks
+
+    def test_tasks_ordered_by_rank(self, board, column, user):
+        Task.objects.create(column=column, title='Вторая', rank='k', position=0, creator=user)
+        Task.objects.create(column=column, title='Первая', rank='c', position=7, creator=user)
+
+        data = BoardSerializer(load_board_snapshot(board.id)).data
+        tasks = data['columns'][0]['tasks']
+        assert [t['title'] for t in tasks] == ['Первая', 'Вторая']
+        # position в ответе - индекс в колонке, а не сохранённое значение
+        assert [t['position'] for t in tasks] == [0, 1]
+
+    @pytest.mark.parametrize('columns, tasks_per_column', [(1, 1), (3, 10)])
+    def test_query_count_does_not_grow(self, board, user, user2, columns, tasks_per_column,
+                                       django_assert_num_queries):
+        fill_board(board, user, user2, columns, tasks_per_column)
+
+        with django_assert_num_queries(SNAPSHOT_QUERIES):
+            BoardSerializer(load_board_snapshot(board.id)).data
+
+    def test_api_query_budget(self, authenticated_client, board, user, user2, django_assert_num_queries):
+        fill_board(board, user, user2, columns=3, tasks_per_column=10)
+        url = reverse('board-list', kwargs={'pk': board.id})
+
+        with django_assert_num_queries(API_QUERIES):
+            response = authenticated_client.get(url)
+        assert response.status_code == 200
+        assert sum(len(c['tasks']) for c in response.json()['columns']) == 30
@@ -0,0 +1,62 @@
+import pytest
+from django.urls import reverse
+from boards.models import Comment, TaskFile
+
+
+@pytest.mark.django_db
+class TestBoardSummaryView:
+
+    def url(self, board):
+        return reverse('board-list', kwargs={'pk': board.id}) + '?view=summary'
+
+    def test_summary_has_only_card_fields(self, authenticated_client, board, task, user, user2):
+        task.description = '<p>длинное описание</p>'
+        task.save()
+        task.responsible.add(user2)
+        Comment.objects.create(task=task, user=user, text='1')
+        Comment.objects.create(task=task, user=user, text='2')
+        TaskFile.objects.create(task=task, file='task_files/a.txt', uploaded_by=user)
+
+        response = authenticated_client.get(self.url(board))
+        assert response.status_code == 200
+        card = response.json()['columns'][0]['tasks'][0]
+        assert card == {
+            'id': task.id,
+            'title': task.title,
+            'priority': 'low',
+            'deadline': None,
+            'position': 0,
+            'rank': task.rank,
+            'responsible_ids': [user2.id],
+            'comments_count': 2,
+            'files_count': 1,
+        }
+
+    def test_summary_query_budget(self, authenticated_client, board, task, django_assert_num_queries):
+        # ревизия + доска + колонки + задачи + ответственные
+        with django_assert_num_queries(5):
+            authenticated_client.get(self.url(board))
+
+    def test_summary_has_own_etag(self, authenticated_client, board, task):
+        full = authenticated_client.get(reverse('board-list', kwargs={'pk': board.id}))
+        summary = authenticated_client.get(self.url(board))
+        assert full['ETag'] != summary['ETag']
+        assert b'"comments"' not in summary.content
+
+        response = authenticated_client.get(self.url(board), HTTP_IF_NONE_MATCH=summary['ETag'])
+        assert response.status_code == 304
+
+
+@pytest.mark.django_db
+class TestTaskDetailAPI:
+
+    def test_get_task_detail(self, authenticated_client, task, comment):
+        response = authenticated_client.get(reverse('task-detail', kwargs={'pk': task.id}))
+        assert response.status_code == 200
+        assert response.data['id'] == task.id
+        assert response.data['comments'][0]['text'] == comment.text
+
+    def test_task_detail_forbidden_for_stranger(self, api_client, task, user2):
+        api_client.force_authenticate(user=user2)
+        response = api_client.get(reverse('task-detail', kwargs={'pk': task.id}))
+        assert response.status_code == 403
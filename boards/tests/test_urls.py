@@ -105,7 +105,7 @@ class TestBoardAPI:
         url = reverse('board-list', kwargs={'pk': board.id})
         response = authenticated_client.get(url)
         assert response.status_code == 200
-        assert response.data['title'] == board.title
+        assert response.json()['title'] == board.title
     
     def test_get_nonexistent_board(self, authenticated_client):
         url = reverse('board-list', kwargs={'pk': 99999})
@@ -145,7 +145,7 @@ class TestTaskAPI:
         assert task.title == 'Updated'
     
     def test_delete_task(self, authenticated_client, task):
-        url = reverse('task-delete', kwargs={'pk': task.id})
+        url = reverse('task-detail', kwargs={'pk': task.id})
         response = authenticated_client.delete(url)
         assert response.status_code == 204
         assert not Task.objects.filter(id=task.id).exists()
\ No newline at end of file
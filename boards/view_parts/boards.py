@@ -18,9 +18,18 @@ from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from ..models import Board
-from ..serializers import BoardSerializer
+from ..serializers import BoardSerializer, BoardSummarySerializer
+from ..snapshot import load_board_snapshot
+from ..revisions import board_etag
+from ..board_cache import get_cached_snapshot, set_cached_snapshot, snapshot_generation
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from ..changes import record_board_change, board_changes_since, HistoryTrimmed
+from ..reorder import parse_board_order, apply_board_order, ReorderError
+from django.http import Http404
+from django.utils.http import parse_etags
 from .utils import UNIVERSAL_FOR_AUTHENTICATION, UNIVERSAL_FOR_PERMISSION_CLASSES, get_react_js_filename, \
-    get_react_css_filename
+    get_react_css_filename, BOARD_ROLE_PERMISSION_CLASSES
 from rest_framework import status
 from django.views.decorators.http import require_POST
 
@@ -279,9 +288,96 @@ class BoardListAPIView(APIView):  # отправка json в реакт
     # permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
 
     def get(self, request, pk):
-        board = get_object_or_404(Board, id=pk)
-        serializer = BoardSerializer(board)
-        return Response(serializer.data)
+        # ?view=summary - только поля карточек, подробности задачи грузятся отдельно
+        view = 'summary' if request.GET.get('view') == 'summary' else 'full'
+
+        # Сначала дешёвый запрос ревизии: если у клиента актуальная версия - отдаём 304
+        revision = Board.objects.filter(id=pk).values_list('revision', flat=True).first()
+        if revision is None:
+            raise Http404
+        # Поколение кэша - до рендера: правка во время рендера сделает результат неактуальным
+        generation = snapshot_generation(pk)
+        etag = board_etag(pk, revision, view, generation)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        # Снапшот рендерится один раз на ревизию и отдаётся всем зрителям из кэша
+        content = get_cached_snapshot(pk, revision, view, generation)
+        if content is None:
+            # Всё дерево доски грузится фиксированным числом запросов
+            board = load_board_snapshot(pk, summary=(view == 'summary'))
+            revision = board.revision
+            serializer_class = BoardSummarySerializer if view == 'summary' else BoardSerializer
+            content = JSONRenderer().render(serializer_class(board).data)
+            set_cached_snapshot(pk, revision, content, view, generation)
+
+        return HttpResponse(content, content_type='application/json', headers={
+            'ETag': board_etag(pk, revision, view, generation),
+            'Cache-Control': 'private, no-cache',
+        })
+
+
+# Изменения доски после известной клиенту ревизии
+class BoardChangesAPIView(APIView):
+    authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('board', 'pk')
+
+    def get(self, request, pk):
+        board = self.board_access.board
+
+        try:
+            since = int(request.GET['since'])
+        except (KeyError, ValueError):
+            return Response({"error": "since is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changes = board_changes_since(board, since)
+        except HistoryTrimmed:
+            # Журнал за этот период не сохранился - клиенту нужен полный снапшот
+            return Response({
+                "error": "История изменений недоступна, загрузите доску целиком",
+                "snapshot_required": True,
+                "revision": board.revision,
+            }, status=status.HTTP_410_GONE)
+
+        return Response({
+            "revision": board.revision,
+            "since": since,
+            "changes": changes,
+        })
+
+
+class BoardReorderAPIView(APIView):
+    """
+    Новый порядок колонок и/или задач доски одним запросом:
+    {"columns": [id, ...], "tasks": {"<column_id>": [id, ...]}}.
+    Применяется одной транзакцией, возвращает новую ревизию.
+    """
+    authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('board', 'pk')
+
+    def post(self, request, pk):
+        board = self.board_access.board
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "Ожидается объект {\"columns\": [...], \"tasks\": {...}}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Проверка и запись в одной транзакции: между ними состав колонок не поменяется
+            with transaction.atomic():
+                column_ids, task_order = parse_board_order(
+                    board, request.data.get('columns'), request.data.get('tasks')
+                )
+                revision = apply_board_order(board, column_ids, task_order)
+        except ReorderError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"revision": revision})
 
 
 # ------------Архив------------
@@ -297,6 +393,7 @@ def archive_board(request, board_id):
     # Переключаем состояние архивации
     board.is_archived = not board.is_archived
     board.save()
+    record_board_change(board.id, 'board', 'update', board.id, {'is_archived': board.is_archived})
 
     if board.is_archived:
         messages.success(request, f'Доска "{board.title}" перемещена в архив')
@@ -388,6 +485,7 @@ class BoardRenameAPIView(APIView):
 
         board.title = title
         board.save()
+        board.revision = record_board_change(board.id, 'board', 'update', board.id, {'title': board.title})
 
         serializer = BoardSerializer(board)
         return Response(serializer.data, status=status.HTTP_200_OK)
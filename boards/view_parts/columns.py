@@ -5,6 +5,7 @@ from rest_framework import status
 
 from ..models import *
 from ..serializers import *
+from ..changes import record_board_change
 from .utils import UNIVERSAL_FOR_AUTHENTICATION, UNIVERSAL_FOR_PERMISSION_CLASSES
 
 
@@ -32,6 +33,10 @@ class ColumnCreateAPIView(APIView):
             return Response({'error': 'Title is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         column = Column.objects.create(board=board, title=title, position=board.columns.count() + 1)
+        record_board_change(board.id, 'column', 'insert', column.id, {
+            'title': column.title,
+            'position': column.position,
+        })
         serializer = ColumnSerializer(column)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -43,6 +48,7 @@ class ColumnDeleteAPIView(APIView):
     def delete(self, request, pk):
         column = get_object_or_404(Column, id=pk)
         column.delete()
+        record_board_change(column.board_id, 'column', 'delete', pk)
         return Response(status=204)
     
 class ColumnRenameAPIView(APIView):
@@ -69,6 +75,7 @@ class ColumnRenameAPIView(APIView):
             
         column.title = title
         column.save()
+        record_board_change(board.id, 'column', 'update', column.id, {'title': column.title})
 
         serializer = ColumnSerializer(column)
         return Response(serializer.data, status=200)
@@ -5,6 +5,7 @@ from rest_framework import status
 
 from ..models import *
 from ..serializers import *
+from ..changes import record_board_change, comment_insert_data
 from .utils import UNIVERSAL_FOR_AUTHENTICATION, UNIVERSAL_FOR_PERMISSION_CLASSES
 
 
@@ -25,6 +26,7 @@ class AddCommentAPIView(APIView):
             user=request.user,
             text=text,
         )
+        record_board_change(task.column.board_id, 'comment', 'insert', comment.id, comment_insert_data(comment))
 
         serializer = CommentSerializer(comment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -38,5 +40,8 @@ class DeleteCommentAPIView(APIView):
         comment = get_object_or_404(Comment, id=comment_id)
         if comment.user != request.user:
             return Response(status=403)
+        board_id = comment.task.column.board_id
+        comment_id, task_id = comment.id, comment.task_id
         comment.delete()
+        record_board_change(board_id, 'comment', 'delete', comment_id, {'task': task_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from django.db.models import F, Max
 
 from rest_framework.views import APIView
@@ -9,7 +9,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 
 from ..models import *
 from ..serializers import *
-from .utils import UNIVERSAL_FOR_AUTHENTICATION, UNIVERSAL_FOR_PERMISSION_CLASSES
+from ..snapshot import task_detail_queryset
+from ..changes import record_board_change, record_board_changes, task_insert_data, column_order_changes
+from ..ranking import rank_for_index, rebalance_column, needs_rebalance, RANK_ATTEMPTS
+from .utils import UNIVERSAL_FOR_AUTHENTICATION, BOARD_ROLE_PERMISSION_CLASSES
 
 from django.utils import timezone
 from datetime import datetime
@@ -17,40 +20,40 @@ from datetime import datetime
 
 class TaskCreateAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('column', 'column_id')
 
     def post(self, request, column_id):
-        column = get_object_or_404(Column, id=column_id)
+        column = self.board_access.obj
         title = request.data.get("title")
         if not title:
             return Response({"error": "Title is required"}, status=400)
 
-        task = Task.objects.create(
-            column=column,
-            title=title,
-            position=column.tasks.count() ,
-            creator=request.user,
-            priority=request.data.get("priority", "low")
-        )
+        # Ранг в конце колонки назначает Task.save - с повтором, если параллельное
+        # создание в этой же колонке заняло его первым
+        with transaction.atomic():
+            task = Task.objects.create(
+                column=column,
+                title=title,
+                position=column.tasks.count() ,
+                creator=request.user,
+                priority=request.data.get("priority", "low")
+            )
+            record_board_change(column.board_id, 'task', 'insert', task.id, task_insert_data(task))
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=201)
     
 
 class TaskRenameAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def patch(self, request, pk):
-        task = get_object_or_404(Task, pk=pk)
-        board = task.column.board
+        # Права (владелец или участник) проверены HasBoardRole
+        task = self.board_access.obj
+        board = self.board_access.board
 
-        # Проверка прав: либо владелец, либо участник
-        if board.owner != request.user and not BoardPermit.objects.filter(board=board, user=request.user).exists():
-                return Response(
-                    {"error": "У вас нет прав для перемещения этой задачи"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        
         title = request.data.get("title")
         if not title:
             return Response(
@@ -59,115 +62,102 @@ class TaskRenameAPIView(APIView):
             )
             
         task.title = title
-        task.save()
+        task.save(update_fields=['title', 'updated'])
+        record_board_change(board.id, 'task', 'update', task.id, {'title': task.title})
 
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=200)
 
 
-class TaskDeleteAPIView(APIView):
+class TaskAPIView(APIView):
+    """GET - задача целиком для модального окна (доска в режиме ?view=summary её не содержит), DELETE - удаление"""
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
+
+    def get(self, request, pk):
+        task = get_object_or_404(task_detail_queryset(), id=pk)
+        serializer = TaskSerializer(task)
+        return Response(serializer.data)
 
     def delete(self, request, pk):
-        task = get_object_or_404(Task, id=pk)
-        if task.creator != request.user:
+        task = self.board_access.obj
+        if task.creator_id != request.user.id:
             return Response(status=403)
+        board_id = task.column.board_id
+        task_id = task.id
         task.delete()
+        record_board_change(board_id, 'task', 'delete', task_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class TaskMoveView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def patch(self, request, pk):
         print(f"\n=== MOVE TASK {pk} ===")
         print(f"Request data: {request.data}")
         
         try:
-            # ТОЛЬКО ОДИН РАЗ получаем задачу
-            task = Task.objects.select_for_update().get(pk=pk)
-            print(f"BEFORE - Task {pk}: position={task.position}, column={task.column.id}")
-            
-            board = task.column.board
+            with transaction.atomic():
+                # ТОЛЬКО ОДИН РАЗ получаем задачу
+                task = Task.objects.select_for_update().select_related('column').get(pk=pk)
+                print(f"BEFORE - Task {pk}: position={task.position}, rank={task.rank}, column={task.column.id}")
 
-            # Проверяем права пользователя
-            if board.owner != request.user and not BoardPermit.objects.filter(board=board, user=request.user).exists():
-                return Response(
-                    {"error": "У вас нет прав для перемещения этой задачи"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+                # Права пользователя уже проверены HasBoardRole
+                board = self.board_access.board
 
-            column_id = request.data.get('column')
-            position = request.data.get('position')
+                column_id = request.data.get('column')
+                position = request.data.get('position')
 
-            if column_id is None:
-                return Response(
-                    {"error": "Не указана колонка"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                if column_id is None:
+                    return Response(
+                        {"error": "Не указана колонка"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            new_column = get_object_or_404(Column, pk=column_id)
+                new_column = get_object_or_404(Column, pk=column_id)
 
-            # Проверяем, что новая колонка в той же доске
-            if new_column.board != board:
-                return Response(
-                    {"error": "Колонка должна принадлежать той же доске"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                # Проверяем, что новая колонка в той же доске
+                if new_column.board_id != board.id:
+                    return Response(
+                        {"error": "Колонка должна принадлежать той же доске"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            # Сохраняем старую колонку
-            old_column = task.column
+                # Сохраняем старую колонку
+                old_column = task.column
 
-            with transaction.atomic():
-                # Если задача перемещается в другую колонку
-                if old_column.id != new_column.id:
-                    # Удаляем задачу из старой колонки и корректируем позиции
-                    Task.objects.filter(
-                        column=old_column,
-                        position__gt=task.position
-                    ).update(position=F('position') - 1)
-
-                    # Добавляем задачу в новую колонку
+                # Ранг между соседями по новому месту - пишется только эта строка.
+                # Параллельное перетаскивание на то же место даст тот же ранг:
+                # уникальность (column, rank) это поймает, и ранг считается заново
+                for attempt in range(RANK_ATTEMPTS):
                     task.column = new_column
-                    if position is not None:
-                        # Освобождаем место для новой задачи в новой колонке
-                        Task.objects.filter(
-                            column=new_column,
-                            position__gte=position
-                        ).update(position=F('position') + 1)
-                        task.position = position
-                    else:
-                        # Если позиция не указана, ставим в конец
-                        last_position = Task.objects.filter(
-                            column=new_column
-                        ).aggregate(models.Max('position'))['position__max']
-                        task.position = (last_position + 1) if last_position is not None else 0
-                else:
-                    # Перемещение внутри той же колонки
-                    if position is not None and position != task.position:
-                        old_position = task.position
-                        if position > old_position:
-                            # Перемещаем вниз
-                            Task.objects.filter(
-                                column=old_column,
-                                position__gt=old_position,
-                                position__lte=position
-                            ).update(position=F('position') - 1)
-                        else:
-                            # Перемещаем вверх
-                            Task.objects.filter(
-                                column=old_column,
-                                position__lt=old_position,
-                                position__gte=position
-                            ).update(position=F('position') + 1)
-                        task.position = position
-
-                task.save()
-                task.refresh_from_db()
-                print(f"AFTER  - Task {pk}: position={task.position}, column={task.column.id}")
-    
+                    task.rank = rank_for_index(new_column.id, position, exclude_id=task.id)
+                    task.position = Task.objects.filter(
+                        column=new_column, rank__lt=task.rank
+                    ).exclude(id=task.id).count()
+                    try:
+                        with transaction.atomic():
+                            task.save(update_fields=['column', 'rank', 'position', 'updated'])
+                        break
+                    except IntegrityError:
+                        if attempt == RANK_ATTEMPTS - 1:
+                            raise
+
+                # Ранги слишком удлинились - изредка перенумеровываем колонку целиком
+                if needs_rebalance(task.rank):
+                    rebalance_column(new_column.id)
+                    task.refresh_from_db(fields=['rank'])
+
+                record_board_changes(board.id, [
+                    ('task', 'move', task.id, {'column': task.column_id, 'position': task.position, 'rank': task.rank}),
+                    *column_order_changes(old_column.id, new_column.id),
+                ])
+                print(f"AFTER  - Task {pk}: position={task.position}, rank={task.rank}, column={task.column.id}")
+
                 serializer = TaskSerializer(task)
                 return Response(serializer.data)
 
@@ -185,22 +175,12 @@ class TaskMoveView(APIView):
 
 class TaskUpdateAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def patch(self, request, pk):
-        task = get_object_or_404(Task, pk=pk)
-
-        board = task.column.board
-
-        # Проверка прав
-        if board.owner != request.user and not BoardPermit.objects.filter(
-                board=board,
-                user=request.user
-        ).exists():
-            return Response(
-                {"error": "Нет прав на редактирование задачи"},
-                status=status.HTTP_403_FORBIDDEN
-            )
+        task = self.board_access.obj
+        board = self.board_access.board
 
         description = request.data.get("description")
 
@@ -211,7 +191,8 @@ class TaskUpdateAPIView(APIView):
             )
 
         task.description = description
-        task.save()
+        task.save(update_fields=['description', 'updated'])
+        record_board_change(board.id, 'task', 'update', task.id, {'description': task.description})
 
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=200)
@@ -220,18 +201,12 @@ class TaskUpdateAPIView(APIView):
 class TaskFileUploadAPIView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def post(self, request, pk):
-        task = get_object_or_404(Task, pk=pk)
-        board = task.column.board
-
-        # проверка прав
-        if board.owner != request.user and not BoardPermit.objects.filter(
-                board=board,
-                user=request.user
-        ).exists():
-            return Response({"error": "Нет прав"}, status=403)
+        task = self.board_access.obj
+        board = self.board_access.board
 
         uploaded_file = request.FILES.get("file")
 
@@ -243,6 +218,9 @@ class TaskFileUploadAPIView(APIView):
             file=uploaded_file,
             uploaded_by=request.user
         )
+        record_board_change(board.id, 'task', 'update', task.id, {
+            'files': list(task.files.values_list('id', flat=True))
+        })
 
         serializer = TaskFileSerializer(task_file)
         return Response(serializer.data, status=201)
@@ -250,27 +228,11 @@ class TaskFileUploadAPIView(APIView):
 
 class TaskFilesListAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def get(self, request, pk):
-        task = get_object_or_404(Task, id=pk)
-        board = task.column.board
-
-        # Ясная проверка: владелец ИЛИ участник
-        is_owner = board.owner == request.user
-        has_permit = BoardPermit.objects.filter(board=board, user=request.user).exists()
-
-        if not (is_owner or has_permit):
-            return Response({
-                "error": "Нет прав на просмотр файлов",
-                "debug": {
-                    "user": request.user.username,
-                    "is_owner": is_owner,
-                    "has_permit": has_permit,
-                    "required": "is_owner OR has_permit"
-                }
-            }, status=403)
-
+        task = self.board_access.obj
         files = task.files.all()
         serializer = TaskFileSerializer(files, many=True, context={'request': request})
         return Response(serializer.data)
@@ -278,45 +240,30 @@ class TaskFilesListAPIView(APIView):
 
 class TaskFileDeleteAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('file', 'file_id')
 
     def delete(self, request, file_id):
-        task_file = get_object_or_404(TaskFile, id=file_id)
-        board = task_file.task.column.board
-
-        # Проверка прав
-        if board.owner != request.user and not BoardPermit.objects.filter(
-                board=board,
-                user=request.user
-        ).exists():
-            return Response(
-                {"error": "Нет прав на удаление файла"},
-                status=status.HTTP_403_FORBIDDEN
-            )
+        task_file = self.board_access.obj
+        board = self.board_access.board
 
         # Удаляем файл
+        task = task_file.task
         task_file.delete()
+        record_board_change(board.id, 'task', 'update', task.id, {
+            'files': list(task.files.values_list('id', flat=True))
+        })
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class TaskPriorityUpdateAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def patch(self, request, pk):
-        task = get_object_or_404(Task, pk=pk)
-
-        board = task.column.board
-
-        # Проверка прав
-        if board.owner != request.user and not BoardPermit.objects.filter(
-                board=board,
-                user=request.user
-        ).exists():
-            return Response(
-                {"error": "Нет прав на редактирование задачи"},
-                status=status.HTTP_403_FORBIDDEN
-            )
+        task = self.board_access.obj
+        board = self.board_access.board
 
         priority = request.data.get("priority")
 
@@ -335,7 +282,8 @@ class TaskPriorityUpdateAPIView(APIView):
             )
 
         task.priority = priority
-        task.save()
+        task.save(update_fields=['priority', 'updated'])
+        record_board_change(board.id, 'task', 'update', task.id, {'priority': task.priority})
 
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=200)
@@ -343,22 +291,12 @@ class TaskPriorityUpdateAPIView(APIView):
 
 class TaskDeadlineAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'pk')
 
     def patch(self, request, pk):
-        task = get_object_or_404(Task, pk=pk)
-
-        board = task.column.board
-
-        # Проверка прав
-        if board.owner != request.user and not BoardPermit.objects.filter(
-                board=board,
-                user=request.user
-        ).exists():
-            return Response(
-                {"error": "Нет прав на редактирование задачи"},
-                status=status.HTTP_403_FORBIDDEN
-            )
+        task = self.board_access.obj
+        board = self.board_access.board
 
         deadline = request.data.get("deadline")
 
@@ -399,21 +337,23 @@ class TaskDeadlineAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        task.save()
+        task.save(update_fields=['deadline', 'updated'])
+        record_board_change(board.id, 'task', 'update', task.id, {'deadline': task.deadline})
         serializer = TaskSerializer(task)
         return Response(serializer.data, status=200)
     
 
 class AddResponsibleToTaskAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'task_id')
     
     def post(self, request, task_id):
         """
         Добавить ответственного к задаче
         """
         try:
-            task = get_object_or_404(Task, id=task_id)
+            task = self.board_access.obj
             user_id = request.data.get('user_id')
             
             if not user_id:
@@ -422,10 +362,7 @@ class AddResponsibleToTaskAPIView(APIView):
             # Проверяем, что пользователь существует
             user = get_object_or_404(User, id=user_id)
             
-            # Проверяем права доступа
-            board = task.column.board
-            if board.owner != request.user and not BoardPermit.objects.filter(board=board, user=request.user).exists():
-                return Response({'error': 'Нет прав для изменения этой задачи'}, status=status.HTTP_403_FORBIDDEN)
+            board = self.board_access.board
             
             # Проверяем, что добавляемый пользователь является участником доски
             # Сначала проверяем владельца
@@ -439,7 +376,10 @@ class AddResponsibleToTaskAPIView(APIView):
                 return Response({'error': 'Пользователь уже является ответственным'}, status=status.HTTP_400_BAD_REQUEST)
             
             task.responsible.add(user)
-            task.save()
+            task.save(update_fields=['updated'])
+            record_board_change(board.id, 'task', 'update', task.id, {
+                'responsible_ids': list(task.responsible.values_list('id', flat=True))
+            })
             
             # Возвращаем обновленную задачу
             serializer = TaskSerializer(task)
@@ -455,14 +395,15 @@ class AddResponsibleToTaskAPIView(APIView):
 
 class RemoveResponsibleFromTaskAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'task_id')
     
     def post(self, request, task_id):
         """
         Удалить ответственного из задачи
         """
         try:
-            task = get_object_or_404(Task, id=task_id)
+            task = self.board_access.obj
             user_id = request.data.get('user_id')
             
             if not user_id:
@@ -471,17 +412,17 @@ class RemoveResponsibleFromTaskAPIView(APIView):
             # Проверяем, что пользователь существует
             user = get_object_or_404(User, id=user_id)
             
-            # Проверяем права доступа
-            board = task.column.board
-            if board.owner != request.user and not BoardPermit.objects.filter(board=board, user=request.user).exists():
-                return Response({'error': 'Нет прав для изменения этой задачи'}, status=status.HTTP_403_FORBIDDEN)
+            board = self.board_access.board
             
             # Удаляем пользователя из ответственных
             if not task.responsible.filter(id=user.id).exists():
                 return Response({'error': 'Пользователь не является ответственным'}, status=status.HTTP_400_BAD_REQUEST)
             
             task.responsible.remove(user)
-            task.save()
+            task.save(update_fields=['updated'])
+            record_board_change(board.id, 'task', 'update', task.id, {
+                'responsible_ids': list(task.responsible.values_list('id', flat=True))
+            })
             
             # Возвращаем обновленную задачу
             serializer = TaskSerializer(task)
@@ -497,19 +438,15 @@ class RemoveResponsibleFromTaskAPIView(APIView):
 
 class GetTaskResponsibleAPIView(APIView):
     authentication_classes = UNIVERSAL_FOR_AUTHENTICATION
-    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    permission_classes = BOARD_ROLE_PERMISSION_CLASSES
+    board_lookup = ('task', 'task_id')
     
     def get(self, request, task_id):
         """
         Получить список ответственных за задачу
         """
         try:
-            task = get_object_or_404(Task, id=task_id)
-            
-            # Проверяем права доступа
-            board = task.column.board
-            if board.owner != request.user and not BoardPermit.objects.filter(board=board, user=request.user).exists():
-                return Response({'error': 'Нет прав для просмотра этой задачи'}, status=status.HTTP_403_FORBIDDEN)
+            task = self.board_access.obj
             
             # Получаем список ответственных
             responsible_users = task.responsible.all()
@@ -5,8 +5,12 @@ import os
 import re
 from django.conf import settings
 
+from ..permissions import HasBoardRole
+
 UNIVERSAL_FOR_AUTHENTICATION = [SessionAuthentication]
 UNIVERSAL_FOR_PERMISSION_CLASSES = [IsAuthenticated]
+# Для view с board_lookup: роль на доске проверяется одним запросом, viewer - только чтение
+BOARD_ROLE_PERMISSION_CLASSES = UNIVERSAL_FOR_PERMISSION_CLASSES + [HasBoardRole]
 
 
 def json_login_required(view_func):
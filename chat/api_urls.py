@@ -29,9 +29,22 @@ urlpatterns = [
          views.ChatMarkReadAPIView.as_view(), 
          name='chat-api-mark-read'),
     
+    path('unread/', 
+         views.ChatUnreadCountsAPIView.as_view(), 
+         name='chat-api-unread'),
+    
+    path('search/', 
+         views.ChatSearchAPIView.as_view(), 
+         name='chat-api-search'),
+    
+    path('throttle-stats/', 
+         views.ChatThrottleStatsAPIView.as_view(), 
+         name='chat-api-throttle-stats'),
+    
     path('my-dialogs/', private_api.MyDialogsView.as_view(), name='my-dialogs'),
     path('dialog/<int:chat_id>/messages/', private_api.DialogMessagesView.as_view(), name='dialog-messages'),
     path('dialog/<int:chat_id>/send/', private_api.SendPrivateMessageView.as_view(), name='send-private'),
+    path('search-messages/', private_api.SearchPrivateMessagesView.as_view(), name='search-private-messages'),
     path('search-users/', private_api.SearchUsersView.as_view(), name='search-users'),
     path('create-dialog/', private_api.CreatePrivateChatView.as_view(), name='create-dialog'),
 ]
\ No newline at end of file
@@ -0,0 +1,168 @@
+'''Архив старых сообщений чатов досок (холодное хранение).
+
+Сообщения старше CHAT_ARCHIVE_AFTER_DAYS переносятся по комнатам и месяцам
+в gzip JSONL сегменты (ChatArchiveSegment) и удаляются из таблицы ChatMessage,
+так что "горячие" запросы истории работают по небольшой таблице.
+Строка сегмента - payload сообщения (chat/payloads.py) в момент архивации:
+последующие смены имени/аватара автора в архиве не отражаются.
+
+История (history_page) листает таблицу, а когда она кончается - сегменты архива
+по убыванию id, для клиента это одна лента с теми же курсорами before_id.
+Поиск (chat/search.py) по архиву не ищет.'''
+
+import gzip
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ChatRoom, ChatMessage, ChatArchiveSegment
+from .payloads import message_payloads
+from .views_parts.pagination import KeysetPage, keyset_page, CursorError, MAX_LIMIT, DEFAULT_LIMIT, _int_param
+
+ARCHIVE_BATCH = 1000
+
+
+def archive_root():
+    return Path(getattr(settings, 'CHAT_ARCHIVE_ROOT', Path(settings.BASE_DIR) / 'chat_archive'))
+
+
+class ArchivedMessage:
+    """Сообщение из сегмента архива: id/created для курсоров, payload - как есть"""
+
+    def __init__(self, payload):
+        self.archived_payload = payload
+        self.id = payload['id']
+        self.created = payload['created']
+
+
+# ------------------Запись------------------
+def _write_segment(room_id, month, payloads):
+    folder = archive_root() / f'room_{room_id}' / month.strftime('%Y-%m')
+    folder.mkdir(parents=True, exist_ok=True)
+    part = len(list(folder.glob('part-*.jsonl.gz'))) + 1
+    path = folder / f'part-{part:04d}.jsonl.gz'
+    # 'x' - существующий сегмент никогда не перезаписывается
+    with gzip.open(path, 'xt', encoding='utf-8') as file:
+        for payload in payloads:
+            file.write(json.dumps(payload, ensure_ascii=False) + '\n')
+    with open(path, 'rb') as file:
+        os.fsync(file.fileno())
+    return path
+
+
+def archive_room(room, before):
+    """
+    Переносит сообщения комнаты старше before в архив: сегмент на месяц
+    (не больше ARCHIVE_BATCH сообщений в сегменте). Возвращает число перенесённых.
+    """
+    moved = 0
+    while True:
+        messages = list(
+            ChatMessage.objects.filter(room=room, created__lt=before)
+            .select_related('author__profile', 'attachment').order_by('id')[:ARCHIVE_BATCH]
+        )
+        if not messages:
+            return moved
+
+        month = messages[0].created.date().replace(day=1)
+        messages = [m for m in messages if m.created.date().replace(day=1) == month]
+        path = _write_segment(room.id, month, message_payloads(messages))
+        try:
+            with transaction.atomic():
+                ChatArchiveSegment.objects.create(
+                    room=room,
+                    month=month,
+                    path=str(path.relative_to(archive_root())),
+                    first_id=messages[0].id,
+                    last_id=messages[-1].id,
+                    count=len(messages),
+                )
+                ChatMessage.objects.filter(id__in=[m.id for m in messages]).delete()
+        except Exception:
+            # Сообщения остались в базе - файл без записи сегмента не нужен
+            path.unlink(missing_ok=True)
+            raise
+        moved += len(messages)
+
+
+def archive_old_messages(days=None, rooms=None):
+    """Архивирует все комнаты (или rooms); {room_id: перенесено}"""
+    days = days if days is not None else getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90)
+    before = timezone.now() - timedelta(days=days)
+    rooms = rooms if rooms is not None else ChatRoom.objects.filter(
+        id__in=ChatMessage.objects.filter(created__lt=before).values('room_id')
+    )
+    result = {}
+    for room in rooms:
+        moved = archive_room(room, before)
+        if moved:
+            result[room.id] = moved
+    return result
+
+
+def vacuum_database():
+    """SQLite не уменьшает файл базы после DELETE сам - только VACUUM"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+
+
+# ------------------Чтение------------------
+def read_segment(segment):
+    with gzip.open(archive_root() / segment.path, 'rt', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def archived_before(room, before_id, limit):
+    """
+    До limit + 1 сообщений архива с id < before_id (None - с самого нового), от новых к старым.
+    Читаются только нужные сегменты, начиная с ближайшего к курсору.
+    """
+    segments = room.archive_segments.order_by('-last_id')
+    if before_id is not None:
+        segments = segments.filter(first_id__lt=before_id)
+
+    items = []
+    for segment in segments.iterator():
+        for payload in reversed(read_segment(segment)):
+            if before_id is None or payload['id'] < before_id:
+                items.append(ArchivedMessage(payload))
+        if len(items) > limit:
+            break
+    items.sort(key=lambda item: item.id, reverse=True)
+    return items[:limit + 1]
+
+
+def history_page(room, queryset, params, default_limit=DEFAULT_LIMIT):
+    """
+    keyset_page по таблице с продолжением в архив: если страница таблицы
+    закончилась раньше limit (или курсор уже в архиве), добираем из сегментов.
+    Курсор after_id работает только по таблице - новые сообщения в архиве не появляются.
+    """
+    before_id = _int_param(params, 'before_id')
+    if _int_param(params, 'after_id') is not None or not room.archive_segments.exists():
+        return keyset_page(queryset, params, default_limit)
+
+    limit = min(max(_int_param(params, 'limit', default_limit), 1), MAX_LIMIT)
+    if before_id is not None and not queryset.filter(id=before_id).exists():
+        # Курсор уже в архиве: таблица тут не участвует
+        if not room.archive_segments.filter(first_id__lte=before_id, last_id__gte=before_id).exists():
+            raise CursorError('Сообщение курсора не найдено')
+        hot = KeysetPage([], False, queryset.count() if params.get('total') in ('1', 'true') else None)
+    else:
+        hot = keyset_page(queryset, params, default_limit)
+
+    if not hot.has_more:
+        rest = limit - len(hot.items)
+        archived = archived_before(room, hot.items[-1].id if hot.items else before_id, rest)
+        hot.items = hot.items + archived[:rest]
+        hot.has_more = len(archived) > rest
+    if hot.total is not None:
+        hot.total += room.archive_segments.aggregate(total=Sum('count'))['total'] or 0
+    return hot
@@ -1,17 +1,28 @@
 # https://zentyx.ru/posts/websocket-i-django-channels/
 
 import json
+import time
+from urllib.parse import parse_qs
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from .models import ChatRoom, ChatMessage,PrivateChat, PrivateMessage
 from boards.models import Board, BoardPermit
+from boards.permissions import load_board_access
+from boards.events import board_access_group_name, board_group_name
+from boards.consumers import ACCESS_REVOKED_CLOSE_CODE
+from .write_behind import chat_write_behind, write_behind_enabled
+from .history_buffer import recent_history, load_history_frame
+from .payloads import message_payload
+from .presence import board_presence, room_events, chat_group_name, typing_allowed
+from .rate_limit import RateLimitedConsumerMixin
 from django.db.models import Q
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(RateLimitedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.board_id = self.scope['url_route']['kwargs']['board_id']
-        self.room_group_name = f'chat_board_{self.board_id}'
+        self.room_group_name = chat_group_name(self.board_id)
         
         # Проверяем авторизацию
         if self.scope["user"].is_anonymous:
@@ -19,9 +30,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
             
-        # Проверяем доступ к доске
-        has_access = await self.check_board_access()
-        if not has_access:
+        # Проверяем доступ к доске один раз: роль живёт всё соединение,
+        # изменения BoardPermit приходят событием board_access
+        self.board_role = await self.check_board_access()
+        if self.board_role is None:
             print(f"❌ Пользователь {self.scope['user'].username} не имеет доступа к доске {self.board_id}")
             await self.close()
             return
@@ -33,10 +45,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        self.access_group_name = board_access_group_name(self.board_id, self.scope['user'].id)
+        await self.channel_layer.group_add(
+            self.access_group_name,
+            self.channel_name
+        )
         
         await self.accept()
         
-        # Отправляем историю
+        # Присутствие: остальным - входом в ближайшей пачке, если это первая вкладка пользователя
+        user = self.scope['user']
+        if await board_presence.ajoin(self.board_id, self.channel_name, user):
+            room_events.joined(int(self.board_id), user)
+        self.presence_joined = True
+        self.presence_touched = time.monotonic()
+        self.typing_sent = None
+        
+        # Отправляем историю (вместе со снимком присутствия)
         await self.send_last_messages()
 
     async def disconnect(self, close_code):
@@ -47,105 +72,185 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        if getattr(self, 'presence_joined', False):
+            user = self.scope['user']
+            if await board_presence.aleave(self.board_id, self.channel_name, user.id):
+                room_events.left(int(self.board_id), user)
+        if hasattr(self, 'access_group_name'):
+            await self.channel_layer.group_discard(
+                self.access_group_name,
+                self.channel_name
+            )
+        # Автор уходит - не держим его сообщения только в памяти
+        if chat_write_behind.pending_count():
+            await chat_write_behind.flush()
 
     async def receive(self, text_data):
         print(f"📩 Получено сообщение: {text_data}")
-        try:
-            data = json.loads(text_data)
-            message_type = data.get('type', 'message')
-            
-            if message_type == 'message':
-                text = data.get('text', '')
-                if text:
-                    await self.save_and_broadcast_message(text)
-        except json.JSONDecodeError:
+        data = await self.load_frame(text_data)
+        if data is None:
             print(f"❌ Ошибка парсинга JSON: {text_data}")
+            return
+        message_type = data.get('type', 'message')
+        await self.touch_presence()
+        
+        if message_type == 'message':
+            text = data.get('text', '')
+            if not isinstance(text, str):
+                await self.send_error('bad_request', 'text должен быть строкой')
+            elif text:
+                room_events.stopped_typing(int(self.board_id), self.scope['user'])
+                # Запись в базу - только в пределах лимита (chat/rate_limit.py)
+                if await self.allow_write():
+                    await self.save_and_broadcast_message(text)
+        elif message_type == 'typing':
+            # Лишние нажатия отбрасываются здесь, остальное уходит пачкой (chat/presence.py)
+            if typing_allowed(self.typing_sent):
+                self.typing_sent = time.monotonic()
+                room_events.typing(int(self.board_id), self.scope['user'])
+        # type == 'ping' - только продлевает присутствие
+
+    async def touch_presence(self):
+        # Продлеваем запись присутствия не чаще трети её срока жизни
+        now = time.monotonic()
+        if now - self.presence_touched >= board_presence.ttl / 3:
+            self.presence_touched = now
+            await board_presence.atouch(self.board_id, self.channel_name, self.scope['user'])
+
+    async def chat_presence(self, event):
+        # Входы/выходы за интервал одной пачкой; о себе клиенту не сообщаем
+        user_id = self.scope['user'].id
+        joined = [user for user in event['joined'] if user['id'] != user_id]
+        left = [left_id for left_id in event['left'] if left_id != user_id]
+        if joined or left:
+            await self.send(text_data=json.dumps({'type': 'presence', 'joined': joined, 'left': left}))
+
+    async def chat_typing(self, event):
+        users = [user for user in event['users'] if user['id'] != self.scope['user'].id]
+        if users:
+            await self.send(text_data=json.dumps({'type': 'typing', 'users': users}))
 
     @database_sync_to_async
     def check_board_access(self):
-        try:
-            board = Board.objects.get(id=self.board_id)
-            user = self.scope["user"]
-            
-            if board.owner == user:
-                return True
-                
-            if board.members.filter(id=user.id).exists():
-                return True
-                
-            if BoardPermit.objects.filter(board=board, user=user).exists():
-                return True
-                
-            return False
-        except Board.DoesNotExist:
-            return False
-        except Exception as e:
-            print(f"❌ Ошибка проверки доступа: {e}")
-            return False
+        # Доска и роль пользователя - одним запросом
+        access = load_board_access(self.scope["user"], 'board', self.board_id)
+        return access.role if access else None
 
-    @database_sync_to_async
-    def save_and_broadcast_message(self, text):
-        user = self.scope["user"]
-        
-        # Получаем или создаем комнату
-        room, created = ChatRoom.objects.get_or_create(board_id=self.board_id)
-        
-        # Создаем сообщение
-        message = ChatMessage.objects.create(
-            room=room,
-            author=user,
-            text=text
-        )
-        
-        # ИСПРАВЛЕНО: убрал лишнюю вложенность, добавил нужные поля
-        return {
-            'type': 'chat_message',
-            'id': message.id,
-            'text': message.text,
-            'author': user.username,
-            'author_id': user.id,
-            'author_username': user.username,  # добавил для совместимости
-            'created': message.created.isoformat(),
-            'created_display': message.created.strftime('%d.%m.%Y %H:%M'),  # добавил
-        }
+    async def board_access(self, event):
+        # Роль на доске изменилась; None - доступ отозван, закрываем сокет сразу
+        self.board_role = event['role']
+        if self.board_role is None:
+            print(f"🚫 Доступ {self.scope['user'].username} к доске {self.board_id} отозван")
+            await self.close(code=ACCESS_REVOKED_CLOSE_CODE)
+
+    async def save_and_broadcast_message(self, text):
+        await post_board_message(self.channel_layer, self.board_id, self.scope["user"], text)
 
     async def chat_message(self, event):
         # ИСПРАВЛЕНО: отправляем event целиком, а не event['message']
-        await self.send(text_data=json.dumps(event))
-
-    @database_sync_to_async
-    def get_last_messages(self):
-        room = ChatRoom.objects.filter(board_id=self.board_id).first()
-        if not room:
-            return []
-        
-        messages = ChatMessage.objects.filter(
-            room=room
-        ).select_related('author').order_by('-created')[:50]
-        
-        result = []
-        for msg in reversed(messages):
-            result.append({
-                'id': msg.id,
-                'text': msg.text,
-                'author': msg.author.username,
-                'author_id': msg.author.id,
-                'author_username': msg.author.username,
-                'created': msg.created.isoformat(),
-                'created_display': msg.created.strftime('%d.%m.%Y %H:%M'),
-            })
-        
-        return result
+        await self.send(text_data=json.dumps(receive_board_message(event)))
 
     async def send_last_messages(self):
-        messages = await self.get_last_messages()
-        await self.send(text_data=json.dumps({
-            'type': 'history',
-            'messages': messages,
-        }))
+        await self.send(text_data=await board_history_frame(self.board_id))
+
+
+# ------------------Общее для ChatConsumer и StreamConsumer------------------
+def _save_board_message(board_id, user, text):
+    # Получаем или создаем комнату
+    room, created = ChatRoom.objects.get_or_create(board_id=board_id)
+    
+    # Создаем сообщение
+    message = ChatMessage.objects.create(room=room, author=user, text=text)
+    # Тот же payload, что отдаёт REST; строится один раз и лежит в кэше
+    return message_payload(message)
+
+
+async def post_board_message(channel_layer, board_id, user, text):
+    """Сохраняет сообщение чата доски и рассылает его группе комнаты"""
+    if write_behind_enabled():
+        # id выдан сервером, INSERT уйдёт пачкой (chat/write_behind.py)
+        message = await chat_write_behind.add(board_id, user, text)
+        payload = await database_sync_to_async(message_payload)(message)
+        # bulk_create не шлёт post_save - в буфер истории добавляем сами
+        recent_history.append(board_id, payload)
+    else:
+        payload = await database_sync_to_async(_save_board_message)(board_id, user, text)
+
+    # board_id - для сокетов с несколькими досками (StreamConsumer), клиентам не уходит
+    await channel_layer.group_send(chat_group_name(board_id), {'type': 'chat_message', 'board_id': int(board_id), **payload})
+
+
+def receive_board_message(event):
+    """
+    Событие chat_message -> кадр клиенту. Сообщение могло быть сохранено
+    другим процессом - заодно пополняем свой буфер истории.
+    """
+    item = {key: value for key, value in event.items() if key not in ('type', 'board_id')}
+    recent_history.append(event['board_id'], item, refresh=True)
+    return {'type': 'chat_message', **item}
+
+
+async def board_history_frame(board_id, extra=None):
+    """Кадр history: последние сообщения комнаты и снимок "кто онлайн" (+ поля extra)"""
+    # Сообщения уже в буфере - без запросов к базе
+    frame = recent_history.frame(board_id)
+    if frame is None:
+        frame = await database_sync_to_async(load_history_frame)(board_id)
+    # Снимок присутствия - в том же кадре, отдельной рассылки на подключение нет
+    return json.dumps({**frame, 'online': await board_presence.ausers(board_id), **(extra or {})})
         
             
-class PrivateChatConsumer(AsyncWebsocketConsumer):
+def private_message_data(message):
+    """Личное сообщение для сокета; seq - номер доставки получателю"""
+    return {
+        'id': message.id,
+        'text': message.text,
+        'sender_id': message.sender_id,
+        'sender_name': message.sender.username,
+        'created': str(message.created),
+        'created_display': message.created.strftime('%d.%m.%Y %H:%M'),
+        'chat_id': message.chat_id,
+        'is_read': message.is_read,
+        'seq': message.seq,
+    }
+
+
+def save_private_message(user, recipient_id, text, chats):
+    """
+    Сохраняет личное сообщение. chats - диалоги соединения по id получателя:
+    чат ищется (или создаётся) один раз на получателя.
+    """
+    chat = chats.get(recipient_id)
+    if chat is None:
+        chat, _ = PrivateChat.get_or_create_between(user, recipient_id)
+        chats[recipient_id] = chat
+    
+    message = PrivateMessage.objects.create(chat=chat, sender=user, text=text)
+    message.sender = user
+    return private_message_data(message)
+
+
+def missed_messages_frame(user, resume_from):
+    """Кадр resume: входящие пользователя после resume_from по порядку seq, не больше CHAT_RESUME_LIMIT"""
+    limit = getattr(settings, 'CHAT_RESUME_LIMIT', 500)
+    messages = list(
+        PrivateMessage.objects.filter(recipient=user, seq__gt=resume_from)
+        .select_related('sender')
+        .order_by('seq')[:limit + 1]
+    )
+    return {
+        'type': 'resume',
+        'messages': [private_message_data(message) for message in messages[:limit]],
+        # Пропущено больше лимита - клиенту проще перезагрузить диалоги через API
+        'has_more': len(messages) > limit,
+    }
+
+
+def private_group_name(user_id):
+    return f'private_user_{user_id}'
+
+
+class PrivateChatConsumer(RateLimitedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
         
@@ -154,7 +259,12 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
             return
         
         # Группа для конкретного пользователя
-        self.user_group_name = f'private_user_{self.user.id}'
+        self.user_group_name = private_group_name(self.user.id)
+        # Диалоги по id получателя: повторные сообщения не ищут чат в БД
+        self.private_chats = {}
+        # Последний номер доставки (seq) из кадра resume: живые события
+        # с номером не больше него клиент уже получил
+        self.resumed_seq = 0
         
         # Добавляем пользователя в его личную группу
         await self.channel_layer.group_add(
@@ -163,6 +273,17 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        
+        # ?resume_from=<seq> - досылаем входящие, пропущенные за время переподключения.
+        # В группе сокет уже состоит, так что ничего не теряется между выборкой и живыми событиями
+        resume_from = parse_qs(self.scope.get('query_string', b'').decode()).get('resume_from')
+        if resume_from:
+            try:
+                resume_from = int(resume_from[0])
+            except ValueError:
+                await self.send_error('bad_request', 'resume_from должен быть числом')
+            else:
+                await self.send_missed_messages(resume_from)
         print(f"Private: {self.user.username} connected")
 
     async def disconnect(self, close_code):
@@ -175,11 +296,22 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
         print(f"Private: {self.user.username} disconnected")
 
     async def receive(self, text_data):
-        data = json.loads(text_data)
+        data = await self.load_frame(text_data)
+        if data is None:
+            return
         message_type = data.get('type')
         
         if message_type == 'private_message':
-            await self.handle_private_message(data)
+            if 'recipient_id' not in data or not isinstance(data.get('text'), str) or not data['text']:
+                await self.send_error('bad_request', 'Нужны recipient_id и text (строка)')
+                return
+            try:
+                data['recipient_id'] = int(data['recipient_id'])
+            except (TypeError, ValueError):
+                await self.send_error('bad_request', 'recipient_id должен быть числом')
+                return
+            if await self.allow_write():
+                await self.handle_private_message(data)
 
     async def handle_private_message(self, data):
         """Обработка личного сообщения"""
@@ -191,7 +323,7 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
         
         # Отправляем получателю
         await self.channel_layer.group_send(
-            f'private_user_{recipient_id}',
+            private_group_name(recipient_id),
             {
                 'type': 'private_chat_message',
                 'message': message_data
@@ -206,42 +338,274 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def save_private_message(self, recipient_id, text):
-        from .models import PrivateChat, PrivateMessage
-        from django.db.models import Q
-        
-        # Находим или создаем чат
-        chat = PrivateChat.objects.filter(
-            (Q(user1=self.user) & Q(user2=recipient_id)) |
-            (Q(user1=recipient_id) & Q(user2=self.user))
-        ).first()
-        
-        if not chat:
-            chat = PrivateChat.objects.create(
-                user1=self.user,
-                user2_id=recipient_id
-            )
-        
-        # Создаем сообщение
-        message = PrivateMessage.objects.create(
-            chat=chat,
-            sender=self.user,
-            text=text
-        )
-        
-        return {
-            'id': message.id,
-            'text': message.text,
-            'sender_id': self.user.id,
-            'sender_name': self.user.username,
-            'created': str(message.created),
-            'created_display': message.created.strftime('%d.%m.%Y %H:%M'),
-            'chat_id': chat.id,
-            'is_read': message.is_read
-        }
+        return save_private_message(self.user, recipient_id, text, self.private_chats)
+
+    async def send_missed_messages(self, resume_from):
+        """Один кадр resume со всеми входящими после resume_from (не больше CHAT_RESUME_LIMIT)"""
+        frame = await database_sync_to_async(missed_messages_frame)(self.user, resume_from)
+        if frame['messages']:
+            self.resumed_seq = frame['messages'][-1]['seq']
+        await self.send(text_data=json.dumps(frame))
 
     async def private_chat_message(self, event):
         """Отправка сообщения клиенту"""
+        if event['message']['seq'] <= self.resumed_seq:
+            return  # уже ушло в кадре resume
         await self.send(text_data=json.dumps({
             'type': 'new_message',
             'message': event['message']
-        }))
\ No newline at end of file
+        }))
+
+class StreamConsumer(RateLimitedConsumerMixin, AsyncWebsocketConsumer):
+    """
+    Один сокет ws/stream/ на пользователя вместо ws/chat/<id>/, ws/board/<id>/ и ws/private/.
+    Потоки включаются кадрами:
+        {"type": "subscribe", "stream": "chat" | "board", "board_id": 5}
+        {"type": "subscribe", "stream": "private", "resume_from": 12}  (resume_from - по желанию)
+        {"type": "unsubscribe", "stream": ..., "board_id": ...}
+    Кадры потоков - те же, что у отдельных сокетов, с полями "stream" и "board_id":
+    первым приходит history (чат), hello (доска) или subscribed/resume (личные).
+    Клиент пишет так же: {"stream": "chat", "board_id": 5, "type": "message", "text": ...},
+    {"stream": "private", "type": "private_message", "recipient_id": ..., "text": ...}.
+    Отзыв доступа к доске не закрывает сокет: потоки доски снимаются кадром unsubscribed.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        # board_id -> {'role', 'presence_touched', 'typing_sent'}
+        self.chats = {}
+        # board_id -> роль
+        self.boards = {}
+        self.private = False
+        self.private_chats = {}
+        self.resumed_seq = 0
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if not hasattr(self, 'chats'):
+            return
+        for board_id in list(self.chats):
+            await self.unsubscribe_chat(board_id)
+        for board_id in list(self.boards):
+            await self.unsubscribe_board(board_id)
+        if self.private:
+            await self.channel_layer.group_discard(private_group_name(self.user.id), self.channel_name)
+        # Автор уходит - не держим его сообщения только в памяти
+        if chat_write_behind.pending_count():
+            await chat_write_behind.flush()
+
+    async def send_frame(self, stream, frame, board_id=None):
+        frame = {**frame, 'stream': stream}
+        if board_id is not None:
+            frame['board_id'] = board_id
+        await self.send(text_data=json.dumps(frame))
+
+    async def receive(self, text_data):
+        data = await self.load_frame(text_data)
+        if data is None:
+            return
+
+        stream = data.get('stream')
+        board_id = None
+        if stream in ('chat', 'board'):
+            try:
+                board_id = int(data.get('board_id'))
+            except (TypeError, ValueError):
+                await self.send_error('bad_request', 'board_id должен быть числом', stream=stream)
+                return
+        elif stream != 'private':
+            await self.send_error('bad_request', 'stream: chat, board или private')
+            return
+
+        message_type = data.get('type')
+        if message_type == 'subscribe':
+            await self.subscribe(stream, board_id, data)
+        elif message_type == 'unsubscribe':
+            if stream == 'chat':
+                await self.unsubscribe_chat(board_id)
+            elif stream == 'board':
+                await self.unsubscribe_board(board_id)
+            elif self.private:
+                self.private = False
+                await self.channel_layer.group_discard(private_group_name(self.user.id), self.channel_name)
+            await self.send_frame(stream, {'type': 'unsubscribed'}, board_id)
+        elif stream == 'chat':
+            await self.receive_chat(board_id, message_type, data)
+        elif stream == 'private':
+            await self.receive_private(message_type, data)
+        # В поток доски клиент не пишет - изменения идут через REST
+
+    # ------------------Подписки------------------
+    async def subscribe(self, stream, board_id, data):
+        if stream == 'private':
+            await self.subscribe_private(data.get('resume_from'))
+            return
+        if (board_id in self.chats if stream == 'chat' else board_id in self.boards):
+            return  # повторная подписка ничего не меняет
+        if len(self.chats) + len(self.boards) >= getattr(settings, 'CHAT_STREAM_MAX_BOARDS', 50):
+            await self.send_error('too_many_subscriptions', 'Слишком много подписок', stream=stream, board_id=board_id)
+            return
+
+        access = await database_sync_to_async(load_board_access)(self.user, 'board', board_id)
+        # Те же проверки, что у ws/chat/<id>/ (есть роль) и ws/board/<id>/ (can_read)
+        if access is None or access.role is None or (stream == 'board' and not access.can_read):
+            await self.send_error('forbidden', 'Нет доступа к доске', stream=stream, board_id=board_id)
+            return
+
+        # Отзыв доступа приходит в группу доступа - одну на доску для обоих потоков
+        if board_id not in self.chats and board_id not in self.boards:
+            await self.channel_layer.group_add(board_access_group_name(board_id, self.user.id), self.channel_name)
+        if stream == 'chat':
+            await self.subscribe_chat(board_id, access.role)
+        else:
+            self.boards[board_id] = access.role
+            await self.channel_layer.group_add(board_group_name(board_id), self.channel_name)
+            # Текущая ревизия - точка отсчёта, как hello у ws/board/
+            await self.send_frame('board', {'type': 'hello', 'revision': access.board.revision}, board_id)
+
+    async def subscribe_chat(self, board_id, role):
+        self.chats[board_id] = {'role': role, 'presence_touched': time.monotonic(), 'typing_sent': None}
+        await self.channel_layer.group_add(chat_group_name(board_id), self.channel_name)
+        if await board_presence.ajoin(board_id, self.channel_name, self.user):
+            room_events.joined(board_id, self.user)
+        await self.send(text_data=await board_history_frame(board_id, {'stream': 'chat', 'board_id': board_id}))
+
+    async def unsubscribe_chat(self, board_id):
+        if self.chats.pop(board_id, None) is None:
+            return
+        await self.channel_layer.group_discard(chat_group_name(board_id), self.channel_name)
+        if await board_presence.aleave(board_id, self.channel_name, self.user.id):
+            room_events.left(board_id, self.user)
+        await self.discard_access_group(board_id)
+
+    async def unsubscribe_board(self, board_id):
+        if self.boards.pop(board_id, None) is None:
+            return
+        await self.channel_layer.group_discard(board_group_name(board_id), self.channel_name)
+        await self.discard_access_group(board_id)
+
+    async def discard_access_group(self, board_id):
+        if board_id not in self.chats and board_id not in self.boards:
+            await self.channel_layer.group_discard(board_access_group_name(board_id, self.user.id), self.channel_name)
+
+    async def subscribe_private(self, resume_from):
+        if resume_from is not None:
+            try:
+                resume_from = int(resume_from)
+            except (TypeError, ValueError):
+                await self.send_error('bad_request', 'resume_from должен быть числом', stream='private')
+                return
+        if not self.private:
+            # Сначала группа, потом выборка пропущенного - ничего не теряется между ними
+            self.private = True
+            await self.channel_layer.group_add(private_group_name(self.user.id), self.channel_name)
+        if resume_from is None:
+            await self.send_frame('private', {'type': 'subscribed'})
+            return
+        frame = await database_sync_to_async(missed_messages_frame)(self.user, resume_from)
+        if frame['messages']:
+            self.resumed_seq = max(self.resumed_seq, frame['messages'][-1]['seq'])
+        await self.send_frame('private', frame)
+
+    # ------------------Кадры клиента------------------
+    async def receive_chat(self, board_id, message_type, data):
+        chat = self.chats.get(board_id)
+        if chat is None:
+            await self.send_error('not_subscribed', 'Нет подписки на чат доски', stream='chat', board_id=board_id)
+            return
+        now = time.monotonic()
+        if now - chat['presence_touched'] >= board_presence.ttl / 3:
+            chat['presence_touched'] = now
+            await board_presence.atouch(board_id, self.channel_name, self.user)
+
+        if message_type == 'message':
+            text = data.get('text', '')
+            if not isinstance(text, str):
+                await self.send_error('bad_request', 'text должен быть строкой', stream='chat', board_id=board_id)
+            elif text:
+                room_events.stopped_typing(board_id, self.user)
+                if await self.allow_write():
+                    await post_board_message(self.channel_layer, board_id, self.user, text)
+        elif message_type == 'typing':
+            if typing_allowed(chat['typing_sent']):
+                chat['typing_sent'] = now
+                room_events.typing(board_id, self.user)
+        # type == 'ping' - только продлевает присутствие
+
+    async def receive_private(self, message_type, data):
+        if message_type != 'private_message':
+            return
+        if not self.private:
+            await self.send_error('not_subscribed', 'Нет подписки на личные сообщения', stream='private')
+            return
+        if 'recipient_id' not in data or not isinstance(data.get('text'), str) or not data['text']:
+            await self.send_error('bad_request', 'Нужны recipient_id и text (строка)', stream='private')
+            return
+        try:
+            recipient_id = int(data['recipient_id'])
+        except (TypeError, ValueError):
+            await self.send_error('bad_request', 'recipient_id должен быть числом', stream='private')
+            return
+        if not await self.allow_write():
+            return
+
+        message_data = await database_sync_to_async(save_private_message)(
+            self.user, recipient_id, data['text'], self.private_chats
+        )
+        await self.channel_layer.group_send(private_group_name(recipient_id), {
+            'type': 'private_chat_message',
+            'message': message_data,
+        })
+        await self.send_frame('private', {'type': 'message_sent', 'message': message_data})
+
+    # ------------------События channel layer------------------
+    async def chat_message(self, event):
+        if event['board_id'] in self.chats:
+            await self.send_frame('chat', receive_board_message(event), event['board_id'])
+
+    async def chat_presence(self, event):
+        if event['board_id'] not in self.chats:
+            return
+        joined = [user for user in event['joined'] if user['id'] != self.user.id]
+        left = [left_id for left_id in event['left'] if left_id != self.user.id]
+        if joined or left:
+            await self.send_frame('chat', {'type': 'presence', 'joined': joined, 'left': left}, event['board_id'])
+
+    async def chat_typing(self, event):
+        if event['board_id'] not in self.chats:
+            return
+        users = [user for user in event['users'] if user['id'] != self.user.id]
+        if users:
+            await self.send_frame('chat', {'type': 'typing', 'users': users}, event['board_id'])
+
+    async def board_changes(self, event):
+        if event['board_id'] in self.boards:
+            await self.send_frame('board', {
+                'type': 'changes',
+                'revision': event['revision'],
+                'changes': event['changes'],
+            }, event['board_id'])
+
+    async def board_access(self, event):
+        # Роль пересчитана; None - доступ отозван: снимаем потоки доски, остальные живут
+        board_id, role = event['board_id'], event['role']
+        if role is None:
+            for stream, unsubscribe, subscribed in (('chat', self.unsubscribe_chat, self.chats),
+                                                    ('board', self.unsubscribe_board, self.boards)):
+                if board_id in subscribed:
+                    await unsubscribe(board_id)
+                    await self.send_frame(stream, {'type': 'unsubscribed', 'reason': 'access_revoked'}, board_id)
+            return
+        if board_id in self.chats:
+            self.chats[board_id]['role'] = role
+        if board_id in self.boards:
+            self.boards[board_id] = role
+
+    async def private_chat_message(self, event):
+        if not self.private or event['message']['seq'] <= self.resumed_seq:
+            return  # нет подписки или уже ушло в кадре resume
+        await self.send_frame('private', {'type': 'new_message', 'message': event['message']})
@@ -0,0 +1,146 @@
+'''Кольцевой буфер последних сообщений чата доски в памяти процесса.
+На каждую комнату - последние CHAT_HISTORY_BUFFER_SIZE payload'ов сообщений (chat/payloads.py);
+комнаты вытесняются по LRU (не больше CHAT_HISTORY_BUFFER_ROOMS).
+Буфер заполняется из базы при первом подключении к комнате и пополняется при сохранении
+сообщений, так что история при подключении отдаётся без запросов. Правка сообщения
+заменяет его в буфере, удаление (модерация, архивация) сбрасывает комнату.
+
+Другие процессы пополняют буфер через событие chat_message в группе комнаты;
+если в процессе нет подписчиков комнаты, запись живёт не дольше CHAT_HISTORY_BUFFER_TTL.'''
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+
+from .models import ChatRoom, ChatMessage
+from .payloads import message_payload, message_payloads
+
+
+class RecentHistory:
+    """LRU по комнатам (ключ - id доски), в каждой deque из (id, payload) по возрастанию id"""
+
+    def __init__(self, size=None, max_rooms=None, ttl=None):
+        self.size = size or getattr(settings, 'CHAT_HISTORY_BUFFER_SIZE', 50)
+        self.max_rooms = max_rooms or getattr(settings, 'CHAT_HISTORY_BUFFER_ROOMS', 500)
+        self.ttl = ttl or getattr(settings, 'CHAT_HISTORY_BUFFER_TTL', 300)
+        self._rooms = OrderedDict()  # board_id -> (loaded_at, deque)
+        self._lock = threading.Lock()
+
+    def frame(self, board_id):
+        """Кадр history (dict) или None, если комнаты нет в буфере"""
+        with self._lock:
+            entry = self._rooms.get(int(board_id))
+            if entry is None:
+                return None
+            loaded_at, items = entry
+            if time.monotonic() - loaded_at > self.ttl:
+                del self._rooms[int(board_id)]
+                return None
+            self._rooms.move_to_end(int(board_id))
+            return {'type': 'history', 'messages': [item for _, item in items]}
+
+    def fill(self, board_id, items):
+        """items - payload'ы сообщений (chat/payloads.py) от старых к новым"""
+        buffer = deque(((item['id'], item) for item in items), maxlen=self.size)
+        with self._lock:
+            self._rooms[int(board_id)] = (time.monotonic(), buffer)
+            self._rooms.move_to_end(int(board_id))
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+
+    def append(self, board_id, item, refresh=False):
+        """
+        Добавляет сообщение, если комната уже в буфере (иначе её заполнит следующее подключение).
+        Повторы по id отбрасываются; refresh - продлить жизнь записи (событие от живой группы).
+        """
+        with self._lock:
+            entry = self._rooms.get(int(board_id))
+            if entry is None:
+                return
+            loaded_at, items = entry
+            if any(message_id == item['id'] for message_id, _ in items):
+                return
+            items.append((item['id'], item))
+            if len(items) > 1 and items[-2][0] > item['id']:
+                # Пришло из другого процесса не по порядку
+                ordered = sorted(items, key=lambda pair: pair[0])
+                items.clear()
+                items.extend(ordered)
+            if refresh:
+                self._rooms[int(board_id)] = (time.monotonic(), items)
+
+    def replace(self, board_id, item):
+        """Подменяет сообщение (правка), если оно есть в буфере комнаты"""
+        with self._lock:
+            entry = self._rooms.get(int(board_id))
+            if entry is None:
+                return
+            _, items = entry
+            for index, (message_id, _) in enumerate(items):
+                if message_id == item['id']:
+                    items[index] = (message_id, item)
+                    return
+
+    def invalidate(self, board_id):
+        with self._lock:
+            self._rooms.pop(int(board_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+
+
+recent_history = RecentHistory()
+
+
+def load_history_frame(board_id):
+    """Кадр истории: из буфера, а при промахе - из базы (с заполнением буфера)"""
+    frame = recent_history.frame(board_id)
+    if frame is not None:
+        return frame
+
+    # Отложенные INSERT должны попасть в выборку
+    from .write_behind import chat_write_behind
+    if chat_write_behind.pending_count():
+        chat_write_behind.flush_sync()
+
+    messages = ChatMessage.objects.filter(
+        room__board_id=board_id
+    ).select_related('author__profile', 'attachment').order_by('-created', '-id')[:recent_history.size]
+    recent_history.fill(board_id, message_payloads(reversed(messages)))
+    return recent_history.frame(board_id)
+
+
+def message_saved(sender, instance, created, **kwargs):
+    if created:
+        recent_history.append(instance.room.board_id, message_payload(instance))
+    else:
+        recent_history.replace(instance.room.board_id, message_payload(instance))
+
+
+_room_boards = {}  # room_id -> board_id: комната доски не меняется
+
+
+def _board_id(message):
+    """Доска сообщения без запроса на каждое (архивация удаляет сообщения тысячами)"""
+    if ChatMessage.room.is_cached(message):
+        return message.room.board_id
+    if message.room_id not in _room_boards:
+        _room_boards[message.room_id] = ChatRoom.objects.filter(
+            id=message.room_id
+        ).values_list('board_id', flat=True).first()
+    return _room_boards[message.room_id]
+
+
+def message_deleted(sender, instance, **kwargs):
+    # Удалённое сообщение не должно отдаваться новым подключениям; комната дочитается из базы
+    board_id = _board_id(instance)
+    if board_id is not None:
+        recent_history.invalidate(board_id)
+
+
+post_save.connect(message_saved, sender=ChatMessage, dispatch_uid='chat_recent_history')
+post_delete.connect(message_deleted, sender=ChatMessage, dispatch_uid='chat_recent_history_delete')
@@ -0,0 +1,34 @@
+'''Channel layer для нескольких ASGI процессов (CHANNEL_LAYER=redis, см. settings).
+
+Обычный RedisChannelLayer раскладывает группы по Redis хостам хэшем имени,
+и группы одной доски (chat_board_5, board_5, board_access_5_12, ...) попадают
+на разные хосты. Здесь все группы доски живут на одном хосте: board_id % число хостов.
+Рассылка по доске тогда идёт в один Redis, а нагрузка делится между хостами по доскам.'''
+
+import re
+
+from channels_redis.core import RedisChannelLayer
+
+# Группы, привязанные к доске: чат доски, события доски, доступ пользователя к доске
+BOARD_GROUP_RE = re.compile(r'^(?:chat_board|board_access|board)_(\d+)(?:_|$)')
+
+
+def board_shard(group, ring_size):
+    """Номер хоста для группы доски или None, если группа не относится к доске"""
+    match = BOARD_GROUP_RE.match(group)
+    if match is None:
+        return None
+    return int(match.group(1)) % ring_size
+
+
+class BoardShardedRedisChannelLayer(RedisChannelLayer):
+    """RedisChannelLayer с раскладкой групп по id доски"""
+
+    def consistent_hash(self, value):
+        if isinstance(value, bytes):
+            value = value.decode('utf8')
+        shard = board_shard(value, self.ring_size)
+        if shard is None:
+            # Каналы и прочие группы - как в channels_redis
+            return super().consistent_hash(value)
+        return shard
@@ -0,0 +1,198 @@
+'''Нагрузочный тест рассылки чатов (manage.py chat_loadtest).
+
+Каждый воркер - отдельный процесс со своими клиентами ChatConsumer (чат доски)
+и PrivateChatConsumer (личные сообщения), подключёнными через WebsocketCommunicator
+напрямую к ASGI приложению, без сети. Процессы общаются только через channel layer
+(Redis), как ASGI воркеры в проде. В тексте сообщения - время отправки, каждый
+получатель считает задержку рассылки (fan-out latency). Часы общие, процессы на одной машине.'''
+
+import asyncio
+import json
+import os
+import statistics
+import time
+
+# Отметка в тексте, по которой отличаем сообщения теста от истории
+MARK = 'loadtest'
+
+
+def _stamp(kind, sender):
+    return json.dumps({MARK: kind, 'sent': time.time(), 'from': sender})
+
+
+def _latency(text, kind):
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get(MARK) != kind:
+        return None
+    return time.time() - data['sent']
+
+
+async def _collect(communicator, kind, latencies, stop):
+    """Читает кадры клиента, пока не выставлен stop и очередь не опустела"""
+    while True:
+        try:
+            # Напрямую из очереди: receive_output по таймауту останавливает приложение
+            output = await asyncio.wait_for(communicator.output_queue.get(), timeout=0.2)
+        except asyncio.TimeoutError:
+            if stop.is_set():
+                return
+            continue
+        if output.get('type') != 'websocket.send':
+            continue
+        frame = json.loads(output['text'])
+        if kind == 'chat' and frame.get('type') == 'chat_message':
+            latency = _latency(frame.get('text'), kind)
+        elif kind == 'private' and frame.get('type') == 'new_message':
+            latency = _latency(frame['message'].get('text'), kind)
+        else:
+            continue
+        if latency is not None:
+            latencies.append(latency)
+
+
+async def run_clients(worker, config, ready=None):
+    """
+    Клиенты одного воркера. config: user_ids, board_ids, workers, clients, messages,
+    rate (сообщений в секунду на клиента), private (bool), drain (секунд на досылку).
+    ready - функция ожидания остальных воркеров (барьер), None - один процесс.
+    """
+    from channels.db import database_sync_to_async
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+    from django.contrib.auth.models import User
+    from chat.routing import websocket_urlpatterns
+
+    application = URLRouter(websocket_urlpatterns)
+    users = await database_sync_to_async(lambda: User.objects.in_bulk(config['user_ids']))()
+    user_ids, board_ids = config['user_ids'], config['board_ids']
+
+    chat_clients, private_clients = [], []
+    for j in range(config['clients']):
+        number = worker * config['clients'] + j
+        user = users[user_ids[number % len(user_ids)]]
+        board_id = board_ids[number % len(board_ids)]
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{board_id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Клиент {number} не подключился к доске {board_id}')
+        await communicator.receive_output(timeout=30)  # история
+        chat_clients.append((communicator, user, board_id))
+
+    if config['private']:
+        # Личный сокет - у каждого пользователя один, пользователи поделены между воркерами
+        for index, user_id in enumerate(user_ids):
+            if index % config['workers'] == worker:
+                communicator = WebsocketCommunicator(application, '/ws/private/')
+                communicator.scope['user'] = users[user_id]
+                await communicator.connect()
+                private_clients.append((communicator, users[user_id], index))
+
+    stop = asyncio.Event()
+    chat_latencies, private_latencies = [], []
+    collectors = [asyncio.create_task(_collect(c, 'chat', chat_latencies, stop)) for c, _, _ in chat_clients]
+    collectors += [asyncio.create_task(_collect(c, 'private', private_latencies, stop))
+                   for c, _, _ in private_clients]
+
+    if ready is not None:
+        await asyncio.to_thread(ready)
+
+    interval = 1 / config['rate']
+
+    async def send_chat(communicator, user, board_id):
+        for _ in range(config['messages']):
+            await communicator.send_to(text_data=json.dumps({'type': 'message', 'text': _stamp('chat', user.id)}))
+            await asyncio.sleep(interval)
+
+    async def send_private(communicator, user, index):
+        recipient_id = user_ids[(index + 1) % len(user_ids)]
+        for _ in range(config['messages']):
+            await communicator.send_to(text_data=json.dumps({
+                'type': 'private_message', 'recipient_id': recipient_id, 'text': _stamp('private', user.id),
+            }))
+            await asyncio.sleep(interval)
+
+    started = time.monotonic()
+    await asyncio.gather(*[send_chat(*client) for client in chat_clients],
+                         *[send_private(*client) for client in private_clients])
+    sent_in = time.monotonic() - started
+    await asyncio.sleep(config['drain'])
+    stop.set()
+    await asyncio.gather(*collectors)
+    for communicator, _, _ in chat_clients + private_clients:
+        await communicator.disconnect()
+
+    return {
+        'worker': worker,
+        'chat_sent': len(chat_clients) * config['messages'],
+        'private_sent': len(private_clients) * config['messages'],
+        'chat_latencies': chat_latencies,
+        'private_latencies': private_latencies,
+        'sent_in': sent_in,
+    }
+
+
+def worker_main(worker, config, barrier, results):
+    """Точка входа процесса-воркера (multiprocessing, spawn)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shishka.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+
+    # Лимиты частоты (chat/rate_limit.py) тест не меряет
+    settings.CHAT_RATE_CONNECTION = settings.CHAT_RATE_USER = (10 ** 6, 10 ** 6)
+    try:
+        results.put(asyncio.run(run_clients(worker, config, ready=barrier.wait)))
+    except Exception as e:
+        barrier.abort()
+        results.put({'worker': worker, 'error': repr(e)})
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(results, config):
+    """
+    Сводка по всем воркерам: доставки, задержки (мс) и доставок в секунду
+    за окно отправки (самый медленный воркер).
+    """
+    elapsed = max(result['sent_in'] for result in results)
+    subscribers = {}
+    total_clients = config['workers'] * config['clients']
+    for number in range(total_clients):
+        board_id = config['board_ids'][number % len(config['board_ids'])]
+        subscribers[board_id] = subscribers.get(board_id, 0) + 1
+
+    report = {}
+    for kind in ('chat', 'private'):
+        latencies = [value for result in results for value in result[f'{kind}_latencies']]
+        sent = sum(result[f'{kind}_sent'] for result in results)
+        if kind == 'chat':
+            # Сообщение доски получают все её подписчики, включая автора
+            expected = sum(subscribers[config['board_ids'][n % len(config['board_ids'])]]
+                           for n in range(total_clients)) * config['messages']
+        else:
+            expected = sent
+        report[kind] = {
+            'sent': sent,
+            'delivered': len(latencies),
+            'expected': expected,
+            'deliveries_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': _ms(percentile(latencies, 0.5)),
+            'p95_ms': _ms(percentile(latencies, 0.95)),
+            'p99_ms': _ms(percentile(latencies, 0.99)),
+            'max_ms': _ms(max(latencies) if latencies else None),
+            'mean_ms': _ms(statistics.fmean(latencies) if latencies else None),
+        }
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.archive import archive_old_messages, vacuum_database
+from chat.models import ChatRoom
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые сообщения чатов досок в сжатые сегменты архива (запускать по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90),
+                            help='Архивировать сообщения старше N дней (по умолчанию %(default)s)')
+        parser.add_argument('--board', type=int, action='append',
+                            help='Только чат этой доски (можно несколько раз; общий чат - 999999)')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='После переноса выполнить VACUUM (SQLite), чтобы уменьшить файл базы')
+
+    def handle(self, *args, **options):
+        rooms = ChatRoom.objects.filter(board_id__in=options['board']) if options['board'] else None
+        moved = archive_old_messages(days=options['days'], rooms=rooms)
+
+        for room_id, count in moved.items():
+            self.stdout.write(f'Комната {room_id}: {count} сообщений')
+        if options['vacuum']:
+            vacuum_database()
+        self.stdout.write(self.style.SUCCESS(f'В архив перенесено сообщений: {sum(moved.values())}'))
@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.models import Board
+from chat.loadtest import worker_main, summarize
+from chat.models import ChatRoom
+
+# Redis-совместимые серверы, которые можно поднять локально
+REDIS_SERVERS = ('redis-server', 'valkey-server', 'keydb-server')
+USER_PREFIX = 'loadtest_'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест чатов: N процессов-воркеров с клиентами ChatConsumer и PrivateChatConsumer '
+            'через Redis channel layer; печатает задержку рассылки и пропускную способность')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Процессов (по умолчанию %(default)s)')
+        parser.add_argument('--clients', type=int, default=25, help='Сокетов чата доски на воркер')
+        parser.add_argument('--users', type=int, default=20, help='Тестовых пользователей')
+        parser.add_argument('--boards', type=int, default=4, help='Тестовых досок')
+        parser.add_argument('--messages', type=int, default=10, help='Сообщений от каждого клиента')
+        parser.add_argument('--rate', type=float, default=2, help='Сообщений в секунду от клиента')
+        parser.add_argument('--drain', type=float, default=3, help='Секунд ожидания досылки после отправки')
+        parser.add_argument('--no-private', action='store_true', help='Без личных сообщений')
+        parser.add_argument('--redis', action='append',
+                            help='Адрес Redis (можно несколько - шарды); по умолчанию поднимается локальный')
+        parser.add_argument('--keep-data', action='store_true', help='Не удалять тестовых пользователей и доски')
+        parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+
+    def handle(self, *args, **options):
+        server = None
+        redis_urls = options['redis']
+        if not redis_urls:
+            server, url = self.start_local_redis()
+            redis_urls = [url]
+
+        user_ids, board_ids = self.create_data(options['users'], options['boards'])
+        config = {
+            'user_ids': user_ids,
+            'board_ids': board_ids,
+            'workers': options['workers'],
+            'clients': options['clients'],
+            'messages': options['messages'],
+            'rate': options['rate'],
+            'drain': options['drain'],
+            'private': not options['no_private'],
+        }
+
+        # Воркеры читают настройки при старте: Redis layer и общий кэш
+        os.environ['CHANNEL_LAYER'] = 'redis'
+        os.environ['REDIS_URLS'] = ','.join(redis_urls)
+        try:
+            results = self.run_workers(config)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            if not options['keep_data']:
+                User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+        report = summarize(results, config)
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for kind, title in (('chat', 'ChatConsumer'), ('private', 'PrivateChatConsumer')):
+            row = report[kind]
+            self.stdout.write(
+                f"{title}: отправлено {row['sent']}, доставлено {row['delivered']} из {row['expected']}, "
+                f"{row['deliveries_per_sec']} доставок/с; задержка p50 {row['p50_ms']} мс, "
+                f"p95 {row['p95_ms']} мс, p99 {row['p99_ms']} мс, max {row['max_ms']} мс"
+            )
+
+    def start_local_redis(self):
+        binary = next((shutil.which(name) for name in REDIS_SERVERS if shutil.which(name)), None)
+        if binary is None:
+            raise CommandError(f'Не найден локальный Redis ({", ".join(REDIS_SERVERS)}); укажите --redis redis://...')
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(
+            [binary, '--port', str(port), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            server.terminate()
+            raise CommandError(f'{binary} не запустился на порту {port}')
+        self.stdout.write(f'Локальный {os.path.basename(binary)} на порту {port}')
+        return server, f'redis://127.0.0.1:{port}/0'
+
+    def create_data(self, users_count, boards_count):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        users = [User.objects.create_user(username=f'{USER_PREFIX}{i}', password=None)
+                 for i in range(users_count)]
+        boards = []
+        for i in range(boards_count):
+            board = Board.objects.create(title=f'Нагрузочный тест {i}', owner=users[0])
+            board.members.add(*users)
+            ChatRoom.objects.get_or_create(board=board)
+            boards.append(board.id)
+        return [user.id for user in users], boards
+
+    def run_workers(self, config):
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(config['workers'])
+        results_queue = context.Queue()
+        processes = [context.Process(target=worker_main, args=(worker, config, barrier, results_queue))
+                     for worker in range(config['workers'])]
+        for process in processes:
+            process.start()
+
+        results = [results_queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        errors = [result for result in results if 'error' in result]
+        if errors:
+            raise CommandError(f'Воркеры завершились с ошибкой: {errors}')
+        return sorted(results, key=lambda result: result['worker'])
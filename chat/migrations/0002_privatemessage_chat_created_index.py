@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='privatemessage',
+            index=models.Index(fields=['chat', 'created'], name='chat_privat_chat_id_07651f_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Полнотекстовый поиск по сообщениям чатов досок и личным сообщениям.
+# SQLite: FTS5 таблицы без содержимого (content=''), синхронизируются триггерами;
+# ё приводится к е и в индексе, и в запросе (unicode61 их не сводит).
+# PostgreSQL: GIN индекс по to_tsvector('russian', text) - обновляется самой базой.
+
+from django.db import migrations
+
+SEARCH_TABLES = [
+    # (таблица сообщений, таблица FTS5, индекс PostgreSQL)
+    ('chat_chatmessage', 'chat_chatmessage_fts', 'chat_chatmessage_text_search'),
+    ('chat_privatemessage', 'chat_privatemessage_fts', 'chat_privatemessage_text_search'),
+]
+
+
+def _folded(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def sqlite_statements(table, fts):
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5("
+        f"text, content='', tokenize='unicode61 remove_diacritics 2')",
+        f"INSERT INTO {fts}(rowid, text) SELECT id, {_folded('text')} FROM {table}",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, text) VALUES (new.id, {_folded('new.text')}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, {_folded('old.text')}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF text ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, {_folded('old.text')}); "
+        f"INSERT INTO {fts}(rowid, text) VALUES (new.id, {_folded('new.text')}); END",
+    ]
+
+
+def install_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, fts, index in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            statements = sqlite_statements(table, fts)
+        elif vendor == 'postgresql':
+            statements = [
+                f"CREATE INDEX {index} ON {table} USING GIN (to_tsvector('russian', text))",
+            ]
+        else:
+            # Другие базы - поиск работает через icontains (chat/search.py)
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def remove_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, fts, index in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chatreadstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, remove_search),
+    ]
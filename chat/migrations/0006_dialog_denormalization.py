@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_dialogs(apps, schema_editor):
+    """Последнее сообщение и непрочитанные для уже существующих диалогов"""
+    PrivateChat = apps.get_model('chat', 'PrivateChat')
+    PrivateMessage = apps.get_model('chat', 'PrivateMessage')
+    for chat in PrivateChat.objects.all().iterator():
+        messages = PrivateMessage.objects.filter(chat=chat)
+        last = messages.order_by('-created', '-id').first()
+        unread = messages.filter(is_read=False)
+        PrivateChat.objects.filter(pk=chat.pk).update(
+            last_message=last,
+            last_message_at=last.created if last else chat.created,
+            unread_user1=unread.exclude(sender_id=chat.user1_id).count(),
+            unread_user2=unread.exclude(sender_id=chat.user2_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatarchivesegment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='privatechat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.privatemessage'),
+        ),
+        migrations.AddField(
+            model_name='privatechat',
+            name='last_message_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='privatechat',
+            name='unread_user1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='privatechat',
+            name='unread_user2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='privatechat',
+            index=models.Index(fields=['user1', '-last_message_at', '-id'], name='chat_dialog_user1_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='privatechat',
+            index=models.Index(fields=['user2', '-last_message_at', '-id'], name='chat_dialog_user2_recent'),
+        ),
+        migrations.RunPython(fill_dialogs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_chats(apps, schema_editor):
+    """
+    Пары (a, b) и (b, a) - один диалог: сообщения переносятся в самый старый чат,
+    остальные удаляются; участники ставятся в порядке id, счётчики пересчитываются.
+    """
+    PrivateChat = apps.get_model('chat', 'PrivateChat')
+    PrivateMessage = apps.get_model('chat', 'PrivateMessage')
+
+    pairs = {}
+    for chat_id, user1_id, user2_id in PrivateChat.objects.order_by('id').values_list('id', 'user1_id', 'user2_id'):
+        pairs.setdefault((min(user1_id, user2_id), max(user1_id, user2_id)), []).append((chat_id, user1_id))
+
+    for (low, high), chats in pairs.items():
+        (keep_id, keep_user1), duplicate_ids = chats[0], [chat_id for chat_id, _ in chats[1:]]
+        if not duplicate_ids and keep_user1 == low:
+            continue
+        if duplicate_ids:
+            PrivateMessage.objects.filter(chat_id__in=duplicate_ids).update(chat_id=keep_id)
+            PrivateChat.objects.filter(id__in=duplicate_ids).delete()
+
+        chat = PrivateChat.objects.get(id=keep_id)
+        messages = PrivateMessage.objects.filter(chat_id=keep_id)
+        last = messages.order_by('-created', '-id').first()
+        unread = messages.filter(is_read=False)
+        PrivateChat.objects.filter(id=keep_id).update(
+            user1_id=low,
+            user2_id=high,
+            last_message=last,
+            last_message_at=last.created if last else chat.created,
+            unread_user1=unread.exclude(sender_id=low).count(),
+            unread_user2=unread.exclude(sender_id=high).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_dialog_denormalization'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='privatechat',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_duplicate_chats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='privatechat',
+            constraint=models.UniqueConstraint(fields=('user1', 'user2'), name='unique_private_chat_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='privatechat',
+            constraint=models.CheckConstraint(condition=models.Q(('user1__lte', models.F('user2'))), name='private_chat_user_order'),
+        ),
+    ]
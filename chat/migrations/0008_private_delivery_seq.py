@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:31
+
+import importlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_messages(apps, schema_editor):
+    """Получатель и номера доставки для уже отправленных сообщений - по порядку отправки"""
+    PrivateMessage = apps.get_model('chat', 'PrivateMessage')
+    PrivateDeliverySequence = apps.get_model('chat', 'PrivateDeliverySequence')
+
+    last_seq = {}
+    messages = PrivateMessage.objects.select_related('chat').order_by('created', 'id')
+    for message in messages.iterator():
+        chat = message.chat
+        recipient_id = chat.user2_id if message.sender_id == chat.user1_id else chat.user1_id
+        last_seq[recipient_id] = last_seq.get(recipient_id, 0) + 1
+        PrivateMessage.objects.filter(pk=message.pk).update(recipient_id=recipient_id, seq=last_seq[recipient_id])
+    PrivateDeliverySequence.objects.bulk_create(
+        PrivateDeliverySequence(user_id=user_id, last_seq=seq) for user_id, seq in last_seq.items()
+    )
+
+
+def restore_search_triggers(apps, schema_editor):
+    """
+    SQLite меняет NOT NULL пересозданием таблицы, и триггеры FTS из 0004 пропадают
+    вместе со старой таблицей. Индекс FTS цел (id те же), возвращаем только триггеры.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search = importlib.import_module('chat.migrations.0004_message_search')
+    table, fts = 'chat_privatemessage', 'chat_privatemessage_fts'
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+    for sql in search.sqlite_statements(table, fts)[2:]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_private_chat_canonical_pair'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # При откате таблица тоже пересоздаётся - триггеры возвращаются последним шагом
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.CreateModel(
+            name='PrivateDeliverySequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='recipient',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_private_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_messages, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='privatemessage',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='received_private_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='privatemessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='privatemessage',
+            constraint=models.UniqueConstraint(fields=('recipient', 'seq'), name='unique_private_delivery_seq'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MaxLengthValidator
 from boards.models import Board
 
+# Служебная доска общего чата: читать и писать в него может любой вошедший пользователь
+GENERAL_BOARD_ID = 999999
+
 
 class ChatRoom(models.Model):
     board = models.OneToOneField(
@@ -64,6 +69,7 @@ class ChatMessage(models.Model):
         ordering = ['created']
         indexes = [
             models.Index(fields=['room', 'created']),  # Для быстрой загрузки истории
+            models.Index(fields=['room', 'id']),  # непрочитанные: id > отметки прочтения
         ]
 
     def __str__(self):
@@ -73,11 +79,67 @@ class ChatMessage(models.Model):
     
     def save(self, *args, **kwargs):
         # Помечаем сообщение как отредактированное при изменении
-        if self.pk:
+        # (не при первой записи: id может быть выдан заранее, см. chat/write_behind.py)
+        if self.pk and not self._state.adding:
             self.is_edited = True
         super().save(*args, **kwargs)
 
 
+class ChatReadState(models.Model):
+    """
+    Отметка прочтения чата доски: одна строка на (пользователь, комната).
+    Непрочитанные - сообщения комнаты с id больше last_read_message_id (кроме своих).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='chat_read_states'
+    )
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name='read_states'
+    )
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'room'], name='unique_chat_read_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} прочитал {self.room_id} до #{self.last_read_message_id}"
+
+
+class ChatArchiveSegment(models.Model):
+    """
+    Сегмент архива сообщений комнаты: gzip JSONL файл в CHAT_ARCHIVE_ROOT
+    (room_<id>/<ГГГГ-ММ>/part-<n>.jsonl.gz). Файлы только дописываются новыми
+    сегментами, существующие не переписываются. Строка файла - payload сообщения.
+    """
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name='archive_segments'
+    )
+    month = models.DateField()  # первое число месяца сообщений сегмента
+    path = models.CharField(max_length=255, unique=True)  # относительно CHAT_ARCHIVE_ROOT
+    first_id = models.PositiveBigIntegerField()
+    last_id = models.PositiveBigIntegerField()
+    count = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['room', 'last_id']
+        indexes = [
+            models.Index(fields=['room', 'last_id']),  # листание назад: сегменты до курсора
+        ]
+
+    def __str__(self):
+        return f"Архив комнаты {self.room_id}: {self.path} ({self.count})"
+
+
 class ChatFile(models.Model):
     """Отдельная модель для файлов в чате"""
     room = models.ForeignKey(  
@@ -127,12 +189,74 @@ class PrivateChat(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     
+    # Денормализация для списка диалогов (обновляет PrivateMessage.save и mark_read):
+    # последнее сообщение, время активности (без сообщений - время создания)
+    # и непрочитанные у каждого участника
+    last_message = models.ForeignKey(
+        'PrivateMessage',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(default=timezone.now)
+    unread_user1 = models.PositiveIntegerField(default=0)
+    unread_user2 = models.PositiveIntegerField(default=0)
+    
     class Meta:
-        unique_together = ['user1', 'user2']  # чтобы не создать дубликат
+        constraints = [
+            # Участники в каноническом порядке (меньший id - user1), поэтому пара
+            # уникальна независимо от того, кто начал диалог, и ищется одним индексом
+            models.UniqueConstraint(fields=['user1', 'user2'], name='unique_private_chat_pair'),
+            models.CheckConstraint(condition=Q(user1__lte=F('user2')), name='private_chat_user_order'),
+        ]
+        indexes = [
+            # Диалоги пользователя по свежести - для каждой стороны свой индекс
+            models.Index(fields=['user1', '-last_message_at', '-id'], name='chat_dialog_user1_recent'),
+            models.Index(fields=['user2', '-last_message_at', '-id'], name='chat_dialog_user2_recent'),
+        ]
     
     def __str__(self):
         return f"Чат между {self.user1.username} и {self.user2.username}"
     
+    def save(self, *args, **kwargs):
+        if self.user1_id > self.user2_id:
+            self.user1_id, self.user2_id = self.user2_id, self.user1_id
+            self.unread_user1, self.unread_user2 = self.unread_user2, self.unread_user1
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def get_or_create_between(cls, user, other):
+        """
+        Диалог двух пользователей (объекты или id) - один поиск по уникальному индексу.
+        При одновременном создании проигравший получает IntegrityError внутри
+        get_or_create и читает уже созданный чат. Возвращает (chat, created).
+        """
+        user_ids = sorted([getattr(user, 'id', user), getattr(other, 'id', other)])
+        return cls.objects.get_or_create(user1_id=user_ids[0], user2_id=user_ids[1])
+    
+    def unread_field(self, user):
+        """Имя счётчика непрочитанных для участника"""
+        user_id = getattr(user, 'id', user)
+        if user_id == self.user1_id:
+            return 'unread_user1'
+        if user_id == self.user2_id:
+            return 'unread_user2'
+        raise ValueError("Пользователь не участвует в этом чате")
+    
+    def unread_count(self, user):
+        return getattr(self, self.unread_field(user))
+    
+    def mark_read(self, user):
+        """Помечает прочитанными сообщения собеседника и обнуляет счётчик пользователя"""
+        field = self.unread_field(user)
+        with transaction.atomic():
+            # Сначала строка чата (в PostgreSQL - блокировка до конца транзакции),
+            # чтобы новое сообщение не проскочило между UPDATE сообщений и обнулением
+            PrivateChat.objects.filter(pk=self.pk).update(**{field: 0})
+            self.messages.filter(is_read=False).exclude(sender_id=getattr(user, 'id', user)).update(is_read=True)
+        setattr(self, field, 0)
+    
     def get_other_user(self, user):
         """Возвращает собеседника. Если пользователь не в чате, выбрасывает ValueError."""
         if user == self.user1:
@@ -157,6 +281,58 @@ class PrivateMessage(models.Model):
     text = models.TextField(max_length=2000)
     created = models.DateTimeField(auto_now_add=True, db_index=True)
     is_read = models.BooleanField(default=False)
+    # Получатель и его номер доставки: у каждого пользователя свой возрастающий счётчик
+    # входящих, по нему сокет после переподключения досылает пропущенное (resume_from)
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='received_private_messages'
+    )
+    seq = models.PositiveBigIntegerField()
     
     class Meta:
-        ordering = ['created']
\ No newline at end of file
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['chat', 'created']),  # страницы диалога по курсору
+        ]
+        constraints = [
+            # Заодно индекс для досылки: recipient = ? AND seq > ? ORDER BY seq
+            models.UniqueConstraint(fields=['recipient', 'seq'], name='unique_private_delivery_seq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            if adding and self.seq is None:
+                chat = self.chat
+                self.recipient_id = chat.user2_id if self.sender_id == chat.user1_id else chat.user1_id
+                self.seq = PrivateDeliverySequence.next_for(self.recipient_id)
+            super().save(*args, **kwargs)
+            if adding:
+                self.update_chat_counters()
+
+    def update_chat_counters(self):
+        """Новое сообщение: последнее сообщение диалога и +1 непрочитанных у получателя"""
+        chat = self.chat
+        updates = {'last_message': self, 'last_message_at': self.created}
+        if chat.user1_id != chat.user2_id:
+            field = 'unread_user2' if self.sender_id == chat.user1_id else 'unread_user1'
+            updates[field] = F(field) + 1
+        PrivateChat.objects.filter(pk=self.chat_id).update(**updates)
+
+
+class PrivateDeliverySequence(models.Model):
+    """Последний выданный номер доставки личных сообщений пользователю"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    last_seq = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def next_for(cls, user_id):
+        """
+        Следующий номер для получателя. Вызывать внутри транзакции: UPDATE ... + 1
+        блокирует строку счётчика до коммита, параллельные отправки получают разные номера.
+        """
+        if not cls.objects.filter(user_id=user_id).update(last_seq=F('last_seq') + 1):
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(last_seq=F('last_seq') + 1)
+        return cls.objects.filter(user_id=user_id).values_list('last_seq', flat=True).get()
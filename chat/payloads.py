@@ -0,0 +1,100 @@
+'''Единый компактный формат сообщения чата доски для WebSocket и REST.
+Payload сообщения строится один раз и лежит в кэше; автор (имя, аватар) кэшируется
+отдельно по пользователю и сбрасывается при изменении пользователя или профиля.
+Время отдаётся в ISO, "своё/чужое" и подписи вида "Вчера 10:15" считает клиент.'''
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+from .models import ChatMessage
+
+CHAT_PAYLOAD_CACHE_TIMEOUT = getattr(settings, 'CHAT_PAYLOAD_CACHE_TIMEOUT', 60 * 60 * 24)
+DEFAULT_AVATAR = '/media/avatars/default/user.png'
+
+
+def _message_key(message_id):
+    return f'chat-payload:{message_id}'
+
+
+def _author_key(user_id):
+    return f'chat-author:{user_id}'
+
+
+def author_payload(user):
+    profile = getattr(user, 'profile', None)
+    return {
+        'id': user.id,
+        'username': user.username,
+        'avatar': profile.avatar.url if profile and profile.avatar else DEFAULT_AVATAR,
+    }
+
+
+def _message_fields(message):
+    attachment = None
+    if message.attachment_id:
+        file = message.attachment.file
+        attachment = {
+            'id': message.attachment_id,
+            'url': file.url if file else None,
+            'name': file.name.split('/')[-1] if file else '',
+        }
+    return {
+        'id': message.id,
+        'author_id': message.author_id,
+        'text': message.text,
+        'attachment': attachment,
+        'created': message.created.isoformat(),
+        'is_edited': message.is_edited,
+    }
+
+
+def message_payloads(messages):
+    """
+    Payload'ы списка сообщений (порядок сохраняется).
+    На промахах кэша нужны загруженные author__profile и attachment (select_related).
+    """
+    messages = list(messages)
+    cached = cache.get_many([_message_key(m.id) for m in messages])
+    authors = cache.get_many([_author_key(m.author_id) for m in messages])
+
+    missing_messages, missing_authors = {}, {}
+    result = []
+    for message in messages:
+        fields = cached.get(_message_key(message.id))
+        if fields is None:
+            fields = missing_messages[_message_key(message.id)] = _message_fields(message)
+        author = authors.get(_author_key(message.author_id))
+        if author is None:
+            author = authors[_author_key(message.author_id)] = \
+                missing_authors[_author_key(message.author_id)] = author_payload(message.author)
+        payload = {key: value for key, value in fields.items() if key != 'author_id'}
+        payload['author'] = author
+        result.append(payload)
+
+    if missing_messages:
+        cache.set_many(missing_messages, CHAT_PAYLOAD_CACHE_TIMEOUT)
+    if missing_authors:
+        cache.set_many(missing_authors, CHAT_PAYLOAD_CACHE_TIMEOUT)
+    return result
+
+
+def message_payload(message):
+    return message_payloads([message])[0]
+
+
+# ------------------Сигналы------------------
+def forget_message(sender, instance, **kwargs):
+    cache.delete(_message_key(instance.id))
+
+
+def forget_author(sender, instance, **kwargs):
+    # Сигналы от User и от Profile (у профиля - user_id)
+    cache.delete(_author_key(instance.id if isinstance(instance, User) else instance.user_id))
+
+
+post_save.connect(forget_message, sender=ChatMessage, dispatch_uid='chat_payload_message_save')
+post_delete.connect(forget_message, sender=ChatMessage, dispatch_uid='chat_payload_message_delete')
+post_save.connect(forget_author, sender=User, dispatch_uid='chat_payload_user_save')
+post_save.connect(forget_author, sender='users.Profile', dispatch_uid='chat_payload_profile_save')
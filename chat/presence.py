@@ -0,0 +1,264 @@
+'''Присутствие ("кто сейчас на доске") и индикатор набора текста для ChatConsumer.
+
+Присутствие хранится в кэше Django, не в базе: на доску - записи по каналам
+{channel_name: [user_id, username, время отметки]}. Запись обновляется при активности
+сокета; записи старше CHAT_PRESENCE_TTL (упавший процесс не успел убрать свои)
+при чтении отбрасываются.
+- Redis (CHANNEL_LAYER=redis, общий кэш процессов): хэш на доску, каждый сокет - своё поле
+  (HSET/HDEL), процессы не перезаписывают записи друг друга;
+- остальные бэкенды (LocMem - кэш одного процесса): словарь в одном ключе под блокировкой.
+Обращения к хранилищу синхронные (redis-py): консьюмеры вызывают их через
+async-обёртки ajoin/atouch/aleave/ausers в пуле потоков, чтобы не держать цикл событий.
+
+Рассылки группируются в процессе на CHAT_COALESCE_INTERVAL мс:
+- снимок присутствия уходит новому сокету вместе с историей (один кадр);
+- входы/выходы за интервал - одним событием presence со списками joined/left;
+- "печатает" - не чаще CHAT_TYPING_THROTTLE мс от сокета, и все, кто печатал
+  за интервал, уходят одним событием typing. Комната из 50 человек получает
+  не больше одной рассылки typing за интервал, а не по одной на нажатие.'''
+
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+
+def chat_group_name(board_id):
+    return f'chat_board_{board_id}'
+
+
+def _presence_key(board_id):
+    return f'chat-presence:{board_id}'
+
+
+class _DictPresenceStore:
+    """Словарь каналов одним значением кэша; блокировка - в пределах процесса"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _store(self, board_id, entries):
+        if entries:
+            cache.set(_presence_key(board_id), entries, self.ttl * 2)
+        else:
+            cache.delete(_presence_key(board_id))
+
+    def all(self, board_id):
+        return cache.get(_presence_key(board_id)) or {}
+
+    def set(self, board_id, channel_name, entry, only_existing=False):
+        """Записывает канал; возвращает все записи доски (None, если канала не было и only_existing)"""
+        with self._lock:
+            entries = self.all(board_id)
+            if only_existing and channel_name not in entries:
+                return None
+            entries[channel_name] = entry
+            self._store(board_id, entries)
+            return entries
+
+    def delete(self, board_id, *channel_names):
+        """Убирает каналы; возвращает оставшиеся записи доски"""
+        with self._lock:
+            entries = self.all(board_id)
+            for channel_name in channel_names:
+                entries.pop(channel_name, None)
+            self._store(board_id, entries)
+            return entries
+
+
+class _RedisPresenceStore:
+    """
+    Хэш Redis на доску: поле - канал, значение - json записи; операции атомарны по полю.
+    Запись и чтение всех полей идут одним pipeline - один сетевой обмен.
+    """
+
+    def __init__(self, ttl, client=None):
+        self.ttl = ttl
+        self._client = client
+
+    def client(self):
+        return self._client or cache._cache.get_client(write=True)
+
+    def _key(self, board_id):
+        return cache.make_and_validate_key(_presence_key(board_id))
+
+    @staticmethod
+    def _decode(raw):
+        return {
+            (channel.decode() if isinstance(channel, bytes) else channel): json.loads(entry)
+            for channel, entry in raw.items()
+        }
+
+    def all(self, board_id):
+        return self._decode(self.client().hgetall(self._key(board_id)))
+
+    def set(self, board_id, channel_name, entry, only_existing=False):
+        client, key = self.client(), self._key(board_id)
+        if only_existing and not client.hexists(key, channel_name):
+            return None
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(key, channel_name, json.dumps(entry))
+        # Ключ живёт, пока на доске кто-то отмечается
+        pipe.expire(key, self.ttl * 2)
+        pipe.hgetall(key)
+        return self._decode(pipe.execute()[-1])
+
+    def delete(self, board_id, *channel_names):
+        pipe = self.client().pipeline(transaction=False)
+        key = self._key(board_id)
+        if channel_names:
+            pipe.hdel(key, *channel_names)
+        pipe.hgetall(key)
+        return self._decode(pipe.execute()[-1])
+
+
+class BoardPresence:
+    """Подключения к чатам досок в кэше (общем для процессов при общем бэкенде кэша)"""
+
+    def __init__(self, ttl=None, store=None):
+        self.ttl = ttl or getattr(settings, 'CHAT_PRESENCE_TTL', 90)
+        self._store = store
+
+    @property
+    def store(self):
+        # Бэкенд кэша известен только после загрузки настроек - выбираем при первом обращении
+        if self._store is None:
+            if isinstance(caches['default'], RedisCache):
+                self._store = _RedisPresenceStore(self.ttl)
+            else:
+                self._store = _DictPresenceStore(self.ttl)
+        return self._store
+
+    def _fresh(self, board_id, entries, now):
+        """Записи без просроченных; просроченные убираются из хранилища"""
+        fresh = {channel: entry for channel, entry in entries.items() if now - entry[2] <= self.ttl}
+        if len(fresh) < len(entries):
+            self.store.delete(board_id, *(channel for channel in entries if channel not in fresh))
+        return fresh
+
+    def join(self, board_id, channel_name, user):
+        """Отмечает подключение; True - это первое подключение пользователя к доске"""
+        now = time.time()
+        entries = self._fresh(board_id, self.store.set(board_id, channel_name, [user.id, user.username, now]), now)
+        return all(entry[0] != user.id for channel, entry in entries.items() if channel != channel_name)
+
+    def touch(self, board_id, channel_name, user):
+        # Ушедший (или вычищенный как просроченный) сокет не воскрешаем
+        self.store.set(board_id, channel_name, [user.id, user.username, time.time()], only_existing=True)
+
+    def leave(self, board_id, channel_name, user_id):
+        """Убирает подключение; True - у пользователя больше нет подключений к доске"""
+        now = time.time()
+        entries = self._fresh(board_id, self.store.delete(board_id, channel_name), now)
+        return all(entry[0] != user_id for entry in entries.values())
+
+    def users(self, board_id):
+        """Пользователи онлайн: [{'id', 'username'}] без повторов"""
+        now = time.time()
+        users = {}
+        for user_id, username, _ in self._fresh(board_id, self.store.all(board_id), now).values():
+            users[user_id] = {'id': user_id, 'username': username}
+        return sorted(users.values(), key=lambda user: user['username'])
+
+    # Для консьюмеров: хранилище синхронное, в цикле событий его не вызываем
+    async def ajoin(self, board_id, channel_name, user):
+        return await sync_to_async(self.join, thread_sensitive=False)(board_id, channel_name, user)
+
+    async def atouch(self, board_id, channel_name, user):
+        await sync_to_async(self.touch, thread_sensitive=False)(board_id, channel_name, user)
+
+    async def aleave(self, board_id, channel_name, user_id):
+        return await sync_to_async(self.leave, thread_sensitive=False)(board_id, channel_name, user_id)
+
+    async def ausers(self, board_id):
+        return await sync_to_async(self.users, thread_sensitive=False)(board_id)
+
+
+class RoomEventCoalescer:
+    """
+    Копит события по доскам и рассылает их группе чата доски раз в interval:
+    presence - {'joined': [...], 'left': [...]}, typing - {'users': [...]}.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = (interval if interval is not None
+                         else getattr(settings, 'CHAT_COALESCE_INTERVAL', 500)) / 1000
+        self._presence = {}  # board_id -> {'joined': {user_id: user}, 'left': set}
+        self._typing = {}  # board_id -> {user_id: user}
+        self._handles = {}  # board_id -> (loop, TimerHandle)
+
+    def joined(self, board_id, user):
+        pending = self._presence.setdefault(board_id, {'joined': {}, 'left': set()})
+        pending['left'].discard(user.id)
+        pending['joined'][user.id] = {'id': user.id, 'username': user.username}
+        self._schedule(board_id)
+
+    def left(self, board_id, user):
+        pending = self._presence.setdefault(board_id, {'joined': {}, 'left': set()})
+        pending['joined'].pop(user.id, None)
+        pending['left'].add(user.id)
+        self.stopped_typing(board_id, user)
+        self._schedule(board_id)
+
+    def typing(self, board_id, user):
+        self._typing.setdefault(board_id, {})[user.id] = {'id': user.id, 'username': user.username}
+        self._schedule(board_id)
+
+    def stopped_typing(self, board_id, user):
+        """Сообщение отправлено - "печатает" для этого пользователя больше не рассылаем"""
+        self._typing.get(board_id, {}).pop(user.id, None)
+
+    def clear(self):
+        for _, handle in self._handles.values():
+            handle.cancel()
+        self._presence.clear()
+        self._typing.clear()
+        self._handles.clear()
+
+    def _schedule(self, board_id):
+        loop = asyncio.get_running_loop()
+        scheduled = self._handles.get(board_id)
+        if scheduled is not None and scheduled[0] is loop:
+            return
+        handle = loop.call_later(self.interval, lambda: loop.create_task(self.flush(board_id)))
+        self._handles[board_id] = (loop, handle)
+
+    async def flush(self, board_id):
+        scheduled = self._handles.pop(board_id, None)
+        if scheduled is not None:
+            scheduled[1].cancel()
+
+        channel_layer = get_channel_layer()
+        presence = self._presence.pop(board_id, None)
+        if presence and (presence['joined'] or presence['left']):
+            await channel_layer.group_send(chat_group_name(board_id), {
+                'type': 'chat_presence',
+                'board_id': board_id,
+                'joined': list(presence['joined'].values()),
+                'left': sorted(presence['left']),
+            })
+        typing = self._typing.pop(board_id, None)
+        if typing:
+            await channel_layer.group_send(chat_group_name(board_id), {
+                'type': 'chat_typing',
+                'board_id': board_id,
+                'users': list(typing.values()),
+            })
+
+
+board_presence = BoardPresence()
+room_events = RoomEventCoalescer()
+
+
+def typing_allowed(last_sent, now=None):
+    """Троттлинг "печатает" на сокет: не чаще CHAT_TYPING_THROTTLE мс"""
+    throttle = getattr(settings, 'CHAT_TYPING_THROTTLE', 2000) / 1000
+    now = time.monotonic() if now is None else now
+    return last_sent is None or now - last_sent >= throttle
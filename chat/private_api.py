@@ -6,21 +6,39 @@ from django.db.models import Q, Max
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from .models import PrivateChat, PrivateMessage
+from .views_parts.pagination import keyset_page, CursorError
+from .search import search_private_messages, SearchError
 
 class MyDialogsView(APIView):
     """Список диалогов текущего пользователя"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Находим все чаты где участвует пользователь
+        # Одним запросом: последнее сообщение и счётчики хранятся в самом чате
+        # (обновляются при сохранении PrivateMessage). Свежие диалоги первыми.
         chats = PrivateChat.objects.filter(
             Q(user1=request.user) | Q(user2=request.user)
-        )
+        ).select_related('user1', 'user2', 'last_message')
+        
+        # Без ?limit= / ?before_id= / ?after_id= - весь список, как раньше.
+        # С ними - страница по курсору (id чата), has_more и курсоры в заголовках.
+        # Курсор идёт по last_message_at, а он меняется: диалог с новым сообщением
+        # уезжает наверх и в следующие страницы не попадёт, а если это сам чат курсора -
+        # следующая страница начнётся заново сверху. Клиент, листающий список, берёт
+        # такие диалоги из живых событий (new_message) и убирает повторы по id.
+        if not any(name in request.GET for name in ('limit', 'before_id', 'after_id')):
+            items, headers = chats.order_by('-last_message_at', '-id'), None
+        else:
+            try:
+                page = keyset_page(chats, request.GET, field='last_message_at')
+            except CursorError as e:
+                return Response({'error': str(e)}, status=400)
+            items, headers = page.items, page.headers()
         
         result = []
-        for chat in chats:
+        for chat in items:
             other_user = chat.get_other_user(request.user)
-            last_message = chat.messages.last()
+            last_message = chat.last_message
             
             result.append({
                 'id': chat.id,
@@ -30,10 +48,10 @@ class MyDialogsView(APIView):
                 },
                 'last_message': last_message.text[:50] if last_message else '',
                 'last_message_time': last_message.created if last_message else None,
-                'unread_count': chat.messages.filter(~Q(sender=request.user), is_read=False).count()
+                'unread_count': chat.unread_count(request.user)
             })
         
-        return Response(result)
+        return Response(result, headers=headers)
 
 class DialogMessagesView(APIView):
     """Сообщения конкретного диалога"""
@@ -46,10 +64,15 @@ class DialogMessagesView(APIView):
         if request.user not in [chat.user1, chat.user2]:
             return Response({'error': 'Нет доступа'}, status=403)
         
-        # Помечаем как прочитанные
-        chat.messages.filter(~Q(sender=request.user), is_read=False).update(is_read=True)
+        # Помечаем как прочитанные (и обнуляем счётчик непрочитанных диалога)
+        chat.mark_read(request.user)
         
-        messages = chat.messages.all().order_by('-created')[:50]
+        # Страница по курсору (?before_id= / ?after_id=); тело остаётся списком,
+        # курсоры и has_more - в заголовках X-Before-Id / X-After-Id / X-Has-More
+        try:
+            page = keyset_page(chat.messages.select_related('sender'), request.GET)
+        except CursorError as e:
+            return Response({'error': str(e)}, status=400)
         
         result = [{
             'id': msg.id,
@@ -57,10 +80,41 @@ class DialogMessagesView(APIView):
             'sender_id': msg.sender.id,
             'sender_name': msg.sender.username,
             'created': msg.created,
+            'is_read': msg.is_read,
+            'seq': msg.seq
+        } for msg in page.items]
+        
+        return Response(result[::-1], headers=page.headers())  # от старых к новым
+
+class SearchPrivateMessagesView(APIView):
+    """Поиск по личным сообщениям: ?q=текст, ?chat_id= - один диалог; курсор как у истории"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        chat_id = request.GET.get('chat_id')
+        try:
+            messages = search_private_messages(
+                request.user,
+                request.GET.get('q', ''),
+                chat_id=int(chat_id) if chat_id else None
+            )
+            page = keyset_page(messages, request.GET)
+        except (SearchError, CursorError) as e:
+            return Response({'error': str(e)}, status=400)
+        except ValueError:
+            return Response({'error': 'chat_id должен быть числом'}, status=400)
+        
+        result = [{
+            'id': msg.id,
+            'chat_id': msg.chat_id,
+            'text': msg.text,
+            'sender_id': msg.sender.id,
+            'sender_name': msg.sender.username,
+            'created': msg.created,
             'is_read': msg.is_read
-        } for msg in messages]
+        } for msg in page.items]
         
-        return Response(result[::-1])  # от старых к новым
+        return Response(result, headers=page.headers())  # от новых к старым
 
 class SendPrivateMessageView(APIView):
     """Отправка сообщения"""
@@ -119,16 +173,6 @@ class CreatePrivateChatView(APIView):
         other_user_id = request.data.get('user_id')
         other_user = get_object_or_404(User, id=other_user_id)
         
-        # Проверяем, может уже есть чат
-        chat = PrivateChat.objects.filter(
-            (Q(user1=request.user) & Q(user2=other_user)) |
-            (Q(user1=other_user) & Q(user2=request.user))
-        ).first()
-        
-        if not chat:
-            chat = PrivateChat.objects.create(
-                user1=request.user,
-                user2=other_user
-            )
+        chat, _ = PrivateChat.get_or_create_between(request.user, other_user)
         
-        return Response({'chat_id': chat.id})
\ No newline at end of file
+        return Response({'chat_id': chat.id})
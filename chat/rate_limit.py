@@ -0,0 +1,149 @@
+'''Ограничение частоты сообщений в WebSocket чатах (ChatConsumer, PrivateChatConsumer).
+
+Каждый кадр, который пишет в базу, берёт токен из двух вёдер (token bucket):
+сокета (CHAT_RATE_CONNECTION) и пользователя (CHAT_RATE_USER, общее для всех вкладок
+в этом процессе). Нет токена - клиент получает кадр
+{"type": "error", "code": "rate_limited", "retry_after": секунды}, запись не делается.
+
+Очередь отклонённых кадров: если клиент продолжает слать сверх лимита
+(CHAT_RATE_MAX_REJECTED отказов подряд), сокет закрывается с кодом 4429. Буфер отправки
+ASGI сервера приложению не виден, поэтому "переполнение" меряется по входящему потоку.
+
+Счётчики отказов и закрытий лежат в кэше (chat-throttle:*), их отдаёт
+GET api/chat/throttle-stats/ (только для staff).'''
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+RATE_LIMITED_CLOSE_CODE = 4429
+THROTTLE_COUNTERS = ('limited_connection', 'limited_user', 'closed_backlog')
+MAX_TRACKED_USERS = 10_000
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst в запасе"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now=None):
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def give_back(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def retry_after(self):
+        return round(max(0.0, (1 - self.tokens) / self.rate), 2)
+
+
+class UserBuckets:
+    """Вёдра пользователей в процессе (LRU, чтобы не расти бесконечно)"""
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(*getattr(settings, 'CHAT_RATE_USER', (10, 20)))
+            self._buckets.move_to_end(user_id)
+            while len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+            return bucket
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+user_buckets = UserBuckets()
+
+
+def count(name):
+    key = f'chat-throttle:{name}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен между add и incr - счётчик начинается заново
+        cache.set(key, 1, None)
+
+
+def throttle_stats():
+    values = cache.get_many([f'chat-throttle:{name}' for name in THROTTLE_COUNTERS])
+    return {name: values.get(f'chat-throttle:{name}', 0) for name in THROTTLE_COUNTERS}
+
+
+class RateLimitedConsumerMixin:
+    """
+    Для AsyncWebsocketConsumer: перед записью в базу вызывать
+    `if not await self.allow_write(): return`.
+    """
+
+    def _connection_bucket(self):
+        if getattr(self, 'rate_bucket', None) is None:
+            self.rate_bucket = TokenBucket(*getattr(settings, 'CHAT_RATE_CONNECTION', (5, 10)))
+            self.rate_rejected = 0
+        return self.rate_bucket
+
+    async def allow_write(self):
+        connection_bucket = self._connection_bucket()
+        if not connection_bucket.take():
+            return await self.reject_write('limited_connection', connection_bucket)
+
+        user_bucket = user_buckets.get(self.scope['user'].id)
+        if not user_bucket.take():
+            # Токен сокета не потрачен - кадр не прошёл
+            connection_bucket.give_back()
+            return await self.reject_write('limited_user', user_bucket)
+
+        self.rate_rejected = 0
+        return True
+
+    async def reject_write(self, counter, bucket):
+        # Счётчики в кэше (Redis - сетевой вызов) - не в цикле событий
+        await sync_to_async(count, thread_sensitive=False)(counter)
+        self.rate_rejected += 1
+        if self.rate_rejected >= getattr(settings, 'CHAT_RATE_MAX_REJECTED', 20):
+            await sync_to_async(count, thread_sensitive=False)('closed_backlog')
+            print(f"🚫 {self.scope['user'].username}: {self.rate_rejected} кадров сверх лимита подряд, сокет закрыт")
+            await self.close(code=RATE_LIMITED_CLOSE_CODE)
+            return False
+
+        await self.send_error('rate_limited', 'Слишком много сообщений, подождите',
+                              retry_after=bucket.retry_after())
+        return False
+
+    async def load_frame(self, text_data):
+        """Кадр клиента - JSON объект; иначе ответ bad_request и None (сокет не падает)"""
+        try:
+            data = json.loads(text_data)
+        except (TypeError, json.JSONDecodeError):
+            await self.send_error('bad_request', 'Некорректный JSON')
+            return None
+        if not isinstance(data, dict):
+            await self.send_error('bad_request', 'Кадр должен быть JSON объектом')
+            return None
+        return data
+
+    async def send_error(self, code, message, **extra):
+        await self.send(text_data=json.dumps({'type': 'error', 'code': code, 'error': message, **extra}))
@@ -0,0 +1,73 @@
+'''Непрочитанные сообщения чатов досок по отметке прочтения (ChatReadState).
+Отметка - id последнего прочитанного сообщения; число непрочитанных -
+подсчёт по индексу (room, id) справа от отметки, без строк на каждое сообщение.'''
+
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from boards.permissions import readable_boards_q
+from .models import ChatMessage, ChatReadState
+
+
+def _watermark(user, room_ref):
+    return Coalesce(
+        Subquery(
+            ChatReadState.objects.filter(user=user, room_id=room_ref).values('last_read_message_id')[:1]
+        ),
+        Value(0),
+    )
+
+
+def unread_count(user, room):
+    """Непрочитанные в одной комнате (свои сообщения не считаются)"""
+    watermark = ChatReadState.objects.filter(user=user, room=room).values_list(
+        'last_read_message_id', flat=True
+    ).first() or 0
+    return room.messages.filter(id__gt=watermark).exclude(author=user).count()
+
+
+class ReadStateError(ValueError):
+    """message_id - не сообщение этой комнаты"""
+
+
+def _is_room_message(room, message_id):
+    """Сообщение комнаты - в таблице или в сегменте архива"""
+    return room.messages.filter(id=message_id).exists() or room.archive_segments.filter(
+        first_id__lte=message_id, last_id__gte=message_id
+    ).exists()
+
+
+def mark_read(user, room, message_id=None):
+    """
+    Сдвигает отметку до message_id (по умолчанию - до последнего сообщения комнаты).
+    Отметка только растёт: запоздавший запрос со старым id её не откатит.
+    Чужой или несуществующий id - ReadStateError: так отметка не уходит дальше
+    последнего сообщения комнаты, иначе новые сообщения сразу считались бы прочитанными.
+    Возвращает текущее значение отметки.
+    """
+    if message_id is None:
+        message_id = room.messages.order_by('-id').values_list('id', flat=True).first() or 0
+    elif not _is_room_message(room, message_id):
+        raise ReadStateError('Сообщение не найдено в этом чате')
+
+    state, created = ChatReadState.objects.get_or_create(
+        user=user, room=room, defaults={'last_read_message_id': message_id}
+    )
+    if not created and state.last_read_message_id < message_id:
+        # Условный UPDATE - параллельные отметки не перезаписывают большую меньшей
+        ChatReadState.objects.filter(
+            pk=state.pk, last_read_message_id__lt=message_id
+        ).update(last_read_message_id=message_id)
+        state.refresh_from_db(fields=['last_read_message_id'])
+    return state.last_read_message_id
+
+
+def unread_counts_by_board(user):
+    """
+    {board_id: непрочитанные} по всем доступным доскам пользователя - одним запросом.
+    Доски без непрочитанных в ответ не попадают.
+    """
+    rows = ChatMessage.objects.filter(readable_boards_q(user, 'room__board')).exclude(author=user).filter(
+        id__gt=_watermark(user, OuterRef('room_id'))
+    ).order_by().values('room__board_id').annotate(count=Count('id'))
+    return {row['room__board_id']: row['count'] for row in rows}
@@ -8,4 +8,6 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<board_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
     re_path(r'ws/private/$', consumers.PrivateChatConsumer.as_asgi()),
+    # Все потоки пользователя одним сокетом (подписки кадрами)
+    re_path(r'ws/stream/$', consumers.StreamConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,103 @@
+'''Полнотекстовый поиск по сообщениям чатов досок и личным сообщениям.
+Индексы создаёт миграция 0004_message_search: FTS5 в SQLite, GIN по tsvector в PostgreSQL.
+
+Запрос разбивается на слова, каждое ищется по префиксу (все слова должны встретиться).
+Для SQLite окончания русских слов срезаются лёгким стеммером ("задачами" -> "задач*"),
+в PostgreSQL слова нормализует словарь 'russian'.'''
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from boards.permissions import readable_boards_q
+from .models import ChatMessage, PrivateMessage, GENERAL_BOARD_ID
+
+MAX_TERMS = 8
+MIN_STEM = 3
+
+# Окончания от длинных к коротким: срезается первое подходящее
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ешь', 'ете', 'ите',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ой', 'ей', 'ий', 'ый', 'ом', 'ем', 'ам', 'ям',
+    'ах', 'ях', 'ов', 'ев', 'ую', 'юю', 'ть', 'ет', 'ит', 'ут', 'ют', 'ат', 'ят', 'им',
+    'ла', 'ло', 'ли', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Таблицы FTS5 (SQLite) для моделей
+FTS_TABLES = {
+    ChatMessage: 'chat_chatmessage_fts',
+    PrivateMessage: 'chat_privatemessage_fts',
+}
+
+
+class SearchError(ValueError):
+    """Пустой или слишком короткий запрос"""
+
+
+def fold(word):
+    return word.lower().replace('ё', 'е')
+
+
+def light_stem(word):
+    """Основа слова без окончания (если от слова остаётся хотя бы MIN_STEM букв)"""
+    word = fold(word)
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def search_terms(query):
+    terms = [fold(word) for word in WORD_RE.findall(query or '') if len(word) >= 2][:MAX_TERMS]
+    if not terms:
+        raise SearchError('Запрос должен содержать хотя бы одно слово от 2 символов')
+    return terms
+
+
+def text_search_filter(model, query):
+    """Q-условие "текст сообщения подходит под запрос" для текущей базы"""
+    terms = search_terms(query)
+    table = model._meta.db_table
+
+    if connection.vendor == 'sqlite':
+        match = ' AND '.join(f'"{light_stem(term)}"*' for term in terms)
+        fts = FTS_TABLES[model]
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]))
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM {table} WHERE to_tsvector('russian', text) @@ to_tsquery('russian', %s)",
+            [tsquery],
+        ))
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(text__icontains=term)
+    return condition
+
+
+def search_board_messages(user, query, board_id=None):
+    """Сообщения чатов досок, доступных пользователю, и общего чата (по желанию - одной доски)"""
+    messages = ChatMessage.objects.filter(
+        readable_boards_q(user, 'room__board') | Q(room__board_id=GENERAL_BOARD_ID),
+        text_search_filter(ChatMessage, query),
+    )
+    if board_id is not None:
+        messages = messages.filter(room__board_id=board_id)
+    return messages.select_related('author__profile', 'attachment', 'room')
+
+
+def search_private_messages(user, query, chat_id=None):
+    """Личные сообщения из диалогов пользователя"""
+    messages = PrivateMessage.objects.filter(
+        Q(chat__user1=user) | Q(chat__user2=user),
+        text_search_filter(PrivateMessage, query),
+    )
+    if chat_id is not None:
+        messages = messages.filter(chat_id=chat_id)
+    return messages.select_related('sender')
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Board, ChatRoom,ChatMessage,ChatFile
 from django.contrib.auth.models import User
+from .write_behind import create_chat_message
+from .payloads import message_payload, message_payloads
+from .read_state import unread_count
 
 
 # Для информации об авторе (можно импортировать из boards)
@@ -41,13 +44,24 @@ class ChatFileSerializer(serializers.ModelSerializer):
         return ""
 
 
+class ChatMessageListSerializer(serializers.ListSerializer):
+    """
+    Список сообщений: payload'ы берутся из кэша одним get_many.
+    Сообщения из архива (chat/archive.py) уже несут готовый payload.
+    """
+
+    def to_representation(self, data):
+        data = list(data)
+        payloads = iter(message_payloads([m for m in data if not hasattr(m, 'archived_payload')]))
+        return [getattr(m, 'archived_payload', None) or next(payloads) for m in data]
+
+
 # Основной сериализатор сообщений
 class ChatMessageSerializer(serializers.ModelSerializer):
-    author = ChatUserSerializer(read_only=True)
-    attachment = ChatFileSerializer(read_only=True)
-
-    created_display = serializers.SerializerMethodField()
-    is_own = serializers.SerializerMethodField()
+    """
+    Отдаёт канонический payload (chat/payloads.py) - тот же, что уходит по WebSocket.
+    is_own и подпись времени считает клиент.
+    """
 
     class Meta:
         model = ChatMessage
@@ -57,40 +71,19 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             'text',
             'attachment',
             'created',
-            'created_display',
-            'updated',
             'is_edited',
-            'is_own',
         ]
         read_only_fields = [
             'id',
             'author',
             'created',
-            'updated',
             'is_edited',
             'attachment',
         ]
+        list_serializer_class = ChatMessageListSerializer
 
-    def get_created_display(self, obj):
-        from django.utils.timesince import timesince
-        import datetime
-
-        now = datetime.datetime.now(datetime.timezone.utc)
-
-        if (now - obj.created).days == 0:
-            return obj.created.strftime('%H:%M')
-        elif (now - obj.created).days == 1:
-            return f"Вчера {obj.created.strftime('%H:%M')}"
-        elif (now - obj.created).days < 7:
-            return f"{obj.created.strftime('%A')} {obj.created.strftime('%H:%M')}"
-        else:
-            return obj.created.strftime('%d.%m.%Y %H:%M')
-
-    def get_is_own(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.author_id == request.user.id
-        return False
+    def to_representation(self, instance):
+        return message_payload(instance)
 
     def validate_text(self, value):
         if not value.strip():
@@ -109,7 +102,8 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Пользователь не авторизован")
 
         validated_data['author'] = request.user
-        return super().create(validated_data)
+        # id из общего счётчика, если включена отложенная запись чата
+        return create_chat_message(**validated_data)
 
 
 
@@ -135,12 +129,17 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         return None
     
     def get_unread_count(self, obj):
-        """Количество непрочитанных сообщений"""
+        """
+        Количество непрочитанных сообщений (по отметке ChatReadState).
+        Для списка комнат передайте в context unread_counts = unread_counts_by_board(user) -
+        тогда без запроса на каждую комнату.
+        """
+        counts = self.context.get('unread_counts')
+        if counts is not None:
+            return counts.get(obj.board_id, 0)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            # Здесь можно реализовать логику непрочитанных
-            # Например, через модель ChatMessageRead
-            return 0  # Заглушка
+            return unread_count(request.user, obj)
         return 0
 
 
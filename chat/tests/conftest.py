@@ -1,9 +1,27 @@
 import pytest
 from django.contrib.auth import get_user_model
 from chat.models import ChatRoom, ChatMessage, ChatFile, PrivateChat, PrivateMessage
+from django.core.cache import cache
+from chat.history_buffer import recent_history
+from chat.presence import room_events
+from chat.rate_limit import user_buckets
 
 User = get_user_model()
 
+
+@pytest.fixture(autouse=True)
+def clear_history_buffer():
+    """Буфер истории, кэш, пачки событий и лимиты не должны переживать тест: id переиспользуются."""
+    recent_history.clear()
+    room_events.clear()
+    user_buckets.clear()
+    cache.clear()
+    yield
+    recent_history.clear()
+    room_events.clear()
+    user_buckets.clear()
+    cache.clear()
+
 @pytest.fixture
 def user():
     """Создает тестового пользователя."""
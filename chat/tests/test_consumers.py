@@ -0,0 +1,49 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from boards.models import Board, BoardPermit
+from boards.consumers import ACCESS_REVOKED_CLOSE_CODE
+from chat.routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestChatConsumerAccess:
+
+    def test_revocation_closes_socket(self, user, user2):
+        board = Board.objects.create(title='Доска', owner=user)
+        permit = BoardPermit.objects.create(board=board, user=user2, role='member')
+
+        async def run():
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+            communicator.scope['user'] = user2
+            connected, _ = await communicator.connect()
+            assert connected
+            history = await communicator.receive_json_from()
+            assert history['type'] == 'history'
+
+            await database_sync_to_async(permit.delete)()
+            return await communicator.receive_output()
+
+        assert async_to_sync(run)() == {'type': 'websocket.close', 'code': ACCESS_REVOKED_CLOSE_CODE}
+
+    def test_role_downgrade_keeps_socket_open(self, user, user2):
+        board = Board.objects.create(title='Доска', owner=user)
+        permit = BoardPermit.objects.create(board=board, user=user2, role='member')
+
+        async def run():
+            communicator = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+            communicator.scope['user'] = user2
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            permit.role = 'viewer'
+            await database_sync_to_async(permit.save)()
+            closed = not await communicator.receive_nothing(timeout=0.2)
+            await communicator.disconnect()
+            return closed
+
+        assert async_to_sync(run)() is False
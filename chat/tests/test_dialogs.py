@@ -0,0 +1,175 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from chat.models import PrivateChat, PrivateMessage
+from chat.routing import websocket_urlpatterns
+
+
+def api(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.mark.django_db
+class TestDialogCounters:
+
+    def test_message_updates_last_message_and_recipient_counter(self, user, user2):
+        chat = PrivateChat.objects.create(user1=user, user2=user2)
+        PrivateMessage.objects.create(chat=chat, sender=user, text='привет')
+        last = PrivateMessage.objects.create(chat=chat, sender=user, text='как дела')
+        PrivateMessage.objects.create(chat=chat, sender=user2, text='норм')
+
+        chat.refresh_from_db()
+        assert chat.last_message.text == 'норм'
+        assert chat.unread_count(user2) == 2
+        assert chat.unread_count(user) == 1
+
+        chat.mark_read(user2)
+        chat.refresh_from_db()
+        assert chat.unread_count(user2) == 0
+        assert chat.unread_count(user) == 1
+        assert PrivateMessage.objects.get(pk=last.pk).is_read is True
+
+    def test_dialog_messages_view_resets_counter(self, user, user2):
+        chat = PrivateChat.objects.create(user1=user, user2=user2)
+        PrivateMessage.objects.create(chat=chat, sender=user, text='привет')
+
+        response = api(user2).get(reverse('dialog-messages', kwargs={'chat_id': chat.id}))
+        assert response.status_code == 200
+        chat.refresh_from_db()
+        assert chat.unread_user2 == 0
+
+
+@pytest.mark.django_db
+class TestMyDialogs:
+
+    def test_single_query_newest_first(self, user, user2, user3, django_assert_num_queries):
+        old = PrivateChat.objects.create(user1=user, user2=user2)
+        fresh = PrivateChat.objects.create(user1=user3, user2=user)
+        empty = PrivateChat.objects.create(user1=user, user2=User.objects.create_user(username='testuser4'))
+        PrivateChat.objects.create(user1=user2, user2=user3)  # чужой диалог
+        PrivateMessage.objects.create(chat=old, sender=user2, text='раз')
+        PrivateMessage.objects.create(chat=fresh, sender=user3, text='два' * 30)
+
+        client = api(user)
+        with django_assert_num_queries(1):
+            response = client.get(reverse('my-dialogs'))
+
+        assert [d['id'] for d in response.data] == [fresh.id, old.id, empty.id]
+        assert response.data[0]['other_user']['username'] == user3.username
+        assert response.data[0]['last_message'] == ('два' * 30)[:50]
+        assert response.data[0]['unread_count'] == 1
+        assert response.data[2]['last_message_time'] is None
+        assert 'X-Has-More' not in response
+
+    def test_unpaged_without_cursor_params(self, user):
+        # Больше страницы по умолчанию (50) - без параметров приходят все диалоги
+        others = User.objects.bulk_create(User(username=f'u{i}') for i in range(55))
+        for other in others:
+            PrivateChat.objects.create(user1=user, user2=other)
+
+        response = api(user).get(reverse('my-dialogs'))
+        assert len(response.data) == 55
+
+    def test_cursor(self, user, user2, user3):
+        first = PrivateChat.objects.create(user1=user, user2=user2)
+        second = PrivateChat.objects.create(user1=user, user2=user3)
+        PrivateMessage.objects.create(chat=first, sender=user2, text='новое')
+
+        client = api(user)
+        response = client.get(reverse('my-dialogs'), {'limit': 1})
+        assert [d['id'] for d in response.data] == [first.id]
+        assert response['X-Has-More'] == 'true'
+
+        response = client.get(reverse('my-dialogs'), {'limit': 1, 'before_id': response['X-Before-Id']})
+        assert [d['id'] for d in response.data] == [second.id]
+        assert response['X-Has-More'] == 'false'
+
+
+@pytest.mark.django_db
+def test_create_dialog_returns_existing_chat(user, user2):
+    chat = PrivateChat.objects.create(user1=user, user2=user2)
+    response = api(user2).post(reverse('create-dialog'), {'user_id': user.id})
+    assert response.data == {'chat_id': chat.id}
+    assert PrivateChat.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_consumer_resolves_chat_once_per_recipient(user, user2):
+    async def run():
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/private/')
+        communicator.scope['user'] = user2
+        await communicator.connect()
+        for text in ('раз', 'два'):
+            await communicator.send_json_to({'type': 'private_message', 'recipient_id': str(user.id), 'text': text})
+            await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'private_message', 'recipient_id': 'кому', 'text': 'три'})
+        error = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return error
+
+    with CaptureQueriesContext(connection) as queries:
+        error = async_to_sync(run)()
+
+    assert error['type'] == 'error'
+    chat = PrivateChat.objects.get()
+    assert (chat.user1, chat.user2) == (user, user2)
+    assert chat.messages.count() == 2
+    assert sum('FROM "chat_privatechat"' in q['sql'] for q in queries.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_delivery_seq_per_recipient(user, user2, user3):
+    first = PrivateChat.objects.create(user1=user, user2=user2)
+    second = PrivateChat.objects.create(user1=user3, user2=user2)
+    messages = [
+        PrivateMessage.objects.create(chat=first, sender=user, text='1'),
+        PrivateMessage.objects.create(chat=second, sender=user3, text='2'),
+        PrivateMessage.objects.create(chat=first, sender=user2, text='3'),
+        PrivateMessage.objects.create(chat=first, sender=user, text='4'),
+    ]
+    assert [(m.recipient_id, m.seq) for m in messages] == [(user2.id, 1), (user2.id, 2), (user.id, 1), (user2.id, 3)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_resume_replays_missed_messages(user, user2, settings):
+    settings.CHAT_RESUME_LIMIT = 2
+    chat = PrivateChat.objects.create(user1=user, user2=user2)
+    for text in ('раз', 'два', 'три', 'четыре'):
+        PrivateMessage.objects.create(chat=chat, sender=user, text=text)
+
+    async def connect(query):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/private/?{query}')
+        communicator.scope['user'] = user2
+        await communicator.connect()
+        return communicator
+
+    async def run():
+        communicator = await connect('resume_from=1')
+        resume = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        communicator = await connect('resume_from=3')
+        tail = await communicator.receive_json_from()
+        # Живое событие с уже досланным номером не дублируется, новое проходит
+        for seq in (4, 5):
+            await communicator.send_input({'type': 'private_chat_message', 'message': {'seq': seq, 'text': str(seq)}})
+        live = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return resume, tail, live
+
+    resume, tail, live = async_to_sync(run)()
+
+    assert resume['type'] == 'resume'
+    assert [(m['seq'], m['text']) for m in resume['messages']] == [(2, 'два'), (3, 'три')]
+    assert resume['has_more'] is True
+    assert [m['text'] for m in tail['messages']] == ['четыре']
+    assert tail['has_more'] is False
+    assert live == {'type': 'new_message', 'message': {'seq': 5, 'text': '5'}}
@@ -0,0 +1,74 @@
+import pytest
+from boards.models import Board
+from chat.models import ChatRoom, ChatMessage
+from chat.history_buffer import RecentHistory, load_history_frame, recent_history
+
+
+def item(message_id):
+    return {'id': message_id, 'text': str(message_id)}
+
+
+def ids(frame):
+    return [m['id'] for m in frame['messages']]
+
+
+class TestRecentHistory:
+
+    def test_keeps_last_n_in_order(self):
+        history = RecentHistory(size=3, max_rooms=10)
+        history.fill(1, [item(i) for i in range(1, 5)])
+        history.append(1, item(6))
+        history.append(1, item(5))  # не по порядку
+        history.append(1, item(6))  # повтор
+        assert ids(history.frame(1)) == [4, 5, 6]
+
+    def test_append_ignored_until_filled(self):
+        history = RecentHistory(size=3, max_rooms=10)
+        history.append(1, item(1))
+        assert history.frame(1) is None
+
+    def test_lru_eviction(self):
+        history = RecentHistory(size=3, max_rooms=2)
+        history.fill(1, [])
+        history.fill(2, [])
+        history.frame(1)  # 1 свежее, вытесняется 2
+        history.fill(3, [])
+        assert history.frame(1) is not None
+        assert history.frame(2) is None
+        assert history.frame(3) is not None
+
+    def test_ttl(self):
+        history = RecentHistory(size=3, max_rooms=2, ttl=-1)
+        history.fill(1, [item(1)])
+        assert history.frame(1) is None
+
+
+@pytest.mark.django_db
+class TestLoadHistoryFrame:
+
+    def test_second_connect_without_queries(self, user, django_assert_num_queries):
+        board = Board.objects.create(title='Доска', owner=user)
+        room = ChatRoom.objects.create(board=board)
+        first = ChatMessage.objects.create(room=room, author=user, text='1')
+
+        assert ids(load_history_frame(board.id)) == [first.id]
+
+        second = ChatMessage.objects.create(room=room, author=user, text='2')
+        with django_assert_num_queries(0):
+            frame = load_history_frame(board.id)
+        assert ids(frame) == [first.id, second.id]
+        assert frame['type'] == 'history'
+
+    def test_edit_and_delete_reach_buffer(self, user):
+        board = Board.objects.create(title='Доска', owner=user)
+        room = ChatRoom.objects.create(board=board)
+        first, second = (ChatMessage.objects.create(room=room, author=user, text=text) for text in ('1', '2'))
+        load_history_frame(board.id)
+
+        first.text = 'исправлено'
+        first.save()
+        assert [m['text'] for m in recent_history.frame(board.id)['messages']] == ['исправлено', '2']
+
+        ChatMessage.objects.filter(id=second.id).delete()
+        assert recent_history.frame(board.id) is None
+        assert ids(load_history_frame(board.id)) == [first.id]
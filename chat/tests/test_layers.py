@@ -0,0 +1,40 @@
+import pytest
+from asgiref.sync import async_to_sync
+from boards.models import Board
+from chat.layers import BoardShardedRedisChannelLayer, board_shard
+from chat.loadtest import run_clients, summarize
+
+
+class TestBoardSharding:
+
+    def test_board_groups_share_a_shard(self):
+        assert board_shard('chat_board_7', 3) == 1
+        assert board_shard('board_7', 3) == 1
+        assert board_shard('board_access_7_12', 3) == 1
+        assert board_shard('private_user_7', 3) is None
+
+    def test_layer_routes_groups_by_board(self):
+        layer = BoardShardedRedisChannelLayer(hosts=[f'redis://127.0.0.1:{port}/0' for port in (1, 2, 3, 4)])
+        assert {layer.consistent_hash(name) for name in ('chat_board_6', 'board_6', 'board_access_6_1')} == {2}
+        # Остальное - обычный хэш channels_redis
+        assert 0 <= layer.consistent_hash('private_user_6') < 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_loadtest_clients_in_one_process(user, user2, settings):
+    """Логика воркера на InMemory layer: все сообщения доходят до всех подписчиков"""
+    settings.CHAT_RATE_CONNECTION = settings.CHAT_RATE_USER = (1000, 1000)
+    board = Board.objects.create(title='Доска', owner=user)
+    board.members.add(user2)
+    config = {
+        'user_ids': [user.id, user2.id], 'board_ids': [board.id], 'workers': 1, 'clients': 3,
+        'messages': 2, 'rate': 50, 'drain': 0.5, 'private': True,
+    }
+
+    result = async_to_sync(run_clients)(0, config)
+    report = summarize([result], config)
+
+    assert report['chat']['sent'] == 6
+    assert report['chat']['delivered'] == report['chat']['expected'] == 18
+    assert report['private']['delivered'] == report['private']['expected'] == 4
+    assert report['chat']['p95_ms'] is not None
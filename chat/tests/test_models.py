@@ -32,4 +32,18 @@ class TestPrivateChatModel:
     
    
         
-       
\ No newline at end of file
+       
+
+    def test_participants_stored_in_id_order(self, user, user2):
+        chat = PrivateChat.objects.create(user1=user2, user2=user)
+        chat.refresh_from_db()
+        assert (chat.user1, chat.user2) == (user, user2)
+
+        with pytest.raises(IntegrityError):
+            PrivateChat.objects.create(user1=user, user2=user2)
+
+    def test_get_or_create_between(self, user, user2):
+        chat, created = PrivateChat.get_or_create_between(user2, user)
+        assert created
+        assert PrivateChat.get_or_create_between(user, user2.id) == (chat, False)
+        assert PrivateChat.objects.count() == 1
@@ -0,0 +1,83 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from boards.models import Board
+from chat.models import ChatRoom, ChatMessage, PrivateChat, PrivateMessage
+
+
+@pytest.fixture
+def client_for(db):
+    def make(user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+    return make
+
+
+@pytest.mark.django_db
+class TestChatHistoryCursor:
+
+    @pytest.fixture
+    def room(self, user):
+        board = Board.objects.create(title='Доска', owner=user)
+        room = ChatRoom.objects.create(board=board)
+        for i in range(7):
+            ChatMessage.objects.create(room=room, author=user, text=f'сообщение {i}')
+        return room
+
+    def url(self, room, **params):
+        query = '&'.join(f'{k}={v}' for k, v in params.items())
+        return reverse('chat-api-history', kwargs={'board_id': room.board_id}) + (f'?{query}' if query else '')
+
+    def ids(self, room):
+        return list(ChatMessage.objects.filter(room=room).order_by('-created', '-id').values_list('id', flat=True))
+
+    def test_pages_backwards_without_gaps(self, client_for, user, room):
+        client = client_for(user)
+        seen, before_id = [], None
+        while True:
+            params = {'limit': 3}
+            if before_id:
+                params['before_id'] = before_id
+            data = client.get(self.url(room, **params)).json()
+            seen += [m['id'] for m in data['messages']]
+            before_id = data['before_id']
+            if not data['has_more']:
+                break
+        assert seen == self.ids(room)
+        assert 'total' not in data
+
+    def test_new_messages_do_not_shift_page(self, client_for, user, room):
+        client = client_for(user)
+        first = client.get(self.url(room, limit=3)).json()
+        ChatMessage.objects.create(room=room, author=user, text='новое')
+        second = client.get(self.url(room, limit=3, before_id=first['before_id'])).json()
+        assert [m['id'] for m in second['messages']] == self.ids(room)[4:7]
+
+    def test_after_id_and_total(self, client_for, user, room):
+        ids = self.ids(room)
+        data = client_for(user).get(self.url(room, limit=2, after_id=ids[4], total=1)).json()
+        assert [m['id'] for m in data['messages']] == [ids[2], ids[3]]
+        assert data['has_more'] is True
+        assert data['total'] == 7
+
+    def test_bad_cursor(self, client_for, user, room):
+        assert client_for(user).get(self.url(room, before_id='abc')).status_code == 400
+        assert client_for(user).get(self.url(room, before_id=999999)).status_code == 400
+
+
+@pytest.mark.django_db
+class TestDialogMessagesCursor:
+
+    def test_list_body_with_cursor_headers(self, client_for, user, user2):
+        chat = PrivateChat.objects.create(user1=user, user2=user2)
+        messages = [PrivateMessage.objects.create(chat=chat, sender=user2, text=str(i)) for i in range(5)]
+        url = reverse('dialog-messages', kwargs={'chat_id': chat.id})
+
+        response = client_for(user).get(url + '?limit=2')
+        assert [m['id'] for m in response.json()] == [messages[3].id, messages[4].id]
+        assert response['X-Has-More'] == 'true'
+        assert response['X-Before-Id'] == str(messages[3].id)
+
+        response = client_for(user).get(url + f'?limit=2&before_id={messages[3].id}')
+        assert [m['id'] for m in response.json()] == [messages[1].id, messages[2].id]
@@ -0,0 +1,97 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.urls import reverse
+from rest_framework.test import APIClient
+from boards.models import Board
+from chat.models import ChatRoom, ChatMessage
+from chat.payloads import message_payload, message_payloads
+from chat.routing import websocket_urlpatterns
+
+
+@pytest.fixture
+def room(user):
+    board = Board.objects.create(title='Доска', owner=user)
+    return ChatRoom.objects.create(board=board)
+
+
+@pytest.mark.django_db
+class TestMessagePayload:
+
+    def test_compact_fields(self, room, user):
+        message = ChatMessage.objects.create(room=room, author=user, text='Привет')
+        payload = message_payload(message)
+
+        assert payload == {
+            'id': message.id,
+            'text': 'Привет',
+            'attachment': None,
+            'created': message.created.isoformat(),
+            'is_edited': False,
+            'author': {
+                'id': user.id,
+                'username': user.username,
+                'avatar': '/media/avatars/default/user.png',
+            },
+        }
+        # Клиентские поля на сервере не считаются
+        assert 'is_own' not in payload and 'created_display' not in payload
+
+    def test_cached_after_first_build(self, room, user, django_assert_num_queries):
+        ChatMessage.objects.create(room=room, author=user, text='раз')
+        ChatMessage.objects.create(room=room, author=user, text='два')
+        messages = list(ChatMessage.objects.filter(room=room))
+        first = message_payloads(messages)
+
+        # Повторная сборка - только из кэша, без обращений к author/profile
+        fresh = list(ChatMessage.objects.filter(room=room))
+        with django_assert_num_queries(0):
+            assert message_payloads(fresh) == first
+
+    def test_edit_invalidates(self, room, user):
+        message = ChatMessage.objects.create(room=room, author=user, text='старый')
+        message_payload(message)
+
+        message.text = 'новый'
+        message.save()
+        payload = message_payload(ChatMessage.objects.get(pk=message.pk))
+        assert payload['text'] == 'новый'
+        assert payload['is_edited'] is True
+
+    def test_rename_invalidates_author(self, room, user):
+        message = ChatMessage.objects.create(room=room, author=user, text='текст')
+        message_payload(message)
+
+        user.username = 'renamed'
+        user.save()
+        message = ChatMessage.objects.select_related('author__profile').get(pk=message.pk)
+        assert message_payload(message)['author']['username'] == 'renamed'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_websocket_and_rest_share_payload(user):
+    board = Board.objects.create(title='Доска', owner=user)
+
+    async def run():
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{board.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        assert connected
+        await communicator.receive_json_from()  # history
+
+        await communicator.send_to(text_data=json.dumps({'type': 'message', 'text': 'через сокет'}))
+        event = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return event
+
+    event = async_to_sync(run)()
+    assert event.pop('type') == 'chat_message'
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    response = client.get(reverse('chat-api-history', kwargs={'board_id': board.id}))
+    assert response.status_code == 200
+    assert response.data['messages'] == [event]
@@ -0,0 +1,170 @@
+import threading
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from boards.models import Board
+from chat.presence import BoardPresence, _RedisPresenceStore, room_events, typing_allowed
+from chat.routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+@pytest.mark.django_db
+class TestBoardPresence:
+
+    def test_tabs_of_one_user_count_once(self, user, user2):
+        presence = BoardPresence(ttl=60)
+        assert presence.join(1, 'a', user) is True
+        assert presence.join(1, 'b', user) is False
+        presence.join(1, 'c', user2)
+        assert [u['username'] for u in presence.users(1)] == ['testuser', 'testuser2']
+
+        assert presence.leave(1, 'a', user.id) is False
+        assert presence.leave(1, 'b', user.id) is True
+        assert presence.users(1) == [{'id': user2.id, 'username': user2.username}]
+
+    def test_stale_entries_dropped(self, user, monkeypatch):
+        presence = BoardPresence(ttl=60)
+        presence.join(1, 'a', user)
+        monkeypatch.setattr('chat.presence.time.time', lambda: 10 ** 12)
+        assert presence.users(1) == []
+
+
+class FakeRedis:
+    """Хэш-команды Redis, которыми пользуется _RedisPresenceStore"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hexists(self, key, field):
+        return field.encode() in self.hashes.get(key, {})
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field.encode(), None)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Копит команды и выполняет их разом, как redis-py pipeline"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((getattr(self.redis, name), args))
+
+    def execute(self):
+        return [command(*args) for command, args in self.commands]
+
+
+@pytest.mark.django_db
+def test_redis_store_processes_do_not_overwrite_each_other(user, user2, monkeypatch):
+    """Два процесса с общим Redis: у каждого сокета своё поле хэша, а не общий словарь"""
+    monkeypatch.setattr('chat.presence.cache.make_and_validate_key', lambda key: key)
+    redis = FakeRedis()
+    first = BoardPresence(ttl=60, store=_RedisPresenceStore(60, client=redis))
+    second = BoardPresence(ttl=60, store=_RedisPresenceStore(60, client=redis))
+
+    assert first.join(1, 'a', user) is True
+    assert second.join(1, 'b', user2) is True
+    assert second.join(1, 'c', user) is False
+    first.touch(1, 'a', user)
+    assert [u['id'] for u in second.users(1)] == [user.id, user2.id]
+
+    assert first.leave(1, 'a', user.id) is False
+    assert second.leave(1, 'b', user2.id) is True
+    assert first.users(1) == [{'id': user.id, 'username': user.username}]
+    # touch не воскрешает ушедший сокет
+    first.touch(1, 'a', user)
+    assert set(redis.hgetall('chat-presence:1')) == {b'c'}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_consumer_keeps_presence_store_off_event_loop(user, monkeypatch):
+    """Хранилище присутствия (redis-py, блокирующее) вызывается не из потока цикла событий"""
+    board = Board.objects.create(title='Доска', owner=user)
+    monkeypatch.setattr('chat.presence.cache.make_and_validate_key', lambda key: key)
+    threads = []
+
+    class RecordingRedis(FakeRedis):
+        def hgetall(self, key):
+            threads.append(threading.get_ident())
+            return super().hgetall(key)
+
+    presence = BoardPresence(ttl=60, store=_RedisPresenceStore(60, client=RecordingRedis()))
+    monkeypatch.setattr('chat.consumers.board_presence', presence)
+
+    async def run():
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+        communicator.scope['user'] = user
+        await communicator.connect()
+        history = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return threading.get_ident(), history
+
+    loop_thread, history = async_to_sync(run)()
+    assert history['online'] == [{'id': user.id, 'username': user.username}]
+    assert len(threads) == 3  # join, снимок в истории, leave
+    assert loop_thread not in threads
+
+
+def test_typing_throttle(settings):
+    settings.CHAT_TYPING_THROTTLE = 2000
+    assert typing_allowed(None, now=5)
+    assert not typing_allowed(4, now=5)
+    assert typing_allowed(3, now=5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_presence_and_coalesced_typing(user, user2, monkeypatch):
+    board = Board.objects.create(title='Доска', owner=user)
+    board.members.add(user2)
+    monkeypatch.setattr(room_events, 'interval', 0.05)
+
+    async def connect(who):
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+        communicator.scope['user'] = who
+        connected, _ = await communicator.connect()
+        assert connected
+        return communicator, await communicator.receive_json_from()
+
+    async def run():
+        first, history = await connect(user)
+        assert history['online'] == [{'id': user.id, 'username': user.username}]
+        # Свой вход уходит пачкой, но себе не показывается
+        assert await first.receive_nothing(timeout=0.1)
+
+        second, history = await connect(user2)
+        assert [u['id'] for u in history['online']] == [user.id, user2.id]
+        assert await first.receive_json_from() == {
+            'type': 'presence', 'joined': [{'id': user2.id, 'username': user2.username}], 'left': []
+        }
+
+        # Пять нажатий подряд - одна рассылка; себе "печатает" не приходит
+        for _ in range(5):
+            await second.send_json_to({'type': 'typing'})
+        typing = await first.receive_json_from()
+        assert typing == {'type': 'typing', 'users': [{'id': user2.id, 'username': user2.username}]}
+        assert await first.receive_nothing(timeout=0.2)
+        assert await second.receive_nothing(timeout=0.1)
+
+        await second.disconnect()
+        left = await first.receive_json_from()
+        await first.disconnect()
+        return left
+
+    assert async_to_sync(run)() == {'type': 'presence', 'joined': [], 'left': [user2.id]}
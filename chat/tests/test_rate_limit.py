@@ -0,0 +1,153 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.urls import reverse
+from rest_framework.test import APIClient
+from boards.models import Board
+from chat.models import ChatMessage
+from chat.rate_limit import TokenBucket, RATE_LIMITED_CLOSE_CODE, throttle_stats
+from chat.routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+class TestTokenBucket:
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        now = bucket.updated
+        assert [bucket.take(now) for _ in range(4)] == [True, True, True, False]
+        assert bucket.retry_after() == 0.5
+        assert bucket.take(now + 0.5) is True
+        assert bucket.take(now + 0.5) is False
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConsumerLimits:
+
+    @pytest.fixture
+    def board(self, user):
+        return Board.objects.create(title='Доска', owner=user)
+
+    async def connect(self, board, user):
+        communicator = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        assert connected
+        await communicator.receive_json_from()  # история
+        return communicator
+
+    def test_over_limit_gets_error_frame(self, board, user, settings):
+        settings.CHAT_RATE_CONNECTION = (0.01, 2)
+
+        async def run():
+            communicator = await self.connect(board, user)
+            frames = []
+            for i in range(3):
+                await communicator.send_json_to({'type': 'message', 'text': f'{i}'})
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        frames = async_to_sync(run)()
+        assert [f['type'] for f in frames] == ['chat_message', 'chat_message', 'error']
+        assert frames[2]['code'] == 'rate_limited' and frames[2]['retry_after'] > 0
+        assert ChatMessage.objects.count() == 2
+        assert throttle_stats()['limited_connection'] == 1
+
+    def test_user_limit_spans_sockets(self, board, user, settings):
+        settings.CHAT_RATE_USER = (0.01, 1)
+
+        async def run():
+            first = await self.connect(board, user)
+            second = await self.connect(board, user)
+            await first.send_json_to({'type': 'message', 'text': 'раз'})
+            await first.receive_json_from()
+            await second.receive_json_from()
+            await second.send_json_to({'type': 'message', 'text': 'два'})
+            error = await second.receive_json_from()
+            await first.disconnect()
+            await second.disconnect()
+            return error
+
+        assert async_to_sync(run)()['code'] == 'rate_limited'
+        assert throttle_stats()['limited_user'] == 1
+
+    def test_persistent_flood_closes_socket(self, board, user, settings):
+        settings.CHAT_RATE_CONNECTION = (0.01, 1)
+        settings.CHAT_RATE_MAX_REJECTED = 3
+
+        async def run():
+            communicator = await self.connect(board, user)
+            await communicator.send_json_to({'type': 'message', 'text': 'ok'})
+            await communicator.receive_json_from()
+            for _ in range(3):
+                await communicator.send_to(text_data=json.dumps({'type': 'message', 'text': 'спам'}))
+            outputs = [await communicator.receive_output() for _ in range(3)]
+            return outputs
+
+        outputs = async_to_sync(run)()
+        assert outputs[-1] == {'type': 'websocket.close', 'code': RATE_LIMITED_CLOSE_CODE}
+        assert throttle_stats()['closed_backlog'] == 1
+
+    def test_bad_json_gets_error_frame(self, board, user):
+        async def run():
+            communicator = await self.connect(board, user)
+            await communicator.send_to(text_data='{не json')
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return frame
+
+        assert async_to_sync(run)()['code'] == 'bad_request'
+
+
+@pytest.mark.django_db
+def test_stats_endpoint_staff_only(user, user2):
+    user.is_staff = True
+    user.save()
+    client = APIClient()
+
+    client.force_authenticate(user=user2)
+    assert client.get(reverse('chat-api-throttle-stats')).status_code == 403
+
+    client.force_authenticate(user=user)
+    response = client.get(reverse('chat-api-throttle-stats'))
+    assert response.status_code == 200
+    assert response.data == {'limited_connection': 0, 'limited_user': 0, 'closed_backlog': 0}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('path', ['chat', '/ws/private/', '/ws/stream/'])
+def test_non_object_frames_get_bad_request(user, path):
+    board = Board.objects.create(title='Доска', owner=user)
+
+    async def run():
+        url = f'/ws/chat/{board.id}/' if path == 'chat' else path
+        communicator = WebsocketCommunicator(application, url)
+        communicator.scope['user'] = user
+        await communicator.connect()
+        if path == 'chat':
+            await communicator.receive_json_from()  # история
+        frames = ['[]', '1', '"x"', 'null', json.dumps({'type': 'message', 'text': ['список']}),
+                  json.dumps({'type': 'private_message', 'recipient_id': user.id, 'text': 5})]
+        codes = []
+        for frame in frames:
+            await communicator.send_to(text_data=frame)
+            if await communicator.receive_nothing(timeout=0.1):
+                codes.append(None)
+            else:
+                codes.append((await communicator.receive_json_from())['code'])
+        # Сокет жив после всех кадров
+        still_open = await communicator.receive_nothing(timeout=0.1)
+        await communicator.disconnect()
+        return codes, still_open
+
+    codes, still_open = async_to_sync(run)()
+    # Нечисловой text - bad_request там, где кадр такого типа принимается
+    expected = {'chat': ['bad_request', None], '/ws/private/': [None, 'bad_request'],
+                '/ws/stream/': ['bad_request', 'bad_request']}[path]
+    assert codes == ['bad_request'] * 4 + expected
+    assert still_open
+    assert ChatMessage.objects.count() == 0
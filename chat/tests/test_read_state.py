@@ -0,0 +1,108 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from boards.models import Board, BoardPermit
+from chat.models import ChatRoom, ChatMessage, ChatReadState
+from chat.read_state import mark_read, unread_count, unread_counts_by_board, ReadStateError
+from chat.serializers import ChatRoomSerializer
+
+
+@pytest.fixture
+def room(user, user2):
+    board = Board.objects.create(title='Доска', owner=user)
+    board.members.add(user2)
+    return ChatRoom.objects.create(board=board)
+
+
+def post(room, author, count):
+    return [ChatMessage.objects.create(room=room, author=author, text=f'{i}') for i in range(count)]
+
+
+@pytest.mark.django_db
+class TestReadState:
+
+    def test_unread_excludes_own_and_read(self, room, user, user2):
+        messages = post(room, user, 3)
+        post(room, user2, 1)
+        assert unread_count(user2, room) == 3
+        assert unread_count(user, room) == 1
+
+        mark_read(user2, room, messages[1].id)
+        assert unread_count(user2, room) == 1
+
+    def test_mark_read_defaults_to_last_and_never_goes_back(self, room, user, user2):
+        messages = post(room, user, 3)
+        assert mark_read(user2, room) == messages[-1].id
+        assert mark_read(user2, room, messages[0].id) == messages[-1].id
+        assert ChatReadState.objects.filter(user=user2, room=room).count() == 1
+        assert unread_count(user2, room) == 0
+
+    def test_mark_read_rejects_foreign_and_future_ids(self, room, user, user2, user3):
+        messages = post(room, user, 2)
+        foreign = post(ChatRoom.objects.create(board=Board.objects.create(title='Чужая', owner=user3)), user3, 1)
+        for message_id in (foreign[0].id, messages[-1].id + 1000):
+            with pytest.raises(ReadStateError):
+                mark_read(user2, room, message_id)
+        assert not ChatReadState.objects.filter(user=user2).exists()
+        assert unread_count(user2, room) == 2
+
+    def test_counts_by_board_one_query(self, room, user, user2, user3, django_assert_num_queries):
+        other = Board.objects.create(title='Другая', owner=user3)
+        BoardPermit.objects.create(board=other, user=user2, role='viewer')
+        other_room = ChatRoom.objects.create(board=other)
+        foreign = ChatRoom.objects.create(board=Board.objects.create(title='Чужая', owner=user3))
+
+        post(room, user, 2)
+        read = post(other_room, user3, 4)
+        post(foreign, user3, 5)
+        mark_read(user2, other_room, read[0].id)
+
+        with django_assert_num_queries(1):
+            counts = unread_counts_by_board(user2)
+        assert counts == {room.board_id: 2, other.id: 3}
+
+    def test_room_serializer_uses_counts_from_context(self, room, user, user2, django_assert_num_queries):
+        post(room, user, 2)
+        counts = unread_counts_by_board(user2)
+        serializer = ChatRoomSerializer(room, context={'unread_counts': counts})
+        with django_assert_num_queries(0):
+            assert serializer.get_unread_count(room) == 2
+
+
+@pytest.mark.django_db
+class TestReadStateAPI:
+
+    def test_mark_read_and_unread_endpoint(self, room, user, user2):
+        messages = post(room, user, 3)
+        client = APIClient()
+        client.force_authenticate(user=user2)
+
+        response = client.get(reverse('chat-api-unread'))
+        assert response.data == {'boards': {str(room.board_id): 3}, 'total': 3}
+
+        response = client.post(
+            reverse('chat-api-mark-read', kwargs={'board_id': room.board_id}),
+            {'message_id': messages[1].id}, format='json'
+        )
+        assert response.status_code == 200
+        assert response.data['last_read_message_id'] == messages[1].id
+        assert response.data['unread_count'] == 1
+
+        response = client.post(
+            reverse('chat-api-mark-read', kwargs={'board_id': room.board_id}),
+            {'message_id': 'abc'}, format='json'
+        )
+        assert response.status_code == 400
+
+        response = client.post(
+            reverse('chat-api-mark-read', kwargs={'board_id': room.board_id}),
+            {'message_id': messages[-1].id + 1000}, format='json'
+        )
+        assert response.status_code == 400
+        assert ChatReadState.objects.get(user=user2, room=room).last_read_message_id == messages[1].id
+
+    def test_mark_read_forbidden_without_access(self, room, user3):
+        client = APIClient()
+        client.force_authenticate(user=user3)
+        response = client.post(reverse('chat-api-mark-read', kwargs={'board_id': room.board_id}), {}, format='json')
+        assert response.status_code == 403
@@ -0,0 +1,102 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from boards.models import Board
+from chat.models import ChatRoom, ChatMessage, PrivateChat, PrivateMessage, GENERAL_BOARD_ID
+from chat.search import light_stem, search_board_messages, search_private_messages, search_terms, SearchError
+
+
+@pytest.fixture
+def room(user, user2):
+    board = Board.objects.create(title='Доска', owner=user)
+    board.members.add(user2)
+    return ChatRoom.objects.create(board=board)
+
+
+def texts(messages):
+    return sorted(m.text for m in messages)
+
+
+class TestTerms:
+
+    def test_light_stem(self):
+        assert light_stem('Задачами') == 'задач'
+        assert light_stem('зелёная') == 'зелен'
+        assert light_stem('дом') == 'дом'  # короткие слова не режем
+
+    def test_empty_query(self):
+        with pytest.raises(SearchError):
+            search_terms('  ? в  ')
+
+
+@pytest.mark.django_db
+class TestBoardSearch:
+
+    def test_russian_word_forms(self, room, user):
+        ChatMessage.objects.create(room=room, author=user, text='Обсудим задачи на завтра')
+        ChatMessage.objects.create(room=room, author=user, text='Ёлка уже стоит')
+        ChatMessage.objects.create(room=room, author=user, text='Ничего интересного')
+
+        assert texts(search_board_messages(user, 'задачами')) == ['Обсудим задачи на завтра']
+        assert texts(search_board_messages(user, 'елку')) == ['Ёлка уже стоит']
+        assert texts(search_board_messages(user, 'задача завтра')) == ['Обсудим задачи на завтра']
+        assert texts(search_board_messages(user, 'задача вчера')) == []
+
+    def test_index_follows_edit_and_delete(self, room, user):
+        message = ChatMessage.objects.create(room=room, author=user, text='первый вариант')
+        message.text = 'исправленный текст'
+        message.save()
+        assert texts(search_board_messages(user, 'вариант')) == []
+        assert texts(search_board_messages(user, 'исправленный')) == ['исправленный текст']
+
+        message.delete()
+        assert texts(search_board_messages(user, 'исправленный')) == []
+
+    def test_only_accessible_boards(self, room, user, user3):
+        ChatMessage.objects.create(room=room, author=user, text='секретный план')
+        assert texts(search_board_messages(user3, 'план')) == []
+
+    def test_general_chat_visible_to_everyone(self, room, user, user3):
+        Board.objects.bulk_create([Board(id=GENERAL_BOARD_ID, title='Общий', owner=user)])
+        general = ChatRoom.objects.create(board_id=GENERAL_BOARD_ID)
+        ChatMessage.objects.create(room=general, author=user, text='общий план')
+        ChatMessage.objects.create(room=room, author=user, text='секретный план')
+
+        assert texts(search_board_messages(user3, 'план')) == ['общий план']
+        assert texts(search_board_messages(user3, 'план', board_id=GENERAL_BOARD_ID)) == ['общий план']
+
+    def test_api_pages_by_cursor(self, room, user2, user):
+        for i in range(3):
+            ChatMessage.objects.create(room=room, author=user, text=f'отчёт номер {i}')
+        client = APIClient()
+        client.force_authenticate(user=user2)
+        url = reverse('chat-api-search')
+
+        response = client.get(url, {'q': 'отчет', 'limit': 2})
+        assert response.status_code == 200
+        assert [m['text'] for m in response.data['results']] == ['отчёт номер 2', 'отчёт номер 1']
+        assert response.data['results'][0]['board_id'] == room.board_id
+        assert response.data['has_more'] is True
+
+        response = client.get(url, {'q': 'отчет', 'limit': 2, 'before_id': response.data['before_id']})
+        assert [m['text'] for m in response.data['results']] == ['отчёт номер 0']
+        assert response.data['has_more'] is False
+
+        assert client.get(url, {'q': ''}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestPrivateSearch:
+
+    def test_only_own_dialogs(self, user, user2, user3):
+        chat = PrivateChat.objects.create(user1=user, user2=user2)
+        PrivateMessage.objects.create(chat=chat, sender=user, text='Встречаемся в пятницу')
+
+        assert texts(search_private_messages(user2, 'пятница')) == ['Встречаемся в пятницу']
+        assert texts(search_private_messages(user3, 'пятница')) == []
+
+        client = APIClient()
+        client.force_authenticate(user=user2)
+        response = client.get(reverse('search-private-messages'), {'q': 'встреча'})
+        assert response.status_code == 200
+        assert [m['chat_id'] for m in response.data] == [chat.id]
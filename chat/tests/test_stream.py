@@ -0,0 +1,171 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from boards.events import board_group_name
+from boards.models import Board, BoardPermit
+from chat.models import PrivateMessage
+from chat.presence import room_events
+from chat.routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+async def connect(user):
+    communicator = WebsocketCommunicator(application, '/ws/stream/')
+    communicator.scope['user'] = user
+    connected, _ = await communicator.connect()
+    assert connected
+    return communicator
+
+
+async def receive(communicator):
+    """Следующий кадр, кроме пачек присутствия"""
+    while True:
+        frame = await communicator.receive_json_from()
+        if frame['type'] != 'presence':
+            return frame
+
+
+@pytest.fixture
+def board(user, user2):
+    board = Board.objects.create(title='Доска', owner=user)
+    board.members.add(user2)
+    return board
+
+
+@pytest.mark.django_db(transaction=True)
+class TestStreamConsumer:
+
+    def test_chats_of_several_boards_on_one_socket(self, user, user2, board, monkeypatch):
+        monkeypatch.setattr(room_events, 'interval', 0.01)
+        other = Board.objects.create(title='Вторая', owner=user)
+
+        async def run():
+            stream = await connect(user)
+            await stream.send_json_to({'type': 'subscribe', 'stream': 'chat', 'board_id': board.id})
+            history = await receive(stream)
+            await stream.send_json_to({'type': 'subscribe', 'stream': 'chat', 'board_id': other.id})
+            await receive(stream)
+
+            # Обычный сокет чата и мультиплексный видят одни и те же сообщения
+            chat = WebsocketCommunicator(application, f'/ws/chat/{board.id}/')
+            chat.scope['user'] = user2
+            await chat.connect()
+            await chat.receive_json_from()
+            await chat.send_json_to({'type': 'message', 'text': 'привет'})
+            delivered = await receive(stream)
+            await stream.send_json_to({'stream': 'chat', 'board_id': other.id, 'type': 'message', 'text': 'вторая'})
+            own = await receive(stream)
+            await chat.disconnect()
+            await stream.disconnect()
+            return history, delivered, own
+
+        history, delivered, own = async_to_sync(run)()
+        assert (history['type'], history['stream'], history['board_id']) == ('history', 'chat', board.id)
+        assert history['online'] == [{'id': user.id, 'username': user.username}]
+        assert (delivered['type'], delivered['board_id'], delivered['text']) == ('chat_message', board.id, 'привет')
+        assert delivered['author']['id'] == user2.id
+        assert (own['board_id'], own['text']) == (other.id, 'вторая')
+
+    def test_board_events_and_unsubscribe(self, user, board):
+        async def run():
+            stream = await connect(user)
+            await stream.send_json_to({'type': 'subscribe', 'stream': 'board', 'board_id': board.id})
+            hello = await receive(stream)
+            layer = get_channel_layer()
+            event = {'type': 'board_changes', 'board_id': board.id, 'revision': 2, 'changes': []}
+            await layer.group_send(board_group_name(board.id), event)
+            changes = await receive(stream)
+
+            await stream.send_json_to({'type': 'unsubscribe', 'stream': 'board', 'board_id': board.id})
+            unsubscribed = await receive(stream)
+            await layer.group_send(board_group_name(board.id), event)
+            silent = await stream.receive_nothing(timeout=0.1)
+            await stream.disconnect()
+            return hello, changes, unsubscribed, silent
+
+        hello, changes, unsubscribed, silent = async_to_sync(run)()
+        assert hello == {'type': 'hello', 'revision': board.revision, 'stream': 'board', 'board_id': board.id}
+        assert changes == {'type': 'changes', 'revision': 2, 'changes': [], 'stream': 'board', 'board_id': board.id}
+        assert unsubscribed['type'] == 'unsubscribed'
+        assert silent
+
+    def test_forbidden_board_and_revocation(self, user, user2, user3):
+        board = Board.objects.create(title='Доска', owner=user)
+        permit = BoardPermit.objects.create(board=board, user=user2, role='member')
+
+        async def run():
+            outsider = await connect(user3)
+            await outsider.send_json_to({'type': 'subscribe', 'stream': 'chat', 'board_id': board.id})
+            forbidden = await outsider.receive_json_from()
+            await outsider.disconnect()
+
+            stream = await connect(user2)
+            for name in ('chat', 'board'):
+                await stream.send_json_to({'type': 'subscribe', 'stream': name, 'board_id': board.id})
+                await receive(stream)
+            await stream.send_json_to({'type': 'subscribe', 'stream': 'private'})
+            await receive(stream)
+
+            await database_sync_to_async(permit.delete)()
+            revoked = [await receive(stream), await receive(stream)]
+            # Сокет жив, личный поток работает
+            await stream.send_json_to({'type': 'subscribe', 'stream': 'private'})
+            still_open = await receive(stream)
+            await stream.disconnect()
+            return forbidden, revoked, still_open
+
+        forbidden, revoked, still_open = async_to_sync(run)()
+        assert (forbidden['type'], forbidden['code'], forbidden['board_id']) == ('error', 'forbidden', board.id)
+        assert sorted(frame['stream'] for frame in revoked) == ['board', 'chat']
+        assert all(frame['reason'] == 'access_revoked' for frame in revoked)
+        assert still_open == {'type': 'subscribed', 'stream': 'private'}
+
+    def test_private_stream(self, user, user2):
+        async def run():
+            sender, recipient = await connect(user), await connect(user2)
+            await sender.send_json_to({'stream': 'private', 'type': 'private_message', 'recipient_id': user2.id,
+                                       'text': 'рано'})
+            not_subscribed = await sender.receive_json_from()
+            for communicator in (sender, recipient):
+                await communicator.send_json_to({'type': 'subscribe', 'stream': 'private'})
+                await communicator.receive_json_from()
+
+            await sender.send_json_to({'stream': 'private', 'type': 'private_message', 'recipient_id': user2.id,
+                                       'text': 'привет'})
+            sent = await sender.receive_json_from()
+            delivered = await recipient.receive_json_from()
+            await recipient.disconnect()
+
+            # Переподключение: пропущенное досылается при подписке
+            await sender.send_json_to({'stream': 'private', 'type': 'private_message', 'recipient_id': user2.id,
+                                       'text': 'пока'})
+            await sender.receive_json_from()
+            recipient = await connect(user2)
+            await recipient.send_json_to({'type': 'subscribe', 'stream': 'private',
+                                          'resume_from': delivered['message']['seq']})
+            resume = await recipient.receive_json_from()
+            await sender.disconnect()
+            await recipient.disconnect()
+            return not_subscribed, sent, delivered, resume
+
+        not_subscribed, sent, delivered, resume = async_to_sync(run)()
+        assert not_subscribed['code'] == 'not_subscribed'
+        assert (sent['type'], sent['stream']) == ('message_sent', 'private')
+        assert (delivered['type'], delivered['stream'], delivered['message']['text']) == ('new_message', 'private', 'привет')
+        assert [m['text'] for m in resume['messages']] == ['пока']
+        assert PrivateMessage.objects.count() == 2
+
+    def test_anonymous_rejected(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        async def run():
+            communicator = WebsocketCommunicator(application, '/ws/stream/')
+            communicator.scope['user'] = AnonymousUser()
+            connected, _ = await communicator.connect()
+            return connected
+
+        assert async_to_sync(run)() is False
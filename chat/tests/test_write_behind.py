@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from boards.models import Board
+from chat.models import ChatRoom, ChatMessage
+from chat.routing import websocket_urlpatterns
+from chat.write_behind import ChatWriteBehind, create_chat_message
+
+
+@pytest.mark.django_db(transaction=True)
+class TestChatWriteBehind:
+
+    @pytest.fixture
+    def board(self, user):
+        return Board.objects.create(title='Доска', owner=user)
+
+    def test_flush_by_batch_size(self, board, user):
+        buffer = ChatWriteBehind(interval=10_000, batch_size=3)
+
+        async def run():
+            first = await buffer.add(board.id, user, '1')
+            await buffer.add(board.id, user, '2')
+            stored_before = await asyncio.to_thread(ChatMessage.objects.count)
+            await buffer.add(board.id, user, '3')
+            return first, stored_before
+
+        first, stored_before = async_to_sync(run)()
+        assert stored_before == 0
+        texts = list(ChatMessage.objects.order_by('id').values_list('id', 'text'))
+        assert texts == [(first.id, '1'), (first.id + 1, '2'), (first.id + 2, '3')]
+        assert buffer.pending_count() == 0
+
+    def test_flush_by_interval(self, board, user):
+        buffer = ChatWriteBehind(interval=10, batch_size=100)
+
+        async def run():
+            await buffer.add(board.id, user, 'привет')
+            await asyncio.sleep(0.2)
+
+        async_to_sync(run)()
+        message = ChatMessage.objects.get()
+        assert message.text == 'привет'
+        assert message.is_edited is False
+
+    def test_rest_inserts_share_id_counter(self, board, user, settings):
+        settings.CHAT_WRITE_BEHIND = True
+        room = ChatRoom.objects.create(board=board)
+        ChatMessage.objects.create(room=room, author=user, text='старое')
+        message = create_chat_message(room=room, author=user, text='новое')
+        assert message.is_edited is False
+        assert message.id == ChatMessage.objects.order_by('-id').values_list('id', flat=True)[1] + 1
+
+    def test_consumer_broadcasts_before_insert(self, board, user, settings, monkeypatch):
+        settings.CHAT_WRITE_BEHIND = True
+        buffer = ChatWriteBehind(interval=10_000, batch_size=100)
+        monkeypatch.setattr('chat.consumers.chat_write_behind', buffer)
+
+        async def run():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{board.id}/')
+            communicator.scope['user'] = user
+            await communicator.connect()
+            await communicator.receive_json_from()  # история
+            await communicator.send_json_to({'type': 'message', 'text': 'быстро'})
+            event = await communicator.receive_json_from()
+            stored = await asyncio.to_thread(ChatMessage.objects.count)
+            await communicator.disconnect()
+            return event, stored
+
+        event, stored = async_to_sync(run)()
+        assert event['type'] == 'chat_message'
+        assert stored == 0
+        # Отключение автора сбрасывает буфер
+        assert ChatMessage.objects.get().id == event['id']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_flush_keeps_messages_for_retry(user, monkeypatch):
+    board = Board.objects.create(title='Доска', owner=user)
+    buffer = ChatWriteBehind(interval=10, batch_size=2)
+    bulk_create = ChatMessage.objects.bulk_create
+    calls = []
+
+    def failing_once(objs, *args, **kwargs):
+        calls.append(len(objs))
+        if len(calls) == 1:
+            raise RuntimeError('база недоступна')
+        return bulk_create(objs, *args, **kwargs)
+
+    monkeypatch.setattr(ChatMessage.objects, 'bulk_create', failing_once)
+
+    async def run():
+        await buffer.add(board.id, user, '1')
+        await buffer.add(board.id, user, '2')  # пачка набралась - сброс падает
+        pending_after_error = buffer.pending_count()
+        await asyncio.sleep(0.2)  # повтор по таймеру
+        return pending_after_error
+
+    assert async_to_sync(run)() == 2
+    assert calls == [2, 2]
+    assert list(ChatMessage.objects.order_by('id').values_list('text', flat=True)) == ['1', '2']
+    assert buffer.pending_count() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_room_does_not_block_other_rooms(user, settings):
+    settings.CHAT_WRITE_BEHIND_RETRIES = 2
+    deleted, alive = (Board.objects.create(title=title, owner=user) for title in ('Удалят', 'Живая'))
+    buffer = ChatWriteBehind(interval=10_000, batch_size=100)
+
+    async def run():
+        await buffer.add(deleted.id, user, 'в никуда')
+        await buffer.add(alive.id, user, 'раз')
+
+    async_to_sync(run)()
+    deleted.delete()  # комната уходит каскадом, сообщение ещё в буфере
+
+    assert buffer.flush_sync() == 1
+    assert buffer.pending_count() == 1
+    assert deleted.id not in buffer._room_ids
+
+    async_to_sync(buffer.add)(alive.id, user, 'два')
+    assert buffer.flush_sync() == 1
+    # Исчерпал попытки - выброшен, буфер не растёт
+    assert buffer.pending_count() == 0
+    assert list(ChatMessage.objects.order_by('id').values_list('text', flat=True)) == ['раз', 'два']
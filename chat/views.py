@@ -2,41 +2,36 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
 
 from boards.models import Board, BoardPermit
-from .models import ChatRoom, ChatMessage, ChatFile
+from boards.permissions import get_board_access
+from .models import ChatRoom, ChatMessage, ChatFile, GENERAL_BOARD_ID
 from .serializers import ChatMessageSerializer, ChatFileSerializer, ChatHistorySerializer
 from .views_parts.utils import (
     json_login_required, 
     UNIVERSAL_FOR_AUTHENTICATION, 
     UNIVERSAL_FOR_PERMISSION_CLASSES
 )
+from .views_parts.pagination import keyset_page, CursorError
+from .write_behind import create_chat_message
+from .read_state import mark_read, unread_count, unread_counts_by_board, ReadStateError
+from .search import search_board_messages, SearchError
+from .rate_limit import throttle_stats
+from .archive import history_page
 
 class BaseChatAPIView(APIView):
     """Базовый класс с проверкой прав доступа к доске"""
     permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
     
     def check_board_access(self, board_id, user):
-        """Проверяет, есть ли у пользователя доступ к доске"""
-        board = get_object_or_404(Board, id=board_id)
-        
-        # Владелец имеет доступ
-        if board.owner == user:
-            return board
-        
-        # Участник имеет доступ
-        if board.members.filter(id=user.id).exists():
-            return board
-        
-        # Или через BoardPermit
-        if BoardPermit.objects.filter(board=board, user=user).exists():
-            return board
-        
-        return None
+        """Проверяет, есть ли у пользователя доступ к доске (владелец, участник или BoardPermit)"""
+        # Доска и роль - одним запросом, результат запоминается на запрос
+        access = get_board_access(self.request, 'board', board_id)
+        return access.board if access.can_read else None
 
 
 class ChatHistoryAPIView(BaseChatAPIView):
@@ -54,34 +49,35 @@ class ChatHistoryAPIView(BaseChatAPIView):
         # Получаем или создаем комнату
         room, created = ChatRoom.objects.get_or_create(board=board)
         
-        # Параметры пагинации
-        limit = int(request.GET.get('limit', 50))
-        offset = int(request.GET.get('offset', 0))
-        
         # Получаем сообщения
         messages = ChatMessage.objects.filter(
             room=room
-        ).select_related('author', 'attachment').order_by('-created')
-        
-        total = messages.count()
-        messages_page = messages[offset:offset + limit]
+        ).select_related('author__profile', 'attachment')
         
-        # Проверяем, есть ли еще сообщения
-        has_more = (offset + limit) < total
+        # Страница по курсору (?before_id= / ?after_id=), без COUNT и OFFSET;
+        # старше таблицы - из архива (chat/archive.py)
+        try:
+            page = history_page(room, messages, request.GET)
+        except CursorError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Сериализуем
         serializer = ChatMessageSerializer(
-            messages_page,
+            page.items,
             many=True,
             context={'request': request}
         )
         
-        return Response({
+        data = {
             'messages': serializer.data,
-            'has_more': has_more,
-            'total': total,
+            'has_more': page.has_more,
+            'before_id': page.before_id,
+            'after_id': page.after_id,
             'room_id': room.id
-        })
+        }
+        if page.total is not None:
+            data['total'] = page.total
+        return Response(data)
 
 
 class ChatSendMessageAPIView(BaseChatAPIView):
@@ -157,7 +153,7 @@ class ChatUploadFileAPIView(BaseChatAPIView):
         )
         
         # Создаем сообщение о файле
-        message = ChatMessage.objects.create(
+        message = create_chat_message(
             room=room,
             author=request.user,
             text=f"Файл: {file_obj.name}",
@@ -172,7 +168,10 @@ class ChatUploadFileAPIView(BaseChatAPIView):
 
 
 class ChatMarkReadAPIView(BaseChatAPIView):
-    """Отметка сообщений как прочитанных"""
+    """
+    Отметка чата прочитанным до сообщения message_id (по умолчанию - до последнего).
+    Старый формат message_ids тоже принимается: берётся наибольший id.
+    """
     
     def post(self, request, board_id):
         board = self.check_board_access(board_id, request.user)
@@ -184,60 +183,132 @@ class ChatMarkReadAPIView(BaseChatAPIView):
         
         room = get_object_or_404(ChatRoom, board=board)
         
-        # Получаем ID сообщений для отметки
-        message_ids = request.data.get('message_ids', [])
-        
-        if not message_ids:
-            return Response({"success": True})
+        message_id = request.data.get('message_id')
+        message_ids = request.data.get('message_ids')
+        try:
+            if message_id is not None:
+                message_id = int(message_id)
+            elif message_ids:
+                message_id = max(int(i) for i in message_ids)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "message_id должен быть числом"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Здесь можно добавить логику отметки прочитанных
-        # Например, через модель ChatMessageRead
+        try:
+            last_read = mark_read(request.user, room, message_id)
+        except ReadStateError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             "success": True,
-            "marked": len(message_ids)
+            "last_read_message_id": last_read,
+            "unread_count": unread_count(request.user, room)
+        })
+
+
+class ChatUnreadCountsAPIView(APIView):
+    """Непрочитанные по всем доскам пользователя одним запросом (бейджи в списке досок)"""
+    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    
+    def get(self, request):
+        counts = unread_counts_by_board(request.user)
+        return Response({
+            "boards": {str(board_id): count for board_id, count in counts.items()},
+            "total": sum(counts.values())
         })
         
         
+class ChatSearchAPIView(APIView):
+    """
+    Поиск по сообщениям чатов доступных досок: ?q=текст, ?board_id= - одна доска.
+    Страницы по курсору, как в истории (?before_id=, ?limit=), от новых к старым.
+    """
+    permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
+    
+    def get(self, request):
+        board_id = request.GET.get('board_id')
+        try:
+            messages = search_board_messages(
+                request.user,
+                request.GET.get('q', ''),
+                board_id=int(board_id) if board_id else None
+            )
+            page = keyset_page(messages, request.GET)
+        except (SearchError, CursorError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "board_id должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = ChatMessageSerializer(page.items, many=True).data
+        for item, message in zip(results, page.items):
+            item['board_id'] = message.room.board_id
+        
+        data = {
+            'results': results,
+            'has_more': page.has_more,
+            'before_id': page.before_id,
+            'after_id': page.after_id
+        }
+        if page.total is not None:
+            data['total'] = page.total
+        return Response(data)
+        
+        
+class ChatThrottleStatsAPIView(APIView):
+    """Счётчики ограничения частоты WebSocket чатов (chat/rate_limit.py) - для staff"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        return Response(throttle_stats())
+        
+        
 class GeneralChatHistoryAPIView(APIView):
     """Получение истории общего чата"""
     permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
     
     def get(self, request):
-        # ID служебной доски для общего чата
-        GENERAL_BOARD_ID = 999999
-        
         # Получаем или создаем комнату для этой доски
         room, _ = ChatRoom.objects.get_or_create(board_id=GENERAL_BOARD_ID)
         
         # Получаем сообщения
         messages = ChatMessage.objects.filter(
             room=room
-        ).select_related('author').order_by('-created')[:50]
+        ).select_related('author__profile', 'attachment')
+        
+        try:
+            page = history_page(room, messages, request.GET)
+        except CursorError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Сериализуем (можно использовать ваш существующий сериализатор)
         from chat.serializers import ChatMessageSerializer
-        serializer = ChatMessageSerializer(messages, many=True, context={'request': request})
+        serializer = ChatMessageSerializer(page.items, many=True, context={'request': request})
         
-        return Response({
+        data = {
             'messages': serializer.data,
+            'has_more': page.has_more,
+            'before_id': page.before_id,
+            'after_id': page.after_id,
             'room_type': 'general'
-        })
+        }
+        if page.total is not None:
+            data['total'] = page.total
+        return Response(data)
 
 class GeneralChatSendAPIView(APIView):
     """Отправка сообщения в общий чат"""
     permission_classes = UNIVERSAL_FOR_PERMISSION_CLASSES
     
     def post(self, request):
-        GENERAL_BOARD_ID = 999999
-        
         room, _ = ChatRoom.objects.get_or_create(board_id=GENERAL_BOARD_ID)
         
         text = request.data.get('text', '').strip()
         if not text:
             return Response({'error': 'Текст не может быть пустым'}, status=400)
         
-        message = ChatMessage.objects.create(
+        message = create_chat_message(
             room=room,
             author=request.user,
             text=text
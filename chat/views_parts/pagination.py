@@ -0,0 +1,93 @@
+'''Постраничная выдача сообщений по курсору (keyset) вместо OFFSET.
+Страница не сдвигается от новых сообщений и стоит одинаково на любой глубине истории.'''
+
+from django.db.models import Q
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class CursorError(ValueError):
+    """Неверный limit/before_id/after_id"""
+
+
+class KeysetPage:
+    """
+    Страница сообщений от новых к старым.
+    has_more - есть ли ещё сообщения в запрошенную сторону,
+    before_id/after_id - курсоры для следующей страницы назад/вперёд.
+    """
+
+    def __init__(self, items, has_more, total=None):
+        self.items = items
+        self.has_more = has_more
+        self.total = total
+
+    @property
+    def before_id(self):
+        return self.items[-1].id if self.items else None
+
+    @property
+    def after_id(self):
+        return self.items[0].id if self.items else None
+
+    def headers(self):
+        """Те же сведения заголовками - для ответов, где тело остаётся списком"""
+        headers = {'X-Has-More': 'true' if self.has_more else 'false'}
+        if self.before_id is not None:
+            headers['X-Before-Id'] = str(self.before_id)
+            headers['X-After-Id'] = str(self.after_id)
+        if self.total is not None:
+            headers['X-Total-Count'] = str(self.total)
+        return headers
+
+
+def _int_param(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CursorError(f'{name} должен быть числом')
+
+
+def keyset_page(queryset, params, default_limit=DEFAULT_LIMIT, field='created'):
+    """
+    Страница сообщений queryset (одна комната/диалог) по параметрам запроса:
+    ?limit=N, ?before_id=ID - более старые, ?after_id=ID - более новые,
+    ?total=1 - дополнительно посчитать все сообщения (отдельный COUNT, по умолчанию не считается).
+    Курсор сравнивается по (field, id), чтобы идти по индексу (room, created);
+    field - поле сортировки (для списка диалогов - last_message_at).
+    has_more считается выборкой limit + 1 строк.
+    """
+    limit = min(max(_int_param(params, 'limit', default_limit), 1), MAX_LIMIT)
+    before_id = _int_param(params, 'before_id')
+    after_id = _int_param(params, 'after_id')
+    if before_id is not None and after_id is not None:
+        raise CursorError('before_id и after_id нельзя передавать вместе')
+
+    total = queryset.count() if params.get('total') in ('1', 'true') else None
+
+    cursor_id = before_id if before_id is not None else after_id
+    page = queryset
+    if cursor_id is not None:
+        value = queryset.filter(id=cursor_id).values_list(field, flat=True).first()
+        if value is None:
+            raise CursorError('Сообщение курсора не найдено')
+        if before_id is not None:
+            page = page.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': cursor_id}))
+        else:
+            page = page.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': cursor_id}))
+
+    if after_id is not None:
+        # Ближайшие более новые: по возрастанию, потом разворачиваем
+        items = list(page.order_by(field, 'id')[:limit + 1])
+        has_more = len(items) > limit
+        items = items[:limit][::-1]
+    else:
+        items = list(page.order_by(f'-{field}', '-id')[:limit + 1])
+        has_more = len(items) > limit
+        items = items[:limit]
+
+    return KeysetPage(items, has_more, total)
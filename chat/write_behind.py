@@ -0,0 +1,181 @@
+'''Отложенная запись сообщений чата доски (write-behind), включается CHAT_WRITE_BEHIND = True.
+
+Сообщение получает id от сервера и рассылается сразу, а INSERT копится в буфере
+по комнатам и уходит одним bulk_create раз в CHAT_WRITE_BEHIND_INTERVAL мс
+или как только набралось CHAT_WRITE_BEHIND_BATCH сообщений.
+
+Гарантии:
+- сообщение, которое успели разослать, но не записали, теряется при падении процесса:
+  это не больше INTERVAL мс или BATCH сообщений; при штатной остановке (atexit)
+  и при отключении автора буфер сбрасывается в базу;
+- каждая комната пишется отдельно: ошибка одной комнаты не задерживает остальные;
+- ошибка базы при записи комнаты сообщения сразу не теряет: они возвращаются в буфер
+  и пишутся следующим сбросом (таймер перезапускается). После CHAT_WRITE_BEHIND_RETRIES
+  неудач подряд (комнату удалили вместе с доской, совпали id) сообщения комнаты
+  выбрасываются с записью в лог - повтор такую ошибку не исправит;
+- id выдаёт счётчик внутри процесса (стартует с max(id)), поэтому режим рассчитан
+  на один ASGI процесс: несколько воркеров выдадут одинаковые id, и пачка не запишется;
+- остальные записи ChatMessage в этом процессе (REST отправка, файлы) берут id из того же
+  счётчика через create_chat_message();
+- created в базе - время записи пачки, на доли секунды позже времени рассылки.
+По умолчанию режим выключен: каждое сообщение пишется сразу, как раньше.'''
+
+import asyncio
+import atexit
+import threading
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Max
+from django.core.management.color import no_style
+from django.utils import timezone
+
+from .models import ChatRoom, ChatMessage
+
+
+def write_behind_enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+class ChatWriteBehind:
+    """Буфер неподтверждённых INSERT по комнатам + счётчик id"""
+
+    def __init__(self, interval=None, batch_size=None):
+        self.interval = (interval if interval is not None
+                         else getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL', 50)) / 1000
+        self.batch_size = batch_size or getattr(settings, 'CHAT_WRITE_BEHIND_BATCH', 100)
+        self.retries = getattr(settings, 'CHAT_WRITE_BEHIND_RETRIES', 3)
+        self._lock = threading.Lock()
+        self._pending = {}  # room_id -> [ChatMessage]
+        self._pending_count = 0
+        self._next_id = None
+        self._room_ids = {}  # board_id -> room_id
+        self._failures = {}  # room_id -> неудачных записей подряд
+        self._flush_handle = None
+
+    # ------------------id и комнаты------------------
+    def next_id(self):
+        """Следующий id сообщения; при первом вызове читает max(id) (синхронно, нужна БД)"""
+        with self._lock:
+            if self._next_id is None:
+                self._next_id = (ChatMessage.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+            message_id = self._next_id
+            self._next_id += 1
+            return message_id
+
+    def room_id(self, board_id):
+        board_id = int(board_id)
+        if board_id not in self._room_ids:
+            room, _ = ChatRoom.objects.get_or_create(board_id=board_id)
+            self._room_ids[board_id] = room.id
+        return self._room_ids[board_id]
+
+    @database_sync_to_async
+    def _prepare(self, board_id):
+        return self.room_id(board_id), self.next_id()
+
+    # ------------------Буфер------------------
+    async def add(self, board_id, author, text):
+        """Ставит сообщение в буфер и возвращает его (с id) для немедленной рассылки"""
+        room_id, message_id = await self._prepare(board_id)
+        message = ChatMessage(id=message_id, room_id=room_id, author=author, text=text,
+                              created=timezone.now())
+        with self._lock:
+            self._pending.setdefault(room_id, []).append(message)
+            self._pending_count += 1
+            full = self._pending_count >= self.batch_size
+
+        if full:
+            await self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.interval, lambda: loop.create_task(self.flush()))
+        return message
+
+    def _take(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._pending_count = 0
+        return pending
+
+    def _put_back(self, room_id, messages):
+        """Незаписанные сообщения комнаты - обратно в буфер, перед пришедшими за время записи"""
+        with self._lock:
+            self._pending[room_id] = messages + self._pending.get(room_id, [])
+            self._pending_count += len(messages)
+
+    def _forget_room(self, room_id):
+        """Комнаты больше нет (или она не та) - следующий room_id() прочитает её заново"""
+        for board_id, cached in list(self._room_ids.items()):
+            if cached == room_id:
+                del self._room_ids[board_id]
+
+    def _write_room(self, room_id, messages):
+        """Пишет сообщения одной комнаты; True - записаны"""
+        try:
+            with transaction.atomic():
+                ChatMessage.objects.bulk_create(messages)
+        except Exception as e:
+            if isinstance(e, IntegrityError):
+                self._forget_room(room_id)
+            failures = self._failures.get(room_id, 0) + 1
+            if failures >= self.retries:
+                self._failures.pop(room_id, None)
+                print(f"❌ Комната {room_id}: {len(messages)} сообщений чата не записаны "
+                      f"после {failures} попыток и выброшены: {e}")
+                for message in messages:
+                    print(f"   id={message.id} author={message.author_id} text={message.text!r}")
+            else:
+                self._failures[room_id] = failures
+                print(f"❌ Комната {room_id}: не удалось записать {len(messages)} сообщений чата, "
+                      f"повтор следующим сбросом: {e}")
+                self._put_back(room_id, messages)
+            return False
+        self._failures.pop(room_id, None)
+        return True
+
+    def flush_sync(self):
+        """
+        Записывает всё накопленное (синхронно), по одному bulk_create на комнату.
+        Возвращает число записанных сообщений.
+        """
+        written = 0
+        for room_id, messages in self._take().items():
+            if self._write_room(room_id, messages):
+                written += len(messages)
+        if written:
+            # Postgres: последовательность id должна догнать выданные вручную id
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(), [ChatMessage])
+            if sequence_sql:
+                with connection.cursor() as cursor:
+                    for sql in sequence_sql:
+                        cursor.execute(sql)
+        return written
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        written = await database_sync_to_async(self.flush_sync)()
+        if self._pending_count and self._flush_handle is None:
+            # Часть не записалась (или пришли новые) - следующий сброс по таймеру
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.interval, lambda: loop.create_task(self.flush()))
+        return written
+
+    def pending_count(self):
+        return self._pending_count
+
+
+chat_write_behind = ChatWriteBehind()
+# Штатная остановка процесса - дописываем хвост
+atexit.register(chat_write_behind.flush_sync)
+
+
+def create_chat_message(**fields):
+    """ChatMessage.objects.create, согласованный с write-behind: id из того же счётчика"""
+    if write_behind_enabled():
+        fields.setdefault('id', chat_write_behind.next_id())
+    return ChatMessage.objects.create(**fields)
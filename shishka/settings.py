@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 import sys
 from pathlib import Path
 
@@ -82,19 +83,77 @@ TEMPLATES = [
 ASGI_APPLICATION = 'shishka.asgi.application'
 
 # Настройка брокера сообщений (Redis)
-CHANNEL_LAYERS = {
-    'default': {  # Имя подключения (может быть несколько)
-        #'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        "BACKEND": "channels.layers.InMemoryChannelLayer",  # Движок
-        #'CONFIG': {
-            # "hosts": [('127.0.0.1', 6379)],  # Где искать Redis
-            # Можно добавить:
-            # "prefix": "chat_",  # Префикс ключей в Redis
-            # "timeout": 30,      # Таймаут соединения
-        #},
+# CHANNEL_LAYER=memory (по умолчанию) - один ASGI процесс, всё в памяти;
+# CHANNEL_LAYER=redis - несколько процессов: группы через Redis (с раскладкой по доскам,
+# chat/layers.py) и общий кэш в Redis (присутствие, payload'ы, снапшоты досок).
+# REDIS_URLS - адреса через запятую, каждый адрес - отдельный шард.
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'memory')
+REDIS_URLS = [url for url in os.environ.get('REDIS_URLS', 'redis://127.0.0.1:6379/0').split(',') if url]
+
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'chat.layers.BoardShardedRedisChannelLayer',
+            'CONFIG': {
+                'hosts': REDIS_URLS,
+                'prefix': 'shishka',
+                'capacity': 1000,  # сообщений в очереди канала, дальше ChannelFull
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {  # Имя подключения (может быть несколько)
+            "BACKEND": "channels.layers.InMemoryChannelLayer",  # Движок
+        },
+    }
+
+# Отложенная запись сообщений чата доски: рассылка сразу, INSERT пачками.
+# Только для одного ASGI процесса, гарантии описаны в chat/write_behind.py
+CHAT_WRITE_BEHIND = False
+CHAT_WRITE_BEHIND_INTERVAL = 50  # мс между сбросами буфера
+CHAT_WRITE_BEHIND_BATCH = 100    # сообщений, после которых сброс сразу
+CHAT_WRITE_BEHIND_RETRIES = 3    # неудачных записей комнаты подряд, после которых её сообщения выбрасываются
+
+# Последние сообщения комнат в памяти для истории при подключении (chat/history_buffer.py)
+CHAT_HISTORY_BUFFER_SIZE = 50     # сообщений на комнату
+CHAT_HISTORY_BUFFER_ROOMS = 500   # комнат, дальше вытеснение по LRU
+CHAT_HISTORY_BUFFER_TTL = 300     # секунд жизни комнаты без живых подписчиков
+
+# Присутствие и "печатает" в чате доски (chat/presence.py)
+CHAT_PRESENCE_TTL = 90            # секунд без активности сокета, после которых он не считается онлайн
+CHAT_COALESCE_INTERVAL = 500      # мс, за которые входы/выходы и "печатает" собираются в одну рассылку
+CHAT_TYPING_THROTTLE = 2000       # мс между событиями "печатает" от одного сокета
+
+# Лимиты записи из WebSocket чатов (chat/rate_limit.py): (сообщений в секунду, запас)
+CHAT_RATE_CONNECTION = (5, 10)    # на сокет
+CHAT_RATE_USER = (10, 20)         # на пользователя (все вкладки в процессе)
+CHAT_RATE_MAX_REJECTED = 20       # отказов подряд, после которых сокет закрывается (4429)
+
+# Досылка личных сообщений при переподключении (?resume_from=<seq>, chat/consumers.py)
+CHAT_RESUME_LIMIT = 500           # сообщений в кадре resume, больше - has_more и перезагрузка через API
+CHAT_STREAM_MAX_BOARDS = 50       # подписок на чаты и события досок в одном сокете ws/stream/
+
+# Архив старых сообщений чатов досок (chat/archive.py, manage.py archive_chat_messages)
+CHAT_ARCHIVE_ROOT = BASE_DIR / 'chat_archive'
+CHAT_ARCHIVE_AFTER_DAYS = 90      # сообщения старше уходят в архив
+#------------------------------------------------------------
+
+# Кэш (снапшоты досок, payload'ы сообщений чата). LocMem живёт внутри одного процесса,
+# при нескольких воркерах нужен общий бэкенд (Redis)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
 }
-#------------------------------------------------------------
+if CHANNEL_LAYER == 'redis':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', REDIS_URLS[0]),
+    }
+BOARD_SNAPSHOT_CACHE_TIMEOUT = 60 * 60  # секунды
+CHAT_PAYLOAD_CACHE_TIMEOUT = 60 * 60 * 24  # payload'ы сообщений чата (chat/payloads.py)
+USERS_UNREAD_CACHE_TIMEOUT = 60 * 60 * 24  # счётчики непрочитанных сообщений (users/unread.py)
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -192,7 +251,8 @@ CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
 ]
 # Разрешаем заголовки для межсайтовых запросов
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken',
+                       'X-Has-More', 'X-Before-Id', 'X-After-Id', 'X-Total-Count']  # курсоры страниц диалога
 
 # Разрешаем отправлять cookie при межсайтовых запросах на разрешённые домены:
 CORS_ALLOW_CREDENTIALS = True
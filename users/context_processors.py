@@ -1,10 +1,7 @@
-from .models import Message
+from .unread import unread_count
 
 def unread_messages_count(request):
     if request.user.is_authenticated:
-        unread_count = Message.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
-        return {'unread': unread_count}
-    return {'unread': 0}
\ No newline at end of file
+        # Счётчик из кэша, COUNT по базе - только если ключа нет
+        return {'unread': unread_count(request.user)}
+    return {'unread': 0}
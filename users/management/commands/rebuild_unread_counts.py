@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.unread import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает по базе кэшированные счётчики непрочитанных сообщений (users/unread.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            help='Только этот пользователь (id, можно несколько раз)')
+
+    def handle(self, *args, **options):
+        total = rebuild_unread_counts(options['user'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано счётчиков: {total}'))
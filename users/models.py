@@ -44,4 +44,8 @@ class Message(models.Model):  # отправить пользователю со
 
     class Meta:
         ordering = ['is_read', '-created']  # по прочитанным+дата созд.
+        indexes = [
+            # Входящие в порядке ordering и подсчёт непрочитанных (users/unread.py)
+            models.Index(fields=['recipient', 'is_read', '-created'], name='users_message_inbox'),
+        ]
         verbose_name = "Сообщения"
@@ -1,5 +1,6 @@
-from django.db.models.signals import post_save, post_delete
-from .models import Profile
+from django.db.models.signals import post_init, post_save, post_delete
+from .models import Profile, Message
+from .unread import adjust_unread
 from django.contrib.auth.models import User
 
 
@@ -34,3 +35,28 @@ def delete_user(sender, instance, **kwargs):
 post_save.connect(create_profile, sender=User)
 post_save.connect(update_profile, sender=Profile)
 post_delete.connect(delete_user, sender=Profile)
+
+
+# ------------------Счётчик непрочитанных (users/unread.py)------------------
+def remember_unread_state(sender, instance, **kwargs):
+    # Состояние при загрузке: при сохранении видно, что изменилось, без лишнего запроса
+    instance._unread_state = (instance.recipient_id, instance.is_read)
+
+
+def message_saved(sender, instance, created, **kwargs):
+    old_recipient, old_is_read = (None, True) if created else instance._unread_state
+    if not old_is_read:
+        adjust_unread(old_recipient, -1)
+    if not instance.is_read:
+        adjust_unread(instance.recipient_id, 1)
+    remember_unread_state(sender, instance)
+
+
+def message_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread(instance.recipient_id, -1)
+
+
+post_init.connect(remember_unread_state, sender=Message, dispatch_uid='users_unread_init')
+post_save.connect(message_saved, sender=Message, dispatch_uid='users_unread_save')
+post_delete.connect(message_deleted, sender=Message, dispatch_uid='users_unread_delete')
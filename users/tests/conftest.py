@@ -1,9 +1,17 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from users.models import Profile,Message
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Счётчики непрочитанных в кэше не должны переживать тест: id переиспользуются."""
+    cache.clear()
+    yield
+    cache.clear()
+
 @pytest.fixture
 def user():
     return User.objects.create_user(username='testuser', password='12345')
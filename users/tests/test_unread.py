@@ -0,0 +1,74 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from users.models import Message
+from users import unread
+from users.unread import unread_count
+
+
+def send(sender, recipient, subject='Тема'):
+    return Message.objects.create(sender=sender, recipient=recipient, subject=subject, body='Текст')
+
+
+@pytest.mark.django_db(transaction=True)
+class TestUnreadCount:
+    # transaction=True: счётчик меняется в on_commit
+
+    def test_signals_keep_cache_in_sync(self, user, user2, django_assert_num_queries):
+        first = send(user, user2)
+        assert unread_count(user2) == 1
+        send(user, user2)
+        with django_assert_num_queries(0):
+            assert unread_count(user2) == 2
+
+        first.is_read = True
+        first.save()
+        with django_assert_num_queries(0):
+            assert unread_count(user2) == 1
+
+        # Сообщение передали другому получателю
+        message = Message.objects.get(recipient=user2, is_read=False)
+        message.recipient = user
+        message.save()
+        assert (unread_count(user), unread_count(user2)) == (1, 0)
+
+        message.delete()
+        first.delete()
+        assert unread_count(user) == 0
+
+    def test_change_during_fill_is_not_lost(self, user, user2, monkeypatch):
+        send(user, user2)
+        count_unread = unread.count_unread
+
+        def slow_count(user_id):
+            # COUNT уже прочитал базу, а параллельный коммит ещё одного сообщения
+            # сдвигает счётчик, которого в кэше пока нет
+            count = count_unread(user_id)
+            send(user, user2)
+            return count
+
+        monkeypatch.setattr(unread, 'count_unread', slow_count)
+        assert unread_count(user2) == 1
+        monkeypatch.setattr(unread, 'count_unread', count_unread)
+        assert unread_count(user2) == 2
+
+    def test_view_message_and_context_processor(self, client, user, user2):
+        message = send(user, user2)
+        client.force_login(user2)
+
+        assert client.get(reverse('inbox')).context['unread'] == 1
+        client.get(reverse('message', kwargs={'pk': message.pk}))
+        client.get(reverse('message', kwargs={'pk': message.pk}))
+        assert unread_count(user2) == 0
+        assert Message.objects.get(pk=message.pk).is_read is True
+
+    def test_rebuild_command(self, user, user2, capsys):
+        send(user, user2)
+        unread_count(user2)
+        # Изменение в обход сигналов - кэш разошёлся с базой
+        Message.objects.update(is_read=True)
+        assert unread_count(user2) == 1
+
+        call_command('rebuild_unread_counts', '--user', str(user2.id))
+        assert 'Пересчитано счётчиков: 1' in capsys.readouterr().out
+        assert unread_count(user2) == 0
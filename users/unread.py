@@ -0,0 +1,91 @@
+'''Число непрочитанных сообщений (users.Message) пользователя для шапки сайта.
+Счётчик лежит в кэше и меняется сигналами Message (users/signals.py) после коммита;
+если ключа нет (вытеснен, не заполнен) - один COUNT по индексу (recipient, is_read, created).
+Пересобрать все счётчики: manage.py rebuild_unread_counts.'''
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Message
+
+USERS_UNREAD_CACHE_TIMEOUT = getattr(settings, 'USERS_UNREAD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _unread_key(user_id):
+    return f'users-unread:{user_id}'
+
+
+def _generation_key(user_id):
+    # Растёт, когда изменение не нашло счётчика в кэше (см. unread_count)
+    return f'users-unread-gen:{user_id}'
+
+
+def count_unread(user_id):
+    """Подсчёт по базе, без кэша"""
+    return Message.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def unread_count(user):
+    user_id = getattr(user, 'id', user)
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        generation = cache.get(_generation_key(user_id))
+        count = count_unread(user_id)
+        # add, а не set: счётчик, заполненный параллельно вместе с изменением, не перетираем.
+        # Если пока шёл COUNT изменение закоммитилось и не нашло ключа, поколение сдвинулось:
+        # наш подсчёт мог его не увидеть - не оставляем его в кэше на сутки
+        if cache.add(key, count, USERS_UNREAD_CACHE_TIMEOUT) and \
+                cache.get(_generation_key(user_id)) != generation:
+            cache.delete(key)
+    return count
+
+
+def _adjust(user_id, delta):
+    key = _unread_key(user_id)
+    try:
+        count = cache.incr(key, delta)
+    except ValueError:
+        # Ключа нет - следующий unread_count посчитает по базе; заполнение,
+        # начатое до этого изменения, увидит новое поколение и не сохранится
+        generation_key = _generation_key(user_id)
+        cache.add(generation_key, 0, USERS_UNREAD_CACHE_TIMEOUT)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            pass  # вытеснен между add и incr - заполнение и так увидит другое значение
+        return
+    if count < 0:
+        # Разошёлся с базой (изменение в обход сигналов) - пересчитаем при чтении
+        cache.delete(key)
+
+
+def adjust_unread(user_id, delta):
+    """Сдвигает счётчик получателя после коммита текущей транзакции"""
+    if user_id is not None and delta:
+        transaction.on_commit(lambda: _adjust(user_id, delta))
+
+
+def rebuild_unread_counts(user_ids=None):
+    """Пересчитывает счётчики (всех пользователей или user_ids) одним GROUP BY; возвращает число"""
+    users = User.objects.order_by('id')
+    unread = Message.objects.filter(is_read=False, recipient__isnull=False).order_by()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+        unread = unread.filter(recipient_id__in=user_ids)
+    counts = dict(unread.values_list('recipient_id').annotate(count=Count('id')))
+
+    total = 0
+    batch = {}
+    for user_id in users.values_list('id', flat=True).iterator():
+        batch[_unread_key(user_id)] = counts.get(user_id, 0)
+        total += 1
+        if len(batch) >= 1000:
+            cache.set_many(batch, USERS_UNREAD_CACHE_TIMEOUT)
+            batch = {}
+    if batch:
+        cache.set_many(batch, USERS_UNREAD_CACHE_TIMEOUT)
+    return total
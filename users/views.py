@@ -6,6 +6,7 @@ from django.contrib import messages
 from .forms import CustomForm, ProfileForm, MessageForm
 from django.shortcuts import get_object_or_404
 from .models import Message, Profile
+from .unread import unread_count, adjust_unread
 from django.http import JsonResponse  # для поиска юзеров
 
 from django.conf.urls.static import static
@@ -108,7 +109,7 @@ def edit_profile(request):
 def inbox(request):
     user = request.user
     message_request = user.messages.all()
-    unread = message_request.filter(is_read=False).count()
+    unread = unread_count(user)
     context = {
         'message_request': message_request,
         'unread': unread
@@ -120,8 +121,10 @@ def inbox(request):
 def view_message(request, pk):
     message = get_object_or_404(request.user.messages, id=pk)
     if message.is_read is False:
+        # Условный UPDATE: два одновременных открытия уменьшат счётчик один раз
+        if Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True):
+            adjust_unread(request.user.id, -1)
         message.is_read = True
-        message.save()
     context = {'message': message}
     return render(request, 'users/message.html', context)
 